@@ -107,6 +107,9 @@ def create_app(config_class=Config):
         uri_now = app.config.get('SQLALCHEMY_DATABASE_URI', '')
         if uri_now.startswith('sqlite:///'):
             db.create_all()
+        # create_all không ALTER bảng đã có: thêm cột / index mới và điền dữ liệu cho DB cũ
+        from .schema_upgrade import upgrade_schema
+        upgrade_schema()
 
     # --- ĐĂNG KÝ CÁC BLUEPRINT ---
     from .auth import bp as auth_bp
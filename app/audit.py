@@ -0,0 +1,238 @@
+# app/audit.py
+# Ghi nhật ký (Log) kèm đối tượng bị tác động: entity_type / entity_id và project chứa đối tượng.
+# project_id được tra lúc ghi theo chuỗi Task -> KR -> Objective -> (Build) -> Project, nên tab
+# hoạt động của project chỉ cần một truy vấn theo index (project_id, timestamp). Log cũ (trước khi
+# có các cột này) được điền lại bằng cách đọc ID trong nội dung action (lệnh backfill-log-entities).
+#
+# Log không được ghi trong transaction của request: record_log giữ dòng log trong session.info,
+# sau khi request commit thành công thì đẩy vào hàng đợi trong bộ nhớ (rollback -> bỏ), và một
+# thread nền INSERT theo lô trong transaction riêng. Request không còn commit lần hai chỉ để ghi
+# log. Hàng đợi có giới hạn: khi đầy, thread của request tự ghi lô đó (không mất log). Khi tắt
+# process (atexit / launcher dừng server) hàng đợi được ghi hết qua flush_audit_log().
+
+import atexit
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, event, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Build, KeyResult, Log, Objective, Project, Task
+
+ENTITY_MODELS = {'project': Project, 'build': Build, 'objective': Objective, 'key_result': KeyResult, 'task': Task}
+_TYPE_BY_MODEL = {model: entity_type for entity_type, model in ENTITY_MODELS.items()}
+
+# "Updated task ID 5", "Dời lịch CV ID 5", "Added KR to Objective ID 3", "Xóa key_result ID 7", ...
+_ACTION_ENTITY = re.compile(r'\b(task|cv|event|job|objective|key_result|build|project)\s+ID\s+(\d+)', re.IGNORECASE)
+_TYPE_ALIASES = {'cv': 'task', 'event': 'task', 'job': 'task'}
+
+
+def entity_ref(obj):
+    """(entity_type, entity_id) của một object Project / Build / Objective / KeyResult / Task."""
+    entity_type = _TYPE_BY_MODEL.get(type(obj))
+    if entity_type is None:
+        return None, None
+    if obj.id is None:
+        db.session.flush()
+    return entity_type, obj.id
+
+
+def parse_action_entity(action):
+    """(entity_type, entity_id) đọc từ nội dung action của log cũ; (None, None) nếu không có ID."""
+    match = _ACTION_ENTITY.search(action or '')
+    if not match:
+        return None, None
+    word = match.group(1).lower()
+    return _TYPE_ALIASES.get(word, word), int(match.group(2))
+
+
+def resolve_project_ids(entity_type, entity_ids):
+    """{entity_id: project_id} của các đối tượng cùng loại, một truy vấn. Đối tượng đã xóa bị bỏ qua."""
+    entity_ids = set(entity_ids)
+    if not entity_ids:
+        return {}
+    if entity_type == 'project':
+        return {pid: pid for pid in entity_ids}
+    if entity_type == 'build':
+        stmt = select(Build.id, Build.project_id).where(Build.id.in_(entity_ids))
+    else:
+        owner = func.coalesce(Objective.project_id, Build.project_id)
+        if entity_type == 'objective':
+            stmt = select(Objective.id, owner).select_from(Objective)
+        elif entity_type == 'key_result':
+            stmt = select(KeyResult.id, owner).select_from(KeyResult) \
+                .join(Objective, Objective.id == KeyResult.objective_id)
+        else:
+            stmt = select(Task.id, owner).select_from(Task) \
+                .join(KeyResult, KeyResult.id == Task.key_result_id) \
+                .join(Objective, Objective.id == KeyResult.objective_id)
+        stmt = stmt.outerjoin(Build, Build.id == Objective.build_id) \
+            .where(ENTITY_MODELS[entity_type].id.in_(entity_ids))
+    return {entity_id: project_id for entity_id, project_id in db.session.execute(stmt) if project_id}
+
+
+def record_log(action, entity=None, user_id=None):
+    """
+    Ghi một dòng Log cùng với transaction hiện tại: dòng log chỉ được ghi nếu session commit
+    thành công (ghi bất đồng bộ, xem đầu file). `entity` là object bị tác động; gọi trước khi
+    xóa object để còn tra được project.
+    """
+    entity_type, entity_id = entity_ref(entity) if entity is not None else (None, None)
+    project_id = resolve_project_ids(entity_type, [entity_id]).get(entity_id) if entity_type else None
+    db.session.info.setdefault('audit_pending', []).append((db.engine, {
+        'action': action, 'user_id': user_id, 'timestamp': datetime.utcnow(),
+        'entity_type': entity_type, 'entity_id': entity_id, 'project_id': project_id,
+    }))
+
+
+# ------------------------------------------------------------------------------
+# Hàng đợi + thread ghi theo lô
+# ------------------------------------------------------------------------------
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 1.0  # giây chờ gom thêm log trước khi ghi một lô
+AUDIT_WRITE_ATTEMPTS = 5  # số lần thử ghi một lô khi DB bận / bị khóa
+AUDIT_RETRY_BACKOFF = 0.2  # giây chờ trước lần thử lại đầu tiên, gấp đôi sau mỗi lần
+
+_logger = logging.getLogger(__name__)
+_queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_writer_lock = threading.Lock()
+_writer = None
+
+
+def _write_batch(entries):
+    """
+    INSERT một lô (engine, row) trong transaction riêng, mỗi engine một câu executemany. DB bận /
+    bị khóa (OperationalError) thì thử lại với thời gian chờ tăng dần; vẫn lỗi thì từng dòng bị
+    bỏ được ghi ra log lỗi với tag AUDIT_DROPPED để dựng lại nhật ký khi cần.
+    """
+    by_engine = {}
+    for engine, row in entries:
+        by_engine.setdefault(engine, []).append(row)
+    for engine, rows in by_engine.items():
+        delay = AUDIT_RETRY_BACKOFF
+        for attempt in range(1, AUDIT_WRITE_ATTEMPTS + 1):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(Log.__table__), rows)
+                break
+            except OperationalError as e:
+                if attempt == AUDIT_WRITE_ATTEMPTS:
+                    _drop_rows(rows, e)
+                    break
+                _logger.warning(f"Audit log write failed ({len(rows)} rows, attempt {attempt}), retrying: {e}")
+                time.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                _drop_rows(rows, e)
+                break
+
+
+def _drop_rows(rows, error):
+    _logger.error(f"Audit log write failed ({len(rows)} rows dropped): {error}")
+    for row in rows:
+        _logger.error('AUDIT_DROPPED %s', json.dumps(row, default=str, ensure_ascii=False, sort_keys=True))
+
+
+def _run_writer():
+    while True:
+        batch = [_queue.get()]
+        # Lô được ghi chậm nhất AUDIT_FLUSH_INTERVAL sau dòng log đầu tiên, dù log vẫn đến đều
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+        try:
+            while len(batch) < AUDIT_BATCH_SIZE:
+                batch.append(_queue.get(timeout=max(0, deadline - time.monotonic())))
+        except queue.Empty:
+            pass
+        try:
+            _write_batch(batch)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run_writer, name='audit-log-writer', daemon=True)
+            _writer.start()
+
+
+def enqueue_logs(entries):
+    """Đưa các dòng log (engine, row) đã commit vào hàng đợi; hàng đợi đầy -> ghi ngay trong thread này."""
+    _ensure_writer()
+    overflow = []
+    for entry in entries:
+        try:
+            _queue.put_nowait(entry)
+        except queue.Full:
+            overflow.append(entry)
+    if overflow:
+        _write_batch(overflow)
+
+
+def flush_audit_log():
+    """Chờ tới khi mọi log trong hàng đợi đã được ghi (gọi khi tắt server, trong CLI / test)."""
+    if _writer is not None and _writer.is_alive():
+        _queue.join()
+
+
+atexit.register(flush_audit_log)
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_on_commit(session):
+    entries = session.info.pop('audit_pending', None)
+    if entries:
+        enqueue_logs(entries)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_on_rollback(session, previous_transaction):
+    session.info.pop('audit_pending', None)
+
+
+def backfill_log_entities(batch_size=1000):
+    """
+    Điền entity_type / entity_id / project_id cho các log chưa có, theo lô id tăng dần. Trả về
+    (số log đã đọc, số log điền được). Log không chứa ID nào giữ nguyên NULL.
+    """
+    table = Log.__table__
+    stmt = update(table).where(table.c.id == bindparam('log_id')).values(
+        entity_type=bindparam('etype'), entity_id=bindparam('eid'), project_id=bindparam('pid'))
+    scanned = filled = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.action)
+            .where(table.c.entity_type.is_(None), table.c.id > last_id)
+            .order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        scanned += len(rows)
+        last_id = rows[-1].id
+
+        parsed = {}
+        for log_id, action in rows:
+            entity_type, entity_id = parse_action_entity(action)
+            if entity_type:
+                parsed[log_id] = (entity_type, entity_id)
+        owners = {}
+        for entity_type in {etype for etype, _ in parsed.values()}:
+            ids = [eid for etype, eid in parsed.values() if etype == entity_type]
+            owners[entity_type] = resolve_project_ids(entity_type, ids)
+
+        params = [{'log_id': log_id, 'etype': etype, 'eid': eid, 'pid': owners[etype].get(eid)}
+                  for log_id, (etype, eid) in parsed.items()]
+        if params:
+            db.session.execute(stmt, params)
+            filled += len(params)
+        db.session.commit()
+    return scanned, filled
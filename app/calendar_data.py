@@ -0,0 +1,175 @@
+# app/calendar_data.py
+# Các truy vấn tổng hợp cho trang lịch: đếm bằng GROUP BY trong SQL,
+# chỉ lấy (theo tuple cột) những task thực sự được vẽ lên lưới.
+
+import hashlib
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import func
+
+from app import db
+from app.models import Task, UploadedFile, User
+from app.constants import TASK_STATUSES
+from app.recurrence import occurrences_in_range, recurring_parents_criteria
+from app.reference_data import user_names_digest
+from app.serializers import TASK_FIELDS, serialize_tasks
+
+# Số task tối đa hiển thị trong một ô của month view (phần còn lại là "+N more")
+MONTH_CELL_LIMIT = 10
+
+
+def get_grid_range(view_mode, start_date, end_date):
+    """Khoảng ngày của lưới lịch. Month view luôn là 6 tuần bắt đầu từ thứ Hai."""
+    if view_mode == 'month':
+        start_of_grid = start_date - timedelta(days=start_date.weekday())
+        return start_of_grid, start_of_grid + timedelta(days=41)
+    return start_date, end_date
+
+
+def _filter_range(query, start_date, end_date, who_id=None):
+    query = query.filter(Task.task_date.between(start_date, end_date))
+    if who_id is not None:
+        query = query.filter(Task.who_id == who_id)
+    return query
+
+
+def _in_range(occurrences, start_date, end_date):
+    return [o for o in occurrences if start_date <= o.task_date <= end_date]
+
+
+def count_by_user_status(start_date, end_date, who_id=None, occurrences=()):
+    """
+    {who_id: {status: count}} cho các task đã được giao người trong khoảng.
+    occurrences: các lần lặp ảo (app.recurrence) được cộng thêm vào số đếm.
+    """
+    query = db.session.query(Task.who_id, Task.status, func.count(Task.id)) \
+        .join(User, User.id == Task.who_id)
+    query = _filter_range(query, start_date, end_date, who_id)
+    counts = {}
+    for user_id, status, n in query.group_by(Task.who_id, Task.status):
+        counts.setdefault(user_id, {})[status] = n
+    for occ in _in_range(occurrences, start_date, end_date):
+        if occ.assignee:
+            user_counts = counts.setdefault(occ.who_id, {})
+            user_counts[occ.status] = user_counts.get(occ.status, 0) + 1
+    return counts
+
+
+def count_by_status(start_date, end_date, who_id=None, occurrences=()):
+    """{status: count} cho mọi status chuẩn (status không có task trả về 0)."""
+    query = db.session.query(Task.status, func.count(Task.id))
+    query = _filter_range(query, start_date, end_date, who_id)
+    counts = dict.fromkeys(TASK_STATUSES, 0)
+    counts.update(query.group_by(Task.status).all())
+    for occ in _in_range(occurrences, start_date, end_date):
+        counts[occ.status] = counts.get(occ.status, 0) + 1
+    return counts
+
+
+def count_by_date(start_date, end_date, who_id=None, occurrences=()):
+    """{'YYYY-MM-DD': count} — dùng cho nhãn "+N more" của month view."""
+    query = db.session.query(Task.task_date, func.count(Task.id))
+    query = _filter_range(query, start_date, end_date, who_id)
+    counts = {d.strftime('%Y-%m-%d'): n for d, n in query.group_by(Task.task_date)}
+    for occ in _in_range(occurrences, start_date, end_date):
+        day_str = occ.task_date.strftime('%Y-%m-%d')
+        counts[day_str] = counts.get(day_str, 0) + 1
+    return counts
+
+
+def load_grid_tasks(start_date, end_date, who_id=None, per_day_limit=None):
+    """
+    Lấy các task sẽ được vẽ lên lưới dưới dạng row TASK_FIELDS (không hydrate ORM).
+    Với per_day_limit, mỗi ngày chỉ lấy tối đa N task (ROW_NUMBER theo task_date).
+    """
+    query = db.session.query(*TASK_FIELDS)
+    if per_day_limit:
+        row_num = func.row_number().over(partition_by=Task.task_date, order_by=Task.id).label('row_num')
+        ranked = _filter_range(db.session.query(Task.id, row_num), start_date, end_date, who_id).subquery()
+        query = query.join(ranked, ranked.c.id == Task.id).filter(ranked.c.row_num <= per_day_limit)
+    else:
+        query = _filter_range(query, start_date, end_date, who_id)
+    return query.order_by(Task.task_date.desc(), Task.id).all()
+
+
+def build_summary(counts_by_user, users, tasks_by_user=None):
+    """
+    Ghép số đếm từ SQL với thông tin user để ra summary_data cho template.
+    tasks_by_user: {who_id: [task_dict, ...]} đã được serialize sẵn (không gọi lại to_dict).
+    task_count luôn là số đếm GROUP BY; list tasks có thể bị cắt, phần thiếu nằm ở 'more'.
+    """
+    users_by_id = {u.id: u for u in users}
+    tasks_by_user = tasks_by_user or {}
+    summary_data = []
+    for user_id, status_counts in counts_by_user.items():
+        user = users_by_id.get(user_id)
+        if not user:
+            continue
+        tasks = sorted(tasks_by_user.get(user_id, []), key=lambda t: t['date'] or '')
+        task_count = sum(status_counts.values())
+        summary_data.append({
+            'user': user.to_dict(),
+            'task_count': task_count,
+            'tasks': tasks,
+            # Month view chỉ lấy MONTH_CELL_LIMIT task mỗi ngày: số task có trong đếm nhưng không có trong list
+            'more': max(task_count - len(tasks), 0),
+            'status_counts': status_counts
+        })
+    summary_data.sort(key=lambda x: x['user']['username'])
+    return summary_data
+
+
+def build_calendar_data(view_mode, start_date, end_date, who_id=None, users=()):
+    """
+    Dữ liệu lưới lịch + summary cho một khoảng, dùng chung cho trang lịch và /api/calendar.
+    Số đếm lấy bằng GROUP BY; chỉ task được vẽ mới được lấy và serialize theo lô (một lần).
+    """
+    grid_start, grid_end = get_grid_range(view_mode, start_date, end_date)
+    per_day_limit = MONTH_CELL_LIMIT if view_mode == 'month' else None
+    grid_tasks = load_grid_tasks(grid_start, grid_end, who_id, per_day_limit)
+    # Các lần lặp của task lặp lại được sinh theo rule cho đúng khoảng lưới
+    occurrences = occurrences_in_range(grid_start, grid_end, who_id)
+
+    user_names = {u.id: u.username for u in users} if users else None
+    start_str, end_str = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    tasks_by_date = defaultdict(list)
+    tasks_by_user = defaultdict(list)
+    for task_dict in serialize_tasks(grid_tasks + occurrences, user_names):
+        tasks_by_date[task_dict['date']].append(task_dict)
+        if task_dict['who_id'] and start_str <= task_dict['date'] <= end_str:
+            tasks_by_user[task_dict['who_id']].append(task_dict)
+
+    counts_by_user = count_by_user_status(start_date, end_date, who_id, occurrences)
+    data = {
+        'grid_start': grid_start,
+        'grid_end': grid_end,
+        'tasks_by_date': tasks_by_date,
+        'summary_data': build_summary(counts_by_user, users, tasks_by_user)
+    }
+    if view_mode == 'month':
+        data['day_task_counts'] = count_by_date(grid_start, grid_end, who_id, occurrences)
+    elif view_mode == 'day':
+        data['day_stats'] = count_by_status(start_date, start_date, who_id, occurrences)
+    return data
+
+
+def calendar_etag(view_mode, start_date, end_date, who_id=None):
+    """
+    ETag cho dữ liệu lịch của một khoảng: số task + updated_at lớn nhất của task trong
+    lưới, của các task gốc lặp lại phủ lên lưới và của file đính kèm, cùng digest tên user
+    (tên assignee nằm trong payload). Xóa task làm đổi số đếm, sửa task làm đổi updated_at —
+    không cần dựng payload để so sánh.
+    """
+    grid_start, grid_end = get_grid_range(view_mode, start_date, end_date)
+    task_stamp = _filter_range(
+        db.session.query(func.count(Task.id), func.max(Task.updated_at)), grid_start, grid_end, who_id
+    ).one()
+    parent_stamp = db.session.query(func.count(Task.id), func.max(Task.updated_at)) \
+        .filter(*recurring_parents_criteria(grid_start, grid_end, who_id)).one()
+    attachment_stamp = _filter_range(
+        db.session.query(func.count(UploadedFile.id), func.max(UploadedFile.id)).join(Task, Task.id == UploadedFile.task_id),
+        grid_start, grid_end, who_id
+    ).one()
+    raw = '|'.join(str(v) for v in (view_mode, grid_start, grid_end, start_date, who_id,
+                                     *task_stamp, *parent_stamp, *attachment_stamp, user_names_digest()))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
@@ -0,0 +1,373 @@
+# app/critical_path.py
+# Lịch phụ thuộc finish-to-start (DependencyLink) giữa Task / KeyResult / Build theo phương pháp
+# đường găng (CPM): earliest / latest start, slack và đường găng, tính bằng một lượt topo O(V+E)
+# trên từng thành phần liên thông của đồ thị liên kết. Đồ thị và kết quả được giữ trong process;
+# commit dời ngày một nút chỉ làm tính lại thành phần chứa nút đó, commit thêm / xóa liên kết
+# nạp lại cấu trúc đồ thị và tính lại các thành phần chứa hai đầu liên kết.
+
+import threading
+from collections import defaultdict, deque, namedtuple
+from datetime import date
+from sqlalchemy import and_, delete, event, inspect, or_, select, union
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Build, DependencyLink, KeyResult, Task
+
+# Tiền tố id trên dhtmlxgantt (app.gantt_tree) <-> loại nút
+GANTT_PREFIXES = {'task': 'task', 'key_result': 'kr', 'build': 'build'}
+_TYPE_BY_PREFIX = {prefix: node_type for node_type, prefix in GANTT_PREFIXES.items()}
+NODE_MODELS = {'task': Task, 'key_result': KeyResult, 'build': Build}
+_TYPE_BY_MODEL = {model: node_type for node_type, model in NODE_MODELS.items()}
+_DATE_ATTRS = {'task': ('task_date',), 'key_result': ('start_date', 'end_date'), 'build': ('start_date', 'end_date')}
+
+_link = DependencyLink.__table__
+
+NodeSchedule = namedtuple('NodeSchedule',
+                          'earliest_start earliest_finish latest_start latest_finish slack critical conflict')
+
+
+def gantt_node_id(key):
+    node_type, node_id = key
+    return f"{GANTT_PREFIXES[node_type]}-{node_id}"
+
+
+def parse_gantt_node(value):
+    """'kr-3' -> ('key_result', 3); lần lặp ảo ('task-5:2025-01-01') hoặc id sai -> None."""
+    prefix, sep, raw_id = str(value or '').partition('-')
+    if not sep or prefix not in _TYPE_BY_PREFIX or not raw_id.isdigit():
+        return None
+    return _TYPE_BY_PREFIX[prefix], int(raw_id)
+
+
+def _span(node_type, obj):
+    """(ngày đầu, ngày cuối) dạng ordinal của một nút; None nếu chưa xếp lịch."""
+    if node_type == 'task':
+        return (obj.task_date.toordinal(),) * 2 if obj.task_date else None
+    if not obj.start_date:
+        return None
+    return obj.start_date.toordinal(), (obj.end_date or obj.start_date).toordinal()
+
+
+# ------------------------------------------------------------------------------
+# Đồ thị
+# ------------------------------------------------------------------------------
+class _Graph:
+    """Nút có ngày + cạnh finish-to-start (kèm lag) + thành phần liên thông (coi cạnh vô hướng)."""
+
+    def __init__(self, links, spans):
+        self.links = links  # [(link_id, source, target, lag)]
+        self.spans = spans  # (type, id) -> (start, end) ordinal, chỉ nút có ngày
+        self.linked = set()  # Mọi nút là đầu của một liên kết, kể cả chưa có ngày
+        self.succ, self.pred = defaultdict(list), defaultdict(list)
+        self.all_succ = defaultdict(list)
+        for link_id, source, target, lag in links:
+            self.linked.update((source, target))
+            self.all_succ[source].append(target)
+            if source in spans and target in spans:
+                self.succ[source].append((target, lag))
+                self.pred[target].append((source, lag))
+        self.component = {}
+        self.members = {}
+        for start in spans:
+            if start in self.component:
+                continue
+            members, queue = [], deque([start])
+            self.component[start] = start
+            while queue:
+                node = queue.popleft()
+                members.append(node)
+                for neighbour, _ in (*self.succ[node], *self.pred[node]):
+                    if neighbour not in self.component:
+                        self.component[neighbour] = start
+                        queue.append(neighbour)
+            self.members[start] = members
+
+    def reaches(self, source, target):
+        """Có đường đi source -> target không (BFS theo chiều cạnh, gồm cả nút chưa có ngày)."""
+        seen, queue = {source}, deque([source])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                return True
+            for successor in self.all_succ[node]:
+                if successor not in seen:
+                    seen.add(successor)
+                    queue.append(successor)
+        return False
+
+
+def _load_graph():
+    links = [(row.id, (row.source_type, row.source_id), (row.target_type, row.target_id), row.lag_days)
+             for row in db.session.execute(select(_link).order_by(_link.c.id))]
+    spans = {}
+    for node_type, model in NODE_MODELS.items():
+        linked_ids = union(
+            select(_link.c.source_id).where(_link.c.source_type == node_type),
+            select(_link.c.target_id).where(_link.c.target_type == node_type)
+        ).subquery()
+        columns = [getattr(model, attr) for attr in _DATE_ATTRS[node_type]]
+        for row in db.session.query(model.id, *columns).filter(model.id.in_(select(linked_ids.c[0]))):
+            span = _span(node_type, row)
+            if span:
+                spans[(node_type, row.id)] = span
+    return _Graph(links, spans)
+
+
+def _schedule_component(graph, members):
+    """CPM trên một thành phần: lượt xuôi theo thứ tự topo (Kahn), rồi lượt ngược."""
+    indegree = {node: len(graph.pred[node]) for node in members}
+    queue = deque(node for node in members if indegree[node] == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for successor, _ in graph.succ[node]:
+            indegree[successor] -= 1
+            if indegree[successor] == 0:
+                queue.append(successor)
+    # Nút nằm trên chu trình (dữ liệu cũ / sửa tay) không có thứ tự topo -> không xếp lịch
+    ordered = set(order)
+
+    earliest_start, earliest_finish = {}, {}
+    for node in order:
+        start, end = graph.spans[node]
+        es = start
+        for predecessor, lag in graph.pred[node]:
+            if predecessor in ordered:
+                es = max(es, earliest_finish[predecessor] + 1 + lag)
+        earliest_start[node] = es
+        earliest_finish[node] = es + (end - start)
+
+    if not order:
+        return {}
+    finish = max(earliest_finish.values())
+    latest_start, latest_finish = {}, {}
+    for node in reversed(order):
+        start, end = graph.spans[node]
+        lf = finish
+        for successor, lag in graph.succ[node]:
+            if successor in ordered:
+                lf = min(lf, latest_start[successor] - 1 - lag)
+        latest_finish[node] = lf
+        latest_start[node] = lf - (end - start)
+
+    results = {}
+    for node in order:
+        slack = latest_start[node] - earliest_start[node]
+        results[node] = NodeSchedule(
+            date.fromordinal(earliest_start[node]), date.fromordinal(earliest_finish[node]),
+            date.fromordinal(latest_start[node]), date.fromordinal(latest_finish[node]),
+            slack, slack <= 0, earliest_start[node] > graph.spans[node][0]
+        )
+    return results
+
+
+# ------------------------------------------------------------------------------
+# Trạng thái trong process
+# ------------------------------------------------------------------------------
+_lock = threading.Lock()
+_graph = None
+_results = {}  # (type, id) -> NodeSchedule, chỉ của các thành phần đã tính
+_dirty_nodes = set()  # Nút có liên kết đổi, áp dụng khi nạp lại đồ thị
+_version = 0
+
+
+def schedule_version():
+    """Tăng mỗi khi lịch phụ thuộc có thể đổi (liên kết, hoặc ngày của nút có liên kết)."""
+    with _lock:
+        return _version
+
+
+def _current_graph():
+    global _graph
+    with _lock:
+        if _graph is not None:
+            return _graph
+        version = _version
+    graph = _load_graph()
+    with _lock:
+        if _version == version:
+            _graph = graph
+            for node in _dirty_nodes:
+                root = graph.component.get(node)
+                for member in graph.members.get(root, ()):
+                    _results.pop(member, None)
+            _dirty_nodes.clear()
+            for node in [n for n in _results if n not in graph.spans]:
+                del _results[node]
+    return graph
+
+
+def schedule_for(keys=None):
+    """{(type, id): NodeSchedule} cho các nút (None = mọi nút có liên kết). Chỉ tính thành phần chưa có kết quả."""
+    graph = _current_graph()
+    keys = graph.spans.keys() if keys is None else [k for k in keys if k in graph.spans]
+    with _lock:
+        if graph is _graph:
+            for key in keys:
+                if key not in _results:
+                    _results.update(_schedule_component(graph, graph.members[graph.component[key]]))
+            return {key: _results[key] for key in keys if key in _results}
+    # Đồ thị vừa bị thay trong lúc nạp: tính tạm, không lưu
+    computed = {}
+    for key in keys:
+        if key not in computed:
+            computed.update(_schedule_component(graph, graph.members[graph.component[key]]))
+    return {key: computed[key] for key in keys if key in computed}
+
+
+def would_create_cycle(source, target):
+    """Liên kết source -> target có tạo chu trình không (target đã đi tới được source)."""
+    return source == target or _current_graph().reaches(target, source)
+
+
+def gantt_schedule(rows):
+    """
+    Gắn lịch vào các row dhtmlxgantt (es, ls, slack, critical, conflict) và trả danh sách
+    liên kết dạng dhtmlxgantt (type "0" = finish_to_start) có cả hai đầu nằm trong rows.
+    """
+    by_key = {}
+    for row in rows:
+        key = parse_gantt_node(row.get('id'))
+        if key:
+            by_key[key] = row
+    if not by_key:
+        return []
+    graph = _current_graph()
+    for key, result in schedule_for([k for k in by_key if k in graph.spans]).items():
+        by_key[key].update({
+            'es': result.earliest_start.isoformat(), 'ls': result.latest_start.isoformat(),
+            'slack': result.slack, 'critical': result.critical, 'conflict': result.conflict
+        })
+    links = []
+    for link_id, source, target, lag in graph.links:
+        if source in by_key and target in by_key:
+            links.append({
+                'id': link_id, 'source': gantt_node_id(source), 'target': gantt_node_id(target),
+                'type': '0', 'lag': lag,
+                'critical': bool(by_key[source].get('critical') and by_key[target].get('critical'))
+            })
+    return links
+
+
+def invalidate_schedule(nodes=None, structure=False):
+    """
+    Đánh dấu lịch cần tính lại. nodes = các nút đổi ngày / có liên kết đổi; structure = liên kết
+    thêm / xóa (nạp lại đồ thị). nodes None -> bỏ toàn bộ.
+    """
+    global _graph, _version
+    with _lock:
+        if nodes is None:
+            _graph = None
+            _results.clear()
+            _dirty_nodes.clear()
+            _version += 1
+            return
+        touched = False
+        for node in nodes:
+            if _graph is not None and node in _graph.component:
+                touched = True
+                for member in _graph.members[_graph.component[node]]:
+                    _results.pop(member, None)
+        if structure:
+            _graph = None
+            _dirty_nodes.update(nodes)
+            touched = True
+        if touched:
+            _version += 1
+
+
+def _move_nodes(spans):
+    """
+    Áp dụng ngày mới của các nút vào đồ thị đang giữ và chỉ bỏ kết quả của thành phần chứa chúng.
+    Nút có liên kết mà vừa có / mất ngày làm đổi cấu trúc -> nạp lại đồ thị. Chưa nạp đồ thị thì
+    lần nạp sau tự đọc ngày mới, không cần làm gì.
+    """
+    global _graph, _version
+    with _lock:
+        if _graph is None:
+            return
+        touched = [node for node in spans if node in _graph.linked]
+        for node in touched:
+            span = spans[node]
+            if node in _graph.spans and span is not None:
+                _graph.spans[node] = span
+                for member in _graph.members[_graph.component[node]]:
+                    _results.pop(member, None)
+            else:
+                _dirty_nodes.add(node)
+                _graph = None
+                break
+        if touched:
+            _version += 1
+
+
+# ------------------------------------------------------------------------------
+# Theo dõi thay đổi trong session
+# ------------------------------------------------------------------------------
+def _pending(session):
+    return session.info.setdefault('schedule_dirty', {
+        'all': False, 'spans': {}, 'link_nodes': set(), 'deleted': defaultdict(set)
+    })
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_schedule_changes(session, flush_context):
+    pending = _pending(session)
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        if isinstance(obj, DependencyLink):
+            pending['link_nodes'].update(((obj.source_type, obj.source_id), (obj.target_type, obj.target_id)))
+            continue
+        node_type = _TYPE_BY_MODEL.get(type(obj))
+        if node_type is None or obj in session.new:
+            continue
+        node = (node_type, obj.id)
+        if obj in session.deleted:
+            pending['deleted'][node_type].add(obj.id)
+        elif any(inspect(obj).attrs[a].history.has_changes() for a in _DATE_ATTRS[node_type]):
+            pending['spans'][node] = _span(node_type, obj)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_schedule_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and (mapper.class_ in _TYPE_BY_MODEL or mapper.class_ is DependencyLink):
+            _pending(orm_execute_state.session)['all'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _drop_dangling_links(session):
+    # Liên kết không có khóa ngoại: xóa theo khi Task / KR / Build ở một đầu bị xóa
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.get('schedule_dirty')
+    if not pending or not pending['deleted']:
+        return
+    ends = []
+    for node_type, ids in pending['deleted'].items():
+        ends.append(and_(_link.c.source_type == node_type, _link.c.source_id.in_(ids)))
+        ends.append(and_(_link.c.target_type == node_type, _link.c.target_id.in_(ids)))
+    session.execute(delete(_link).where(or_(*ends)))
+    pending['link_nodes'].update((t, i) for t, ids in pending['deleted'].items() for i in ids)
+    pending['deleted'].clear()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_schedule_on_commit(session):
+    pending = session.info.pop('schedule_dirty', None)
+    if not pending:
+        return
+    if pending['all']:
+        invalidate_schedule()
+        return
+    if pending['link_nodes']:
+        invalidate_schedule(pending['link_nodes'], structure=True)
+    if pending['spans']:
+        _move_nodes(pending['spans'])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_schedule_changes(session, previous_transaction):
+    session.info.pop('schedule_dirty', None)
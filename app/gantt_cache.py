@@ -0,0 +1,171 @@
+# app/gantt_cache.py
+# Cache payload gantt theo project. Mỗi project có cột gantt_version; commit nào chạm tới
+# chính Project hoặc Build / Objective / KeyResult / Task bên dưới sẽ tăng version của đúng
+# project đó (UPDATE theo tập trong cùng transaction, như app.progress). Payload đã serialize
+# được cache theo (project_id, version, biến thể) và trả kèm ETag để client nhận 304.
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+from app.reference_data import user_names_digest
+from app.single_flight import single_flight
+
+GANTT_CACHE_SIZE = 64
+
+_project = Project.__table__
+_build = Build.__table__
+_objective = Objective.__table__
+_kr = KeyResult.__table__
+
+_TRACKED_MODELS = (Project, Build, Objective, KeyResult, Task)
+
+
+# ------------------------------------------------------------------------------
+# Version
+# ------------------------------------------------------------------------------
+def project_version(project_id):
+    """gantt_version hiện tại của project; None nếu project không tồn tại."""
+    return db.session.execute(select(_project.c.gantt_version).where(_project.c.id == project_id)).scalar()
+
+
+def bump_project_versions(project_ids=None):
+    """Tăng gantt_version của các project (None = tất cả)."""
+    stmt = update(_project).values(gantt_version=_project.c.gantt_version + 1)
+    if project_ids is not None:
+        if not project_ids:
+            return
+        stmt = stmt.where(_project.c.id.in_(project_ids))
+    db.session.execute(stmt)
+
+
+def _resolve_project_ids(project_ids, build_ids, objective_ids, kr_ids):
+    """Đi ngược Task -> KR -> Objective -> Build -> Project để được các project bị ảnh hưởng."""
+    project_ids, build_ids, objective_ids = set(project_ids), set(build_ids), set(objective_ids)
+    if kr_ids:
+        objective_ids.update(oid for (oid,) in db.session.execute(
+            select(_kr.c.objective_id).where(_kr.c.id.in_(kr_ids), _kr.c.objective_id.isnot(None))))
+    if objective_ids:
+        for build_id, project_id in db.session.execute(
+                select(_objective.c.build_id, _objective.c.project_id).where(_objective.c.id.in_(objective_ids))):
+            if build_id:
+                build_ids.add(build_id)
+            if project_id:
+                project_ids.add(project_id)
+    if build_ids:
+        project_ids.update(pid for (pid,) in db.session.execute(
+            select(_build.c.project_id).where(_build.c.id.in_(build_ids), _build.c.project_id.isnot(None))))
+    return project_ids
+
+
+# ------------------------------------------------------------------------------
+# Payload đã serialize
+# ------------------------------------------------------------------------------
+_lock = threading.Lock()
+_payloads = OrderedDict()  # (project_id, version, users_stamp, variant) -> (etag, body)
+
+
+def gantt_payload(project_id, variant, build):
+    """
+    (etag, body JSON) của payload gantt. `variant` là tuple phân biệt chế độ / cửa sổ,
+    `build()` dựng payload (dict) khi cache chưa có. None nếu project không tồn tại.
+    """
+    version = project_version(project_id)
+    if version is None:
+        return None
+    # Tên assignee nằm trong payload: đổi tên user cũng đổi key
+    key = (project_id, version, user_names_digest(), variant)
+    with _lock:
+        cached = _payloads.get(key)
+        if cached:
+            _payloads.move_to_end(key)
+            return cached
+
+    def compute():
+        payload = build()
+        if payload is None:
+            return None
+        raw = '|'.join(str(part) for part in key)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest(), json.dumps(payload)
+
+    # Các request trùng key đến cùng lúc chờ chung một lần dựng
+    entry = single_flight(('gantt',) + key, compute)
+    if entry is None:
+        return None
+    with _lock:
+        _payloads[key] = entry
+        # Bản cũ hơn của cùng project không bao giờ được đọc lại nữa
+        for stale in [k for k in _payloads if k[0] == project_id and k[1] < version]:
+            del _payloads[stale]
+        while len(_payloads) > GANTT_CACHE_SIZE:
+            _payloads.popitem(last=False)
+    return entry
+
+
+# ------------------------------------------------------------------------------
+# Theo dõi thay đổi trong session và tăng version trước khi commit
+# ------------------------------------------------------------------------------
+def _values(obj, attr):
+    """Giá trị hiện tại + giá trị cũ (nếu vừa đổi) của một thuộc tính."""
+    history = inspect(obj).attrs[attr].history
+    return {v for v in (*history.added, *history.unchanged, *history.deleted) if v is not None}
+
+
+def _pending(session):
+    return session.info.setdefault('gantt_dirty', {
+        'all': False, 'project_ids': set(), 'build_ids': set(), 'objective_ids': set(), 'kr_ids': set()
+    })
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_gantt_changes(session, flush_context):
+    pending = _pending(session)
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        if not isinstance(obj, _TRACKED_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, Project):
+            pending['project_ids'].add(obj.id)
+        elif isinstance(obj, Build):
+            pending['project_ids'].update(_values(obj, 'project_id'))
+        elif isinstance(obj, Objective):
+            pending['project_ids'].update(_values(obj, 'project_id'))
+            pending['build_ids'].update(_values(obj, 'build_id'))
+        elif isinstance(obj, KeyResult):
+            pending['objective_ids'].update(_values(obj, 'objective_id'))
+        else:
+            pending['kr_ids'].update(_values(obj, 'key_result_id'))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_gantt_bulk(orm_execute_state):
+    # UPDATE / DELETE hàng loạt qua ORM: không biết row nào -> tăng version mọi project
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in _TRACKED_MODELS:
+            _pending(orm_execute_state.session)['all'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply_gantt_versions(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop('gantt_dirty', None)
+    if not pending:
+        return
+    if pending['all']:
+        bump_project_versions()
+    elif any(pending[k] for k in ('project_ids', 'build_ids', 'objective_ids', 'kr_ids')):
+        bump_project_versions(_resolve_project_ids(
+            pending['project_ids'], pending['build_ids'], pending['objective_ids'], pending['kr_ids']))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_gantt_changes(session, previous_transaction):
+    session.info.pop('gantt_dirty', None)
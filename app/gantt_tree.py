@@ -0,0 +1,306 @@
+# app/gantt_tree.py
+# Row cho dhtmlxgantt (Project -> Build -> Objective -> KR -> Task) của /api/dhtmlx-data.
+# Ngoài chế độ trả cả cây của một project, hỗ trợ nạp theo nhánh (branch loading của dhtmlxgantt):
+# lần đầu chỉ trả Project + Build kèm số con, mở nút nào thì gọi lại với parent=<id nút> để lấy
+# đúng một cấp con. Số con và khoảng ngày của KR được tính bằng truy vấn gộp, không nạp cả cây.
+# Mọi chế độ nhận cửa sổ (window_start, window_end): chỉ trả mục chồng lên cửa sổ, cắt gọn thanh
+# vào cửa sổ và thêm thanh tóm tắt (type 'hidden_summary') cho phần bị ẩn của mỗi lane.
+
+from datetime import timedelta
+from sqlalchemy import exists, func, or_
+from sqlalchemy.orm import subqueryload
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+from app.recurrence import expand_occurrences, recurring_parents_criteria
+from app.reference_data import get_reference_list
+from app.timeline_window import clip_span, hidden_spans
+from app.utils import active_in_window
+
+# Tiền tố id trên gantt -> cấp
+NODE_PREFIXES = {'proj': 'project', 'build': 'build', 'obj': 'objective', 'kr': 'key_result'}
+
+
+def gantt_end(d):
+    # dhtmlxgantt coi end_date là mốc không bao gồm -> cộng 1 ngày
+    return (d + timedelta(days=1)).isoformat()
+
+
+def parse_node_id(node_id):
+    """'build-12' -> ('build', 12); id không hợp lệ -> None."""
+    prefix, sep, raw_id = str(node_id or '').partition('-')
+    if not sep or prefix not in NODE_PREFIXES or not raw_id.isdigit():
+        return None
+    return NODE_PREFIXES[prefix], int(raw_id)
+
+
+def _user_names():
+    return {user.id: user.username for user in get_reference_list('users')}
+
+
+# ------------------------------------------------------------------------------
+# Row của từng cấp
+# ------------------------------------------------------------------------------
+def project_row(project):
+    return {
+        "id": f"proj-{project.id}", "text": project.name,
+        "start_date": project.start_date.isoformat(), "end_date": gantt_end(project.end_date),
+        "type": "project", "open": True, "progress": project.progress / 100.0
+    }
+
+
+def build_row(build):
+    return {
+        "id": f"build-{build.id}", "text": build.name,
+        "start_date": build.start_date.isoformat(), "end_date": gantt_end(build.end_date),
+        "type": "build", "parent": f"proj-{build.project_id}", "open": True,
+        "progress": build.progress / 100.0
+    }
+
+
+def objective_row(obj):
+    return {
+        "id": f"obj-{obj.id}", "text": obj.content,
+        "start_date": obj.start_date.isoformat(), "end_date": gantt_end(obj.end_date or obj.start_date),
+        "type": "objective", "parent": f"build-{obj.build_id}", "open": True,
+        "progress": obj.progress / 100.0
+    }
+
+
+def kr_row(kr, start_date, end_date):
+    return {
+        "id": f"kr-{kr.id}", "text": kr.content,
+        "start_date": start_date.isoformat(), "end_date": gantt_end(end_date),
+        "type": "key_result", "parent": f"obj-{kr.objective_id}", "open": True,
+        "progress": kr.progress / 100.0
+    }
+
+
+def task_row(task, user_names):
+    return {
+        "id": f"task-{task.id}", "text": task.what,
+        "start_date": task.task_date.isoformat(), "end_date": gantt_end(task.task_date),
+        "type": "task", "parent": f"kr-{task.key_result_id}",
+        "assignee_name": user_names.get(task.who_id, ""),
+        "progress": 1.0 if task.status == 'Done' else 0.0,
+    }
+
+
+def _kr_dates(kr, task_dates):
+    """Khoảng của KR: ngày của chính nó, thiếu thì lấy từ task; None nếu không xác định được."""
+    start_date = kr.start_date or (min(task_dates) if task_dates else None)
+    if not start_date:
+        return None
+    return start_date, kr.end_date or (max(task_dates) if task_dates else None) or start_date
+
+
+def _clip(row, start_date, end_date, window_start, window_end):
+    start_date, end_date, clipped = clip_span(start_date, end_date, window_start, window_end)
+    if clipped:
+        row.update({"start_date": start_date.isoformat(), "end_date": gantt_end(end_date), "clipped": True})
+    return row
+
+
+def _in_window(start_date, end_date, window_start, window_end):
+    return (not window_end or start_date <= window_end) and (not window_start or end_date >= window_start)
+
+
+def _summary_rows(spans_by_parent, parent_prefix, label):
+    """Thanh tóm tắt cho các mục bị ẩn trước / sau cửa sổ của mỗi lane cha."""
+    rows = []
+    for parent_id, sides in spans_by_parent.items():
+        for side, span in sides.items():
+            rows.append({
+                "id": f"hidden-{side}-{parent_prefix}-{parent_id}",
+                "text": f"{span.count} {label} ({'before' if side == 'before' else 'after'} window)",
+                "start_date": span.start_date.isoformat(), "end_date": gantt_end(span.end_date),
+                "type": "hidden_summary", "parent": f"{parent_prefix}-{parent_id}",
+                "hidden_count": span.count, "side": side, "readonly": True
+            })
+    return rows
+
+
+def _hidden_builds(project_ids, window_start, window_end):
+    if not (window_start or window_end) or not project_ids:
+        return []
+    spans = hidden_spans(Build.project_id, Build.start_date, Build.end_date, window_start, window_end,
+                         criteria=[Build.project_id.in_(project_ids), Build.end_date.isnot(None)])
+    return _summary_rows(spans, 'proj', 'builds')
+
+
+def _hidden_objectives(build_ids, window_start, window_end):
+    if not (window_start or window_end) or not build_ids:
+        return []
+    spans = hidden_spans(Objective.build_id, Objective.start_date, Objective.end_date, window_start, window_end,
+                         criteria=[Objective.build_id.in_(build_ids)])
+    return _summary_rows(spans, 'build', 'objectives')
+
+
+def _hidden_tasks(kr_ids, window_start, window_end):
+    if not (window_start or window_end) or not kr_ids:
+        return []
+    spans = hidden_spans(Task.key_result_id, Task.task_date, None, window_start, window_end,
+                         criteria=[Task.key_result_id.in_(kr_ids)])
+    return _summary_rows(spans, 'kr', 'tasks')
+
+
+def _lazy(row, child_count):
+    """Đánh dấu row có con chưa nạp: dhtmlxgantt (branch_loading) đọc '$has_child'."""
+    row.update({"open": False, "$has_child": child_count > 0, "child_count": child_count})
+    return row
+
+
+# ------------------------------------------------------------------------------
+# Cả cây của một project
+# ------------------------------------------------------------------------------
+def project_tree_rows(project_id, window_start=None, window_end=None):
+    """Toàn bộ row của project (trong cửa sổ nếu có); None nếu project không tồn tại."""
+    project = Project.query.options(
+        subqueryload(Project.builds.and_(active_in_window(Build, window_start, window_end)))
+        .subqueryload(Build.objectives.and_(active_in_window(Objective, window_start, window_end)))
+        .subqueryload(Objective.key_results).subqueryload(KeyResult.tasks)
+    ).get(project_id)
+    if project is None:
+        return None
+
+    # Lần lặp ảo của các task lặp lại, gom theo KR
+    project_tasks = [t for b in project.builds for o in b.objectives for kr in o.key_results for t in kr.tasks]
+    occurrences_by_kr = {}
+    for occ in expand_occurrences(project_tasks):
+        occurrences_by_kr.setdefault(occ.key_result_id, []).append(occ)
+    user_names = _user_names()
+
+    rows = []
+    if project.start_date and project.end_date:
+        rows.append(_clip(project_row(project), project.start_date, project.end_date, window_start, window_end))
+    build_ids, kr_ids = [], []
+    for build in project.builds:
+        if not build.start_date or not build.end_date:
+            continue
+        build_ids.append(build.id)
+        rows.append(_clip(build_row(build), build.start_date, build.end_date, window_start, window_end))
+        for obj in build.objectives:
+            if not obj.start_date:
+                continue
+            rows.append(_clip(objective_row(obj), obj.start_date, obj.end_date or obj.start_date,
+                              window_start, window_end))
+            for kr in obj.key_results:
+                kr_tasks = kr.tasks + occurrences_by_kr.get(kr.id, [])
+                dates = _kr_dates(kr, [t.task_date for t in kr_tasks if t.task_date])
+                if not dates or not _in_window(*dates, window_start, window_end):
+                    continue
+                kr_ids.append(kr.id)
+                rows.append(_clip(kr_row(kr, *dates), *dates, window_start, window_end))
+                rows.extend(task_row(task, user_names) for task in kr_tasks
+                            if task.task_date and _in_window(task.task_date, task.task_date, window_start, window_end))
+
+    rows += _hidden_builds([project.id], window_start, window_end)
+    rows += _hidden_objectives(build_ids, window_start, window_end)
+    rows += _hidden_tasks(kr_ids, window_start, window_end)
+    return rows
+
+
+# ------------------------------------------------------------------------------
+# Nạp theo nhánh
+# ------------------------------------------------------------------------------
+def _objective_counts(build_ids):
+    """{build_id: số Objective có ngày bắt đầu}."""
+    if not build_ids:
+        return {}
+    return dict(db.session.query(Objective.build_id, func.count(Objective.id))
+                .filter(Objective.build_id.in_(build_ids), Objective.start_date.isnot(None))
+                .group_by(Objective.build_id).all())
+
+
+def _kr_counts(objective_ids):
+    """{objective_id: số KR hiện được trên gantt} — KR có ngày riêng hoặc có task đã xếp ngày."""
+    if not objective_ids:
+        return {}
+    has_dated_task = exists().where(Task.key_result_id == KeyResult.id, Task.task_date.isnot(None))
+    return dict(db.session.query(KeyResult.objective_id, func.count(KeyResult.id))
+                .filter(KeyResult.objective_id.in_(objective_ids),
+                        or_(KeyResult.start_date.isnot(None), has_dated_task))
+                .group_by(KeyResult.objective_id).all())
+
+
+def _kr_task_spans(kr_ids):
+    """{kr_id: [ngày sớm nhất, muộn nhất, số task]} gồm cả lần lặp ảo."""
+    if not kr_ids:
+        return {}
+    spans = {
+        kr_id: [lo, hi, count] for kr_id, lo, hi, count in db.session.query(
+            Task.key_result_id, func.min(Task.task_date), func.max(Task.task_date), func.count(Task.id)
+        ).filter(Task.key_result_id.in_(kr_ids), Task.task_date.isnot(None)).group_by(Task.key_result_id)
+    }
+    parents = Task.query.filter(Task.key_result_id.in_(kr_ids), *recurring_parents_criteria()).all()
+    for occ in expand_occurrences(parents):
+        span = spans[occ.key_result_id]  # Task gốc có ngày nên KR đã có trong spans
+        span[0], span[1], span[2] = min(span[0], occ.task_date), max(span[1], occ.task_date), span[2] + 1
+    return spans
+
+
+def _build_rows(project_id, window_start, window_end):
+    builds = Build.query.filter(Build.project_id == project_id, Build.start_date.isnot(None), Build.end_date.isnot(None),
+                                active_in_window(Build, window_start, window_end)).order_by(Build.id).all()
+    counts = _objective_counts([b.id for b in builds])
+    rows = [_lazy(_clip(build_row(b), b.start_date, b.end_date, window_start, window_end), counts.get(b.id, 0))
+            for b in builds]
+    return rows + _hidden_builds([project_id], window_start, window_end)
+
+
+def project_top_rows(project_id, window_start=None, window_end=None):
+    """Row Project + Build kèm số con (Objective chưa nạp); None nếu project không tồn tại."""
+    project = db.session.get(Project, project_id)
+    if project is None:
+        return None
+    rows = []
+    if project.start_date and project.end_date:
+        rows.append(_clip(project_row(project), project.start_date, project.end_date, window_start, window_end))
+    return rows + _build_rows(project_id, window_start, window_end)
+
+
+def branch_rows(node_id, window_start=None, window_end=None):
+    """
+    Một cấp con của nút gantt `node_id` ('proj-1', 'build-2', 'obj-3', 'kr-4') trong cửa sổ;
+    None nếu id sai. child_count luôn là tổng số con, không phụ thuộc cửa sổ.
+    """
+    node = parse_node_id(node_id)
+    if node is None:
+        return None
+    level, parent_id = node
+
+    if level == 'project':
+        return _build_rows(parent_id, window_start, window_end)
+
+    if level == 'build':
+        objectives = Objective.query.filter(Objective.build_id == parent_id, Objective.start_date.isnot(None),
+                                            active_in_window(Objective, window_start, window_end)) \
+            .order_by(Objective.id).all()
+        counts = _kr_counts([o.id for o in objectives])
+        rows = [_lazy(_clip(objective_row(o), o.start_date, o.end_date or o.start_date, window_start, window_end),
+                      counts.get(o.id, 0)) for o in objectives]
+        return rows + _hidden_objectives([parent_id], window_start, window_end)
+
+    if level == 'objective':
+        key_results = KeyResult.query.filter_by(objective_id=parent_id).order_by(KeyResult.id).all()
+        spans = _kr_task_spans([kr.id for kr in key_results])
+        rows = []
+        for kr in key_results:
+            lo, hi, count = spans.get(kr.id, (None, None, 0))
+            dates = _kr_dates(kr, [d for d in (lo, hi) if d])
+            if dates and _in_window(*dates, window_start, window_end):
+                rows.append(_lazy(_clip(kr_row(kr, *dates), *dates, window_start, window_end), count))
+        return rows
+
+    query = Task.query.filter(Task.key_result_id == parent_id, Task.task_date.isnot(None))
+    if window_start:
+        query = query.filter(Task.task_date >= window_start)
+    if window_end:
+        query = query.filter(Task.task_date <= window_end)
+    tasks = query.order_by(Task.id).all()
+    # Task gốc của chuỗi lặp có thể nằm trước cửa sổ mà vẫn sinh lần lặp trong cửa sổ
+    parents = Task.query.filter(Task.key_result_id == parent_id,
+                                *recurring_parents_criteria(window_start, window_end)).all()
+    user_names = _user_names()
+    rows = [task_row(task, user_names) for task in tasks + expand_occurrences(parents, window_start, window_end)]
+    return rows + _hidden_tasks([parent_id], window_start, window_end)
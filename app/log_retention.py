@@ -0,0 +1,101 @@
+# app/log_retention.py
+# Thời hạn lưu nhật ký: Log cũ hơn N ngày được chuyển sang bảng log_archive theo lô (INSERT ...
+# SELECT rồi DELETE trong cùng transaction), để bảng log đọc trên mỗi trang (index, okr_page,
+# tab hoạt động project) luôn nhỏ. Chạy bằng lệnh archive-logs (cron) hoặc thread nền hằng ngày;
+# bản lưu trữ được tra khi cần qua query_archived_logs / /api/logs/archive.
+
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select
+
+from app import db
+from app.models import Log, LogArchive
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_PAGE_SIZE = 50
+ARCHIVE_MAX_PAGE_SIZE = 500
+
+_log = Log.__table__
+_archive = LogArchive.__table__
+_COLUMNS = ('action', 'timestamp', 'user_id', 'entity_type', 'entity_id', 'project_id')
+
+
+def archive_old_logs(days, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+    """
+    Chuyển các Log có timestamp cũ hơn `days` ngày sang log_archive, mỗi lô một transaction
+    (đã commit). Trả về số dòng đã chuyển.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=days)
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(_log.c.id).where(_log.c.timestamp < cutoff).order_by(_log.c.id).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        db.session.execute(insert(_archive).from_select(
+            ['log_id', *_COLUMNS, 'archived_at'],
+            select(_log.c.id, *(_log.c[col] for col in _COLUMNS), literal(now, _archive.c.archived_at.type))
+            .where(_log.c.id.in_(ids))))
+        db.session.execute(delete(_log).where(_log.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+    return moved
+
+
+def query_archived_logs(start=None, end=None, project_id=None, entity_type=None, entity_id=None,
+                        user_id=None, search=None, page=1, per_page=ARCHIVE_PAGE_SIZE):
+    """
+    Tra log đã lưu trữ, mới nhất trước. start / end là ngày (UTC, end tính trọn ngày); search
+    lọc theo nội dung action. Trả về (danh sách LogArchive, còn trang sau hay không).
+    """
+    query = LogArchive.query
+    if start:
+        query = query.filter(LogArchive.timestamp >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.filter(LogArchive.timestamp < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    if project_id:
+        query = query.filter(LogArchive.project_id == project_id)
+    if entity_type:
+        query = query.filter(LogArchive.entity_type == entity_type)
+        if entity_id:
+            query = query.filter(LogArchive.entity_id == entity_id)
+    if user_id:
+        query = query.filter(LogArchive.user_id == user_id)
+    if search:
+        query = query.filter(LogArchive.action.ilike(f"%{search}%"))
+    per_page = max(1, min(per_page, ARCHIVE_MAX_PAGE_SIZE))
+    rows = query.order_by(LogArchive.timestamp.desc(), LogArchive.id.desc()) \
+        .offset((max(page, 1) - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+# ------------------------------------------------------------------------------
+# Lịch chạy: một thread nền chuyển log cũ khi khởi động và sau mỗi 24 giờ
+# ------------------------------------------------------------------------------
+def _archive_once(app):
+    with app.app_context():
+        try:
+            days = app.config.get('LOG_RETENTION_DAYS')
+            if days:
+                moved = archive_old_logs(days)
+                if moved:
+                    app.logger.info('Log retention: archived %s rows older than %s days', moved, days)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Log retention failed: {e}")
+        finally:
+            db.session.remove()
+
+
+def start_log_retention_scheduler(app):
+    """Khởi động thread chuyển log cũ hằng ngày (gọi từ điểm chạy server: run.py / launcher.py)."""
+    def loop():
+        while True:
+            _archive_once(app)
+            time.sleep(24 * 3600)
+
+    thread = threading.Thread(target=loop, name='log-retention', daemon=True)
+    thread.start()
+    return thread
@@ -3,7 +3,7 @@ from app import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import url_for
-import json
+from sqlalchemy import event
 
 
 # ==============================================================================
@@ -41,6 +41,8 @@ class User(UserMixin, db.Model):
 # ==============================================================================
 
 class Task(db.Model):
+    # Index cho task của một KR trong cửa sổ thời gian (gantt, app.timeline_window)
+    __table_args__ = (db.Index('ix_task_key_result_date', 'key_result_id', 'task_date'),)
     id = db.Column(db.Integer, primary_key=True)
     task_date = db.Column(db.Date, nullable=True, index=True)
     hour = db.Column(db.Integer, nullable=True)
@@ -52,12 +54,29 @@ class Task(db.Model):
     recurrence = db.Column(db.String(20), default='none')
     recurrence_end_date = db.Column(db.Date)
     priority = db.Column(db.String(20), default='Medium') # Thêm cột priority
+    # Dấu thời gian cho đồng bộ delta (/api/tasks/changes) và ETag của lịch.
+    # onupdate áp dụng cho mọi UPDATE qua ORM lẫn Query.update().
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Lặp lại theo quy tắc: task gốc giữ rule (recurrence + recurrence_end_date),
+    # các lần lặp được sinh khi đọc. Chỉ lần lặp bị sửa/hoàn thành mới thành row thật
+    # (exception) với recurrence_parent_id + recurrence_date = ngày gốc của lần lặp.
+    recurrence_parent_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=True, index=True)
+    recurrence_date = db.Column(db.Date, nullable=True)
+    recurrence_exdates = db.Column(db.Text, nullable=True)  # Các ngày đã xóa, 'YYYY-MM-DD' cách nhau bởi dấu phẩy
+    recurrence_exceptions = db.relationship('Task', backref=db.backref('recurrence_parent', remote_side=[id]))
     
     attachments = db.relationship('UploadedFile', backref='task', cascade="all, delete-orphan")
     key_result_id = db.Column(db.Integer, db.ForeignKey('key_result.id'), nullable=True)
 
+    @property
+    def is_recurring(self):
+        return self.recurrence in ('daily', 'weekly', 'monthly') and self.recurrence_end_date is not None
+
     def to_dict(self):
-        data = {
+        # Serialize nhiều task cùng lúc thì dùng app.serializers.serialize_tasks
+        return {
             'id': self.id,
             'date': self.task_date.strftime('%Y-%m-%d') if self.task_date else None,
             'hour': self.hour,
@@ -71,9 +90,22 @@ class Task(db.Model):
             'recurrence_end_date': self.recurrence_end_date.strftime('%Y-%m-%d') if self.recurrence_end_date else None,
             'attachments': [att.to_dict() for att in self.attachments],
             'key_result_id': self.key_result_id,
-            'priority': self.priority
+            'priority': self.priority,
+            'recurrence_parent_id': self.recurrence_parent_id
         }
-        return json.loads(json.dumps(data, ensure_ascii=False))
+
+class TaskTombstone(db.Model):
+    """Dấu vết của task đã xóa, để client đồng bộ delta biết cần gỡ task nào."""
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+@event.listens_for(Task, 'after_delete')
+def _record_task_tombstone(mapper, connection, target):
+    # Bắt được cả các task bị xóa theo cascade (KR, Objective, Build, Project)
+    connection.execute(TaskTombstone.__table__.insert().values(task_id=target.id, deleted_at=datetime.utcnow()))
+
 
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -81,14 +113,54 @@ class Log(db.Model):
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship('User', back_populates='logs')
+    # Đối tượng bị tác động và project chứa nó, ghi khi tạo log (app.audit) để tra theo index.
+    # Không đặt khóa ngoại: log vẫn giữ sau khi đối tượng / project bị xóa.
+    entity_type = db.Column(db.String(20), nullable=True)  # 'project' | 'build' | 'objective' | 'key_result' | 'task'
+    entity_id = db.Column(db.Integer, nullable=True)
+    project_id = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_log_entity', 'entity_type', 'entity_id'),
+        db.Index('ix_log_project_timestamp', 'project_id', 'timestamp'),
+    )
 
     def __repr__(self):
         return f'<Log {self.action}>'
 
+class LogArchive(db.Model):
+    """Log cũ hơn thời hạn lưu, được chuyển khỏi bảng log (app.log_retention). log_id là id gốc."""
+    __table_args__ = (
+        db.Index('ix_log_archive_entity', 'entity_type', 'entity_id'),
+        db.Index('ix_log_archive_project_timestamp', 'project_id', 'timestamp'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    log_id = db.Column(db.Integer, nullable=False, index=True)
+    action = db.Column(db.String(500), nullable=False)
+    timestamp = db.Column(db.DateTime, index=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    entity_type = db.Column(db.String(20), nullable=True)
+    entity_id = db.Column(db.Integer, nullable=True)
+    project_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.log_id,
+            'action': self.action,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'user_id': self.user_id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'project_id': self.project_id,
+            'archived_at': self.archived_at.isoformat()
+        }
+
 # ==============================================================================
 # OKR & KAIZEN MODELS
 # ==============================================================================
 class Project(db.Model):
+    # Index cho truy vấn "active in window" (app.utils.active_in_window)
+    __table_args__ = (db.Index('ix_project_window', 'start_date', 'end_date'),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False, unique=True)
     description = db.Column(db.Text)
@@ -101,27 +173,19 @@ class Project(db.Model):
     objectives = db.relationship('Objective', backref='project', cascade="all, delete-orphan")
     builds = db.relationship('Build', backref='project', lazy=True, cascade="all, delete-orphan")
     position = db.Column(db.Integer, nullable=False, default=0, server_default='0')
-
-    @property
-    def progress(self):
-        """Tính tiến độ trung bình của tất cả Build trong Project."""
-        all_builds = self.builds
-        if not all_builds:
-            # Nếu không có build, thử tính qua objective không gán vào build
-            unassigned_objectives = [o for o in self.objectives if not o.build_id]
-            if not unassigned_objectives:
-                return 0
-            progress_values = [obj.progress for obj in unassigned_objectives if obj.progress is not None]
-        else:
-            progress_values = [b.progress for b in all_builds if b.progress is not None]
-
-        if not progress_values:
-            return 0
-        
-        return sum(progress_values) / len(progress_values)
+    # Tiến độ trung bình của các Build (chưa có Build thì của các Objective không gán Build).
+    # Được app.progress cập nhật khi commit, không tính lại khi đọc.
+    progress = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    # Tăng mỗi khi Project / Build / Objective / KR / Task bên dưới đổi (app.gantt_cache)
+    gantt_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
 
 class Build(db.Model):
+    # Index cho picker /api/builds/<project_id>: lọc theo project, sắp + tìm tiền tố theo tên
+    __table_args__ = (
+        db.Index('ix_build_project_name', 'project_id', 'name'),
+        db.Index('ix_build_window', 'start_date', 'end_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id',use_alter=True), nullable=True)
@@ -133,26 +197,19 @@ class Build(db.Model):
     owner = db.relationship('User', backref='builds_owned')
     
     objectives = db.relationship('Objective', backref='build', cascade="all, delete-orphan")
-
-    @property
-    def progress(self):
-        """Tính tiến độ trung bình của tất cả Objective trong Build."""
-        objectives_list = self.objectives
-        if not objectives_list:
-            return 0
-        
-        progress_values = [obj.progress for obj in objectives_list if obj.progress is not None]
-        if not progress_values:
-            return 0
-            
-        total_progress = sum(progress_values)
-        return round(total_progress / len(progress_values))
+    # Tiến độ trung bình (làm tròn) của các Objective, do app.progress cập nhật
+    progress = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f'<Build {self.name}>'
 
 # TÌM CLASS Objective VÀ THAY THẾ TOÀN BỘ BẰNG CODE NÀY
 class Objective(db.Model):
+    __table_args__ = (
+        db.Index('ix_objective_build_content', 'build_id', 'content'),
+        db.Index('ix_objective_window', 'start_date', 'end_date'),
+        db.Index('ix_objective_project_window', 'project_id', 'start_date', 'end_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.String(500), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
@@ -166,14 +223,14 @@ class Objective(db.Model):
     note = db.Column(db.Text, nullable=True)
 
     key_results = db.relationship('KeyResult', backref='objective', cascade="all, delete-orphan", order_by='KeyResult.id')
-
-    @property
-    def progress(self):
-        krs = self.key_results
-        if not krs: return 0
-        return sum(kr.progress for kr in krs) / len(krs)
+    # Tiến độ trung bình của các KR, do app.progress cập nhật
+    progress = db.Column(db.Float, nullable=False, default=0, server_default='0')
 # TÌM CLASS KeyResult VÀ THAY THẾ TOÀN BỘ BẰNG CODE NÀY
 class KeyResult(db.Model):
+    __table_args__ = (
+        db.Index('ix_key_result_objective_content', 'objective_id', 'content'),
+        db.Index('ix_key_result_window', 'start_date', 'end_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.String(500), nullable=False)
     start_date = db.Column(db.Date, nullable=True)
@@ -193,6 +250,53 @@ class KeyResult(db.Model):
         if self.target == 0: return 0
         return min(100, (self.current / self.target) * 100)
 
+class ProgressSnapshot(db.Model):
+    """Ảnh chụp tiến độ theo ngày của Project / Build / Objective, dùng cho biểu đồ burndown/burnup."""
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', 'snapshot_date', name='uq_progress_snapshot_entity_date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # 'project' | 'build' | 'objective'
+    entity_id = db.Column(db.Integer, nullable=False)
+    snapshot_date = db.Column(db.Date, nullable=False, index=True)
+    current = db.Column(db.Float, nullable=False, default=0)
+    target = db.Column(db.Float, nullable=False, default=0)
+    progress = db.Column(db.Float, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'date': self.snapshot_date.isoformat(),
+            'current': self.current,
+            'target': self.target,
+            'progress': self.progress
+        }
+
+class DependencyLink(db.Model):
+    """
+    Liên kết finish-to-start giữa Task / KeyResult / Build: target chỉ bắt đầu được sau khi
+    source kết thúc (+ lag ngày). Hai đầu lưu dạng (type, id), lịch tính ở app.critical_path.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('source_type', 'source_id', 'target_type', 'target_id', name='uq_dependency_link_pair'),
+        db.Index('ix_dependency_link_source', 'source_type', 'source_id'),
+        db.Index('ix_dependency_link_target', 'target_type', 'target_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    source_type = db.Column(db.String(20), nullable=False)  # 'task' | 'key_result' | 'build'
+    source_id = db.Column(db.Integer, nullable=False)
+    target_type = db.Column(db.String(20), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    lag_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source_type': self.source_type, 'source_id': self.source_id,
+            'target_type': self.target_type, 'target_id': self.target_id,
+            'lag_days': self.lag_days
+        }
+
 # ==============================================================================
 # UPLOADS MANAGER
 # ==============================================================================
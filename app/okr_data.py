@@ -0,0 +1,223 @@
+# app/okr_data.py
+# Dữ liệu cho trang OKR: số liệu dashboard tính bằng GROUP BY trong SQL,
+# cây Objective -> KR -> Task của tab chi tiết nạp bằng selectinload (mỗi cấp một truy vấn).
+# Số liệu dashboard được cache trong process theo khoảng ngày. Commit nào thêm / xóa task, đổi KR
+# hoặc status của task, hay đổi KR / Objective (qua session flush) chỉ xóa các mục có khoảng ngày
+# chồng lên Objective bị chạm; đổi tên / xóa Project và ghi hàng loạt qua ORM xóa toàn bộ. UPDATE
+# trên bảng (không qua mapper, vd. dời lịch) thì route tự gọi invalidate_okr_dashboard.
+
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app import db
+from app.models import KeyResult, Objective, Project, Task
+from app.utils import active_in_window
+
+
+def _objectives_in_range(start_date, end_date):
+    # Gồm cả Objective bắt đầu trước khoảng nhưng vẫn đang chạy
+    return active_in_window(Objective, start_date, end_date)
+
+
+def okr_dashboard_stats(start_date, end_date):
+    """
+    (total_stats, stats_by_project) cho các Objective hoạt động trong khoảng: số O / KR / task và
+    tiến độ trung bình theo project (0 = "Unassigned"), bằng một truy vấn gộp theo project.
+    """
+    kr_counts = db.session.query(KeyResult.objective_id, func.count(KeyResult.id).label('kr_count')) \
+        .group_by(KeyResult.objective_id).subquery()
+    task_counts = db.session.query(KeyResult.objective_id, func.count(Task.id).label('task_count')) \
+        .join(Task, Task.key_result_id == KeyResult.id).group_by(KeyResult.objective_id).subquery()
+
+    rows = db.session.query(
+        Objective.project_id, Project.name,
+        func.count(Objective.id),
+        func.coalesce(func.sum(kr_counts.c.kr_count), 0),
+        func.coalesce(func.sum(task_counts.c.task_count), 0),
+        func.avg(Objective.progress)
+    ).outerjoin(Project, Project.id == Objective.project_id) \
+        .outerjoin(kr_counts, kr_counts.c.objective_id == Objective.id) \
+        .outerjoin(task_counts, task_counts.c.objective_id == Objective.id) \
+        .filter(_objectives_in_range(start_date, end_date)) \
+        .group_by(Objective.project_id, Project.name)
+
+    total_stats = {'o': 0, 'kr': 0, 'task': 0}
+    stats_by_project = {}
+    for project_id, project_name, o_count, kr_count, task_count, avg_progress in rows:
+        pid = project_id if project_name is not None else 0  # 0 cho "Unassigned"
+        stats = stats_by_project.setdefault(pid, {
+            'name': project_name if project_name is not None else "Unassigned",
+            'o_count': 0, 'kr_count': 0, 'task_count': 0, 'avg_progress': 0
+        })
+        # Gộp có trọng số phòng khi nhiều project_id mồ côi cùng rơi vào "Unassigned"
+        total_o = stats['o_count'] + o_count
+        stats['avg_progress'] = (stats['avg_progress'] * stats['o_count'] + (avg_progress or 0) * o_count) / total_o
+        stats['o_count'] = total_o
+        stats['kr_count'] += kr_count
+        stats['task_count'] += task_count
+        total_stats['o'] += o_count
+        total_stats['kr'] += kr_count
+        total_stats['task'] += task_count
+    return total_stats, stats_by_project
+
+
+def load_okr_objectives(start_date, end_date, project_filter_id=None):
+    """Objective hoạt động trong khoảng (lọc theo project nếu có, 0 = chưa gán) kèm KR và task cho tab chi tiết."""
+    query = Objective.query.options(
+        joinedload(Objective.project),
+        selectinload(Objective.key_results).selectinload(KeyResult.tasks)
+    ).filter(_objectives_in_range(start_date, end_date))
+    if project_filter_id == 0:
+        query = query.filter(Objective.project_id.is_(None))
+    elif project_filter_id is not None:
+        query = query.filter(Objective.project_id == project_filter_id)
+    return query.all()
+
+
+# ------------------------------------------------------------------------------
+# Cache số liệu dashboard
+# ------------------------------------------------------------------------------
+DASHBOARD_CACHE_SIZE = 256
+
+_dashboard_lock = threading.Lock()
+_dashboard_cache = OrderedDict()  # (start, end) -> (total_stats, stats_by_project)
+_dashboard_generation = 0
+
+
+def cached_okr_dashboard_stats(start_date, end_date):
+    """okr_dashboard_stats có cache; kết quả dùng chung giữa các request nên không được sửa."""
+    key = (start_date, end_date)
+    with _dashboard_lock:
+        if key in _dashboard_cache:
+            _dashboard_cache.move_to_end(key)
+            return _dashboard_cache[key]
+        generation = _dashboard_generation
+
+    stats = okr_dashboard_stats(start_date, end_date)
+
+    with _dashboard_lock:
+        # Bỏ qua nếu có invalidate xen vào trong lúc đang tính (kết quả có thể đã cũ)
+        if _dashboard_generation == generation:
+            _dashboard_cache[key] = stats
+            while len(_dashboard_cache) > DASHBOARD_CACHE_SIZE:
+                _dashboard_cache.popitem(last=False)
+    return stats
+
+
+def _overlaps(span, window_start, window_end):
+    # Cùng điều kiện với active_in_window: start <= window_end AND (end hoặc start nếu thiếu end) >= window_start
+    start, end = span
+    if start is None:
+        return True  # Không rõ ngày bắt đầu: xóa cho chắc
+    return start <= window_end and (end or start) >= window_start
+
+
+def invalidate_okr_dashboard(*spans):
+    """
+    Xóa các mục cache có khoảng ngày chồng lên một trong các span (start, end) của Objective
+    vừa thay đổi. Không truyền span nào -> xóa toàn bộ. Span None được bỏ qua.
+    """
+    global _dashboard_generation
+    spans = [span for span in spans if span is not None] if spans else None
+    with _dashboard_lock:
+        if spans is not None and not spans:
+            return
+        _dashboard_generation += 1
+        if spans is None:
+            _dashboard_cache.clear()
+            return
+        for key in [k for k in _dashboard_cache if any(_overlaps(span, *k) for span in spans)]:
+            del _dashboard_cache[key]
+
+
+# ------------------------------------------------------------------------------
+# Theo dõi thay đổi trong session, chỉ xóa cache sau khi commit thành công
+# ------------------------------------------------------------------------------
+_DASHBOARD_MODELS = (Task, KeyResult, Objective, Project)
+
+
+def _pending(session):
+    return session.info.setdefault('okr_dashboard_dirty', {
+        'all': False, 'kr_ids': set(), 'objective_ids': set(), 'spans': set()
+    })
+
+
+def _values(obj, attr):
+    """Giá trị hiện tại + giá trị cũ (nếu vừa đổi) của một thuộc tính."""
+    history = inspect(obj).attrs[attr].history
+    return {v for v in (*history.added, *history.unchanged, *history.deleted) if v is not None}
+
+
+def _old_span(obj):
+    """(start_date, end_date) của Objective trước lần sửa đang flush."""
+    attrs = inspect(obj).attrs
+    return tuple((attrs[attr].history.deleted or [getattr(obj, attr)])[0] for attr in ('start_date', 'end_date'))
+
+
+def _changed(obj, *attrs):
+    return any(inspect(obj).attrs[attr].history.has_changes() for attr in attrs)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_dashboard_changes(session, flush_context):
+    pending = _pending(session)
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        dirty_only = obj in session.dirty
+        if isinstance(obj, Task):
+            if not dirty_only or _changed(obj, 'key_result_id', 'status'):
+                pending['kr_ids'].update(_values(obj, 'key_result_id'))
+        elif isinstance(obj, KeyResult):
+            if not dirty_only or _changed(obj, 'objective_id', 'current', 'target'):
+                pending['objective_ids'].update(_values(obj, 'objective_id'))
+        elif isinstance(obj, Objective):
+            if not dirty_only or _changed(obj, 'start_date', 'end_date', 'project_id'):
+                # Cả khoảng cũ lẫn khoảng mới: Objective dời ngày rời khỏi các kỳ cũ
+                pending['spans'].update({_old_span(obj), (obj.start_date, obj.end_date)})
+        elif isinstance(obj, Project):
+            # Tên project hiển thị trong số liệu; Objective của project bị xóa đi theo cascade
+            if obj in session.deleted or (dirty_only and _changed(obj, 'name')):
+                pending['all'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_dashboard_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in _DASHBOARD_MODELS:
+            _pending(orm_execute_state.session)['all'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _resolve_dashboard_spans(session):
+    # KR / Objective id -> khoảng ngày của Objective, đọc trước khi transaction đóng
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.get('okr_dashboard_dirty')
+    if not pending or pending['all']:
+        return
+    if pending['kr_ids']:
+        pending['objective_ids'].update(session.execute(
+            select(KeyResult.objective_id).where(KeyResult.id.in_(pending['kr_ids']))).scalars())
+        pending['kr_ids'].clear()
+    if pending['objective_ids']:
+        pending['spans'].update(tuple(row) for row in session.execute(
+            select(Objective.start_date, Objective.end_date).where(Objective.id.in_(pending['objective_ids']))))
+        pending['objective_ids'].clear()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dashboard_on_commit(session):
+    pending = session.info.pop('okr_dashboard_dirty', None)
+    if not pending:
+        return
+    if pending['all']:
+        invalidate_okr_dashboard()
+    elif pending['spans']:
+        invalidate_okr_dashboard(*pending['spans'])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_dashboard_changes(session, previous_transaction):
+    session.info.pop('okr_dashboard_dirty', None)
@@ -0,0 +1,132 @@
+# app/portfolio_gantt.py
+# Row gantt toàn portfolio cho /api/gantt-data. Mỗi cấp (Project, Build, Task, task gốc lặp lại)
+# là đúng một truy vấn lọc theo cấp cha bằng subquery, không joinedload chéo nhiều cấp; kết quả
+# được gom theo project id trong bộ nhớ rồi xuất danh sách trong một lượt. Số truy vấn không
+# phụ thuộc số project / build / task.
+
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+from app.recurrence import expand_occurrences, recurring_parents_criteria
+from app.timeline_window import clip_span, hidden_spans
+from app.utils import active_in_window
+
+_TASK_JOINS = [(KeyResult, KeyResult.id == Task.key_result_id), (Objective, Objective.id == KeyResult.objective_id)]
+
+
+def _task_row(task_id, what, task_date, status, dependency):
+    return {
+        'id': f'task-{task_id}', 'name': what,
+        'start': task_date.isoformat(), 'end': (task_date + timedelta(days=1)).isoformat(),
+        'progress': 100 if status == 'Done' else 0, 'dependencies': dependency
+    }
+
+
+def _dependency(project_id, build_id):
+    return f'build-{build_id}' if build_id else f'proj-{project_id}'
+
+
+def portfolio_gantt_rows(project_id=None, view_mode='detailed', window_start=None, window_end=None):
+    """
+    Danh sách row gantt: project, build, (detailed) task kèm lần lặp ảo, và thanh tóm tắt
+    các mục ngoài cửa sổ nếu có ?from=&to=. Task thuộc Objective đang hoạt động trong cửa sổ.
+    """
+    windowed = bool(window_start or window_end)
+    project_criteria = []
+    if project_id:
+        project_criteria.append(Project.id == project_id)
+    if windowed:
+        project_criteria.append(active_in_window(Project, window_start, window_end))
+    project_ids = select(Project.id).where(*project_criteria).scalar_subquery() if project_criteria else None
+
+    # Cấp 1: project
+    projects = db.session.query(Project.id, Project.name, Project.start_date, Project.end_date) \
+        .filter(*project_criteria).order_by(Project.id).all()
+
+    # Cấp 2: build, gom theo project
+    builds_by_project = defaultdict(list)
+    build_query = db.session.query(Build.id, Build.name, Build.project_id, Build.start_date, Build.end_date) \
+        .filter(Build.start_date.isnot(None), Build.end_date.isnot(None),
+                active_in_window(Build, window_start, window_end))
+    if project_ids is not None:
+        build_query = build_query.filter(Build.project_id.in_(project_ids))
+    for build in build_query.order_by(Build.id):
+        builds_by_project[build.project_id].append(build)
+
+    # Cấp 3 (detailed): task của các Objective đang hoạt động, kèm build / project của Objective
+    tasks_by_project = defaultdict(list)
+    if view_mode == 'detailed':
+        objective_criteria = [Objective.project_id.isnot(None), active_in_window(Objective, window_start, window_end)]
+        if project_ids is not None:
+            objective_criteria.append(Objective.project_id.in_(project_ids))
+
+        task_query = db.session.query(Task.id, Task.what, Task.task_date, Task.status,
+                                      Objective.project_id, Objective.build_id)
+        for target, onclause in _TASK_JOINS:
+            task_query = task_query.join(target, onclause)
+        task_query = task_query.filter(Task.task_date.isnot(None), *objective_criteria)
+        if window_start:
+            task_query = task_query.filter(Task.task_date >= window_start)
+        if window_end:
+            task_query = task_query.filter(Task.task_date <= window_end)
+        for task_id, what, task_date, status, pid, build_id in task_query.order_by(Objective.id, KeyResult.id, Task.id):
+            tasks_by_project[pid].append(_task_row(task_id, what, task_date, status, _dependency(pid, build_id)))
+
+        # Task gốc lặp lại (kể cả bắt đầu trước cửa sổ) -> lần lặp ảo trong cửa sổ
+        parent_query = db.session.query(Task, Objective.project_id, Objective.build_id)
+        for target, onclause in _TASK_JOINS:
+            parent_query = parent_query.join(target, onclause)
+        parent_rows = parent_query.options(joinedload(Task.assignee)) \
+            .filter(*recurring_parents_criteria(window_start, window_end), *objective_criteria).all()
+        owners = {task.id: (pid, build_id) for task, pid, build_id in parent_rows}
+        for occ in expand_occurrences([task for task, _, _ in parent_rows], window_start, window_end):
+            pid, build_id = owners[occ.recurrence_parent_id]
+            tasks_by_project[pid].append(_task_row(occ.id, occ.what, occ.task_date, occ.status,
+                                                   _dependency(pid, build_id)))
+
+    # Thanh tóm tắt các build / task nằm ngoài cửa sổ, mỗi project một lane
+    hidden = {}
+    if windowed:
+        scope = [Build.project_id.in_(project_ids)] if project_ids is not None else []
+        hidden['builds'] = hidden_spans(Build.project_id, Build.start_date, Build.end_date, window_start, window_end,
+                                        criteria=[*scope, Build.end_date.isnot(None)])
+        if view_mode == 'detailed':
+            scope = [Objective.project_id.in_(project_ids)] if project_ids is not None else []
+            hidden['tasks'] = hidden_spans(Objective.project_id, Task.task_date, None, window_start, window_end,
+                                           criteria=scope, joins=_TASK_JOINS)
+
+    # Xuất một lượt theo thứ tự project
+    rows = []
+    for project in projects:
+        if project.start_date and project.end_date:
+            start, end, _ = clip_span(project.start_date, project.end_date, window_start, window_end)
+            rows.append({
+                'id': f'proj-{project.id}', 'name': project.name,
+                'start': start.isoformat(), 'end': end.isoformat(),
+                'progress': 0, 'custom_class': 'gantt-project'
+            })
+
+        for build in builds_by_project.get(project.id, ()):
+            start, end, clipped = clip_span(build.start_date, build.end_date, window_start, window_end)
+            rows.append({
+                'id': f'build-{build.id}', 'name': build.name,
+                'start': start.isoformat(), 'end': end.isoformat(),
+                'progress': 0, 'dependencies': f'proj-{project.id}',
+                'custom_class': 'gantt-build gantt-clipped' if clipped else 'gantt-build'
+            })
+
+        for kind, spans in hidden.items():
+            for side, span in spans.get(project.id, {}).items():
+                rows.append({
+                    'id': f'hidden-{kind}-{side}-{project.id}', 'name': f'{span.count} {kind} ({side} window)',
+                    'start': span.start_date.isoformat(), 'end': span.end_date.isoformat(),
+                    'progress': 0, 'dependencies': f'proj-{project.id}',
+                    'custom_class': 'gantt-hidden-summary', 'hidden_count': span.count
+                })
+
+        rows.extend(tasks_by_project.get(project.id, ()))
+    return rows
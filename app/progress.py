@@ -0,0 +1,175 @@
+# app/progress.py
+# Tiến độ của Objective, Build và Project được lưu thành cột thay vì tính lại bằng
+# cách duyệt cây quan hệ mỗi lần đọc. Khi commit có thay đổi ở KR (current/target),
+# Objective hoặc Build, chỉ các nút cha bị ảnh hưởng được cập nhật lại bằng UPDATE
+# theo tập (Objective -> Build -> Project) ngay trong transaction đó.
+# current/target của KR được đếm từ task bằng truy vấn tổng hợp, không nạp từng task.
+
+from collections import defaultdict
+from sqlalchemy import and_, bindparam, case, event, exists, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+from app.recurrence import RECURRENCE_RULES, expand_occurrences, recurring_parents_criteria
+
+# Dùng bảng (không phải mapper) để UPDATE không bị coi là ghi ORM lên các model
+_kr = KeyResult.__table__
+_objective = Objective.__table__
+_build = Build.__table__
+_project = Project.__table__
+_task = Task.__table__
+
+_IS_DONE = case((_task.c.status == 'Done', 1), else_=0)
+_IS_RECURRING = case((and_(_task.c.recurrence.in_(RECURRENCE_RULES), _task.c.recurrence_end_date.isnot(None),
+                           _task.c.task_date.isnot(None)), 1), else_=0)
+
+# Cùng công thức với KeyResult.progress: current/target (%), tối đa 100, target = 0 -> 0
+KR_PROGRESS = case(
+    (_kr.c.target > 0, case((_kr.c.current >= _kr.c.target, 100.0),
+                            else_=_kr.c.current * 100.0 / _kr.c.target)),
+    else_=0.0
+)
+
+
+# ------------------------------------------------------------------------------
+# KR: current = số task Done, target = tổng số task (kể cả lần lặp ảo, luôn chưa Done)
+# ------------------------------------------------------------------------------
+def _occurrence_counts(kr_ids=None):
+    """{kr_id: số lần lặp ảo} của các task lặp lại gắn với KR."""
+    query = Task.query.filter(*recurring_parents_criteria())
+    if kr_ids is not None:
+        query = query.filter(Task.key_result_id.in_(kr_ids))
+    else:
+        query = query.filter(Task.key_result_id.isnot(None))
+    counts = defaultdict(int)
+    for occurrence in expand_occurrences(query.all()):
+        counts[occurrence.key_result_id] += 1
+    return counts
+
+
+def count_kr_tasks(kr_id):
+    """(done, total) của một KR bằng một truy vấn COUNT / SUM(CASE)."""
+    total, done, recurring = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(_IS_DONE), 0), func.coalesce(func.sum(_IS_RECURRING), 0))
+        .where(_task.c.key_result_id == kr_id)
+    ).one()
+    if recurring:
+        total += _occurrence_counts([kr_id]).get(kr_id, 0)
+    return done, total
+
+
+def recount_key_results():
+    """
+    Tính lại current/target cho toàn bộ KR: một UPDATE ... FROM theo nhóm key_result_id,
+    đưa KR không còn task về 0/0, rồi cộng lần lặp ảo cho số ít KR có task lặp lại.
+    """
+    counts = select(
+        _task.c.key_result_id, func.count().label('total'), func.sum(_IS_DONE).label('done')
+    ).where(_task.c.key_result_id.isnot(None)).group_by(_task.c.key_result_id).subquery()
+    db.session.execute(update(_kr).where(_kr.c.id == counts.c.key_result_id)
+                       .values(current=counts.c.done, target=counts.c.total))
+    db.session.execute(update(_kr).where(~exists().where(_task.c.key_result_id == _kr.c.id))
+                       .values(current=0, target=0))
+
+    extra = _occurrence_counts()
+    if extra:
+        db.session.execute(
+            update(_kr).where(_kr.c.id == bindparam('kr_id')).values(target=_kr.c.target + bindparam('extra')),
+            [{'kr_id': kr_id, 'extra': n} for kr_id, n in extra.items()]
+        )
+
+
+def _update(table, ids, **values):
+    stmt = update(table).values(**values)
+    if ids is not None:
+        stmt = stmt.where(table.c.id.in_(ids))
+    db.session.execute(stmt)
+
+
+def refresh_progress(objective_ids=None, build_ids=None, project_ids=None):
+    """
+    Tính lại cột progress từ dưới lên. None ở cấp Objective nghĩa là toàn bộ bảng;
+    các Build / Project chứa Objective bị ảnh hưởng được cộng thêm vào tự động.
+      Objective = trung bình progress của các KR
+      Build     = trung bình progress của các Objective (làm tròn)
+      Project   = trung bình progress của các Build; chưa có Build thì trung bình
+                  các Objective không gán Build
+    """
+    full = objective_ids is None
+    objective_ids = None if full else set(objective_ids)
+    build_ids = None if full else set(build_ids or ())
+    project_ids = None if full else set(project_ids or ())
+
+    if not full:
+        if objective_ids:
+            for build_id, project_id in db.session.execute(
+                    select(_objective.c.build_id, _objective.c.project_id).where(_objective.c.id.in_(objective_ids))):
+                if build_id:
+                    build_ids.add(build_id)
+                if project_id:
+                    project_ids.add(project_id)
+        if build_ids:
+            project_ids.update(pid for (pid,) in db.session.execute(
+                select(_build.c.project_id).where(_build.c.id.in_(build_ids), _build.c.project_id.isnot(None))))
+        if not (objective_ids or build_ids or project_ids):
+            return
+
+    if full or objective_ids:
+        kr_avg = select(func.avg(KR_PROGRESS)).where(_kr.c.objective_id == _objective.c.id).scalar_subquery()
+        _update(_objective, objective_ids, progress=func.coalesce(kr_avg, 0))
+
+    if full or build_ids:
+        objective_avg = select(func.avg(_objective.c.progress)) \
+            .where(_objective.c.build_id == _build.c.id).scalar_subquery()
+        _update(_build, build_ids, progress=func.round(func.coalesce(objective_avg, 0)))
+
+    if full or project_ids:
+        build_avg = select(func.avg(_build.c.progress)).where(_build.c.project_id == _project.c.id).scalar_subquery()
+        loose_avg = select(func.avg(_objective.c.progress)) \
+            .where(_objective.c.project_id == _project.c.id, _objective.c.build_id.is_(None)).scalar_subquery()
+        _update(_project, project_ids, progress=func.coalesce(build_avg, loose_avg, 0))
+
+
+# ------------------------------------------------------------------------------
+# Theo dõi thay đổi trong session và cập nhật tiến độ trước khi commit
+# ------------------------------------------------------------------------------
+def _values(obj, attr):
+    """Giá trị hiện tại + giá trị cũ (nếu vừa đổi) của một thuộc tính."""
+    history = inspect(obj).attrs[attr].history
+    return {v for v in (*history.added, *history.unchanged, *history.deleted) if v is not None}
+
+
+def _changed(obj, *attrs):
+    return any(inspect(obj).attrs[attr].history.has_changes() for attr in attrs)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_progress_changes(session, flush_context):
+    pending = session.info.setdefault('progress_dirty', {'objective_ids': set(), 'build_ids': set(), 'project_ids': set()})
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        dirty_only = obj in session.dirty
+        if isinstance(obj, KeyResult):
+            if not dirty_only or _changed(obj, 'current', 'target', 'objective_id'):
+                pending['objective_ids'].update(_values(obj, 'objective_id'))
+        elif isinstance(obj, Objective):
+            if not dirty_only or _changed(obj, 'build_id', 'project_id'):
+                pending['build_ids'].update(_values(obj, 'build_id'))
+                pending['project_ids'].update(_values(obj, 'project_id'))
+        elif isinstance(obj, Build):
+            if not dirty_only or _changed(obj, 'project_id'):
+                pending['project_ids'].update(_values(obj, 'project_id'))
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply_progress_changes(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop('progress_dirty', None)
+    if pending and any(pending.values()):
+        refresh_progress(**pending)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_progress_changes(session, previous_transaction):
+    session.info.pop('progress_dirty', None)
@@ -0,0 +1,312 @@
+# app/recurrence.py
+# Task lặp lại theo quy tắc: task gốc lưu rule (daily/weekly/monthly + ngày kết thúc),
+# các lần lặp được sinh ra khi đọc cho đúng cửa sổ thời gian đang xem.
+# Chỉ những lần lặp được sửa / hoàn thành mới được ghi thành row thật (exception).
+
+from datetime import date, datetime, timedelta
+from calendar import monthrange
+from sqlalchemy import exists, insert, or_
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Task, TaskTombstone, UploadedFile
+
+RECURRENCE_RULES = ('daily', 'weekly', 'monthly')
+
+
+# ------------------------------------------------------------------------------
+# Khóa của lần lặp ảo: 'parent_id:YYYY-MM-DD'
+# ------------------------------------------------------------------------------
+def occurrence_key(parent_id, occurrence_date):
+    return f"{parent_id}:{occurrence_date.isoformat()}"
+
+
+def parse_occurrence_key(task_ref):
+    """Trả về (parent_id, date) nếu task_ref là khóa lần lặp, ngược lại None."""
+    parent_str, sep, date_str = str(task_ref or '').partition(':')
+    if not sep or not parent_str.isdigit():
+        return None
+    try:
+        return int(parent_str), datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+# ------------------------------------------------------------------------------
+# Danh sách ngày đã xóa khỏi chuỗi (giống EXDATE của iCalendar)
+# ------------------------------------------------------------------------------
+def get_exdates(task):
+    if not task.recurrence_exdates:
+        return set()
+    return {datetime.strptime(s, '%Y-%m-%d').date() for s in task.recurrence_exdates.split(',') if s}
+
+
+def add_exdate(task, occurrence_date):
+    exdates = get_exdates(task)
+    exdates.add(occurrence_date)
+    task.recurrence_exdates = ','.join(sorted(d.isoformat() for d in exdates))
+
+
+# ------------------------------------------------------------------------------
+# Sinh ngày theo rule
+# ------------------------------------------------------------------------------
+def occurrence_dates(task, window_start=None, window_end=None):
+    """
+    Các ngày lặp của task (không gồm ngày của chính task gốc), giới hạn trong
+    [window_start, window_end] nếu có. Daily/weekly nhảy thẳng tới ngày đầu cửa sổ.
+    """
+    if not task.is_recurring or not task.task_date:
+        return []
+
+    first = task.task_date
+    lower = first + timedelta(days=1)
+    upper = task.recurrence_end_date
+    if window_start and window_start > lower:
+        lower = window_start
+    if window_end and window_end < upper:
+        upper = window_end
+    if lower > upper:
+        return []
+
+    dates = []
+    if task.recurrence in ('daily', 'weekly'):
+        step = 1 if task.recurrence == 'daily' else 7
+        steps_to_lower = -(-(lower - first).days // step)  # làm tròn lên
+        current = first + timedelta(days=steps_to_lower * step)
+        while current <= upper:
+            dates.append(current)
+            current += timedelta(days=step)
+    else:  # monthly — giữ ngày gốc, kẹp về ngày cuối tháng nếu tháng ngắn hơn
+        year, month = lower.year, lower.month
+        while True:
+            current = date(year, month, min(first.day, monthrange(year, month)[1]))
+            if current > upper:
+                break
+            if current >= lower:
+                dates.append(current)
+            month += 1
+            if month > 12:
+                month, year = 1, year + 1
+    return dates
+
+
+class TaskOccurrence:
+    """Một lần lặp ảo của task gốc, có cùng giao diện đọc với Task để dùng chung template/API."""
+    attachments = ()
+    report = None
+    recurrence = 'none'
+    recurrence_end_date = None
+    recurrence_exdates = None
+    is_recurring = False
+    is_occurrence = True
+
+    def __init__(self, parent, occurrence_date):
+        self.id = occurrence_key(parent.id, occurrence_date)
+        self.task_date = occurrence_date
+        self.recurrence_date = occurrence_date
+        self.recurrence_parent_id = parent.id
+        self.hour = parent.hour
+        self.what = parent.what
+        self.who_id = parent.who_id
+        self.assignee = parent.assignee
+        self.note = parent.note
+        self.priority = parent.priority
+        self.key_result_id = parent.key_result_id
+        self.status = 'Pending'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'date': self.task_date.strftime('%Y-%m-%d'),
+            'hour': self.hour,
+            'what': self.what,
+            'who': self.assignee.username if self.assignee else '',
+            'who_id': self.who_id,
+            'status': self.status,
+            'note': self.note,
+            'report': None,
+            'recurrence': 'none',
+            'recurrence_end_date': None,
+            'attachments': [],
+            'key_result_id': self.key_result_id,
+            'priority': self.priority,
+            'recurrence_parent_id': self.recurrence_parent_id,
+            'is_occurrence': True
+        }
+
+
+# ------------------------------------------------------------------------------
+# Đọc: sinh các lần lặp cho một cửa sổ
+# ------------------------------------------------------------------------------
+def recurring_parents_criteria(window_start=None, window_end=None, who_id=None):
+    """Điều kiện lọc các task gốc có rule lặp có thể sinh lần lặp trong cửa sổ."""
+    criteria = [
+        Task.recurrence.in_(RECURRENCE_RULES),
+        Task.recurrence_end_date.isnot(None),
+        Task.task_date.isnot(None)
+    ]
+    if window_start:
+        criteria.append(Task.recurrence_end_date >= window_start)
+    if window_end:
+        criteria.append(Task.task_date < window_end)
+    if who_id is not None:
+        criteria.append(Task.who_id == who_id)
+    return criteria
+
+
+def recurring_parents_query(window_start=None, window_end=None, who_id=None):
+    return Task.query.options(joinedload(Task.assignee)).filter(
+        *recurring_parents_criteria(window_start, window_end, who_id)
+    )
+
+
+def expand_occurrences(parents, window_start=None, window_end=None):
+    """
+    Sinh TaskOccurrence cho các task gốc trong cửa sổ. Bỏ qua những ngày đã xóa,
+    đã có exception, hoặc đã có row thật cùng (task_date, hour, what) — dữ liệu
+    cũ được tạo sẵn từng row trước khi có rule. Tổng cộng 2 truy vấn cho cả lô.
+    """
+    parents = [p for p in parents if p.is_recurring]
+    candidates = {p.id: occurrence_dates(p, window_start, window_end) for p in parents}
+    all_dates = [d for dates in candidates.values() for d in dates]
+    if not all_dates:
+        return []
+    lo, hi = min(all_dates), max(all_dates)
+
+    overridden = set(db.session.query(Task.recurrence_parent_id, Task.recurrence_date).filter(
+        Task.recurrence_parent_id.in_(candidates.keys()),
+        Task.recurrence_date.between(lo, hi)
+    ))
+    existing = set(db.session.query(Task.task_date, Task.hour, Task.what).filter(
+        Task.task_date.between(lo, hi),
+        Task.what.in_({p.what for p in parents})
+    ))
+
+    occurrences = []
+    for parent in parents:
+        skipped = get_exdates(parent)
+        for d in candidates[parent.id]:
+            if d in skipped or (parent.id, d) in overridden or (d, parent.hour, parent.what) in existing:
+                continue
+            occurrences.append(TaskOccurrence(parent, d))
+    return occurrences
+
+
+def occurrences_in_range(window_start=None, window_end=None, who_id=None):
+    parents = recurring_parents_query(window_start, window_end, who_id).all()
+    return expand_occurrences(parents, window_start, window_end)
+
+
+# ------------------------------------------------------------------------------
+# Ghi: biến một lần lặp thành exception khi người dùng sửa / hoàn thành nó
+# ------------------------------------------------------------------------------
+def resolve_task(task_ref):
+    """
+    taskId gửi từ client có thể là id của row thật hoặc khóa của lần lặp ảo.
+    Với lần lặp ảo, tạo exception row (đã flush, chưa commit). Không tìm thấy -> None.
+    """
+    ref = str(task_ref or '').strip()
+    if ref.isdigit():
+        return Task.query.get(int(ref))
+
+    parsed = parse_occurrence_key(ref)
+    if not parsed:
+        return None
+    parent_id, occurrence_date = parsed
+
+    existing = Task.query.filter_by(recurrence_parent_id=parent_id, recurrence_date=occurrence_date).first()
+    if existing:
+        return existing
+
+    parent = Task.query.get(parent_id)
+    if (not parent or occurrence_date in get_exdates(parent)
+            or occurrence_date not in occurrence_dates(parent, occurrence_date, occurrence_date)):
+        return None
+
+    task = Task(
+        task_date=occurrence_date, hour=parent.hour, what=parent.what, who_id=parent.who_id,
+        status='Pending', note=parent.note, priority=parent.priority, recurrence='none',
+        key_result_id=parent.key_result_id,
+        recurrence_parent_id=parent.id, recurrence_date=occurrence_date
+    )
+    db.session.add(task)
+    db.session.flush()
+    return task
+
+
+def skip_occurrence(task):
+    """Khi xóa một exception, ghi ngày gốc vào exdates của task gốc để lần lặp ảo không hiện lại."""
+    parent = task.recurrence_parent
+    if parent and task.recurrence_date:
+        add_exdate(parent, task.recurrence_date)
+
+
+# ------------------------------------------------------------------------------
+# Ghi hàng loạt: cho các tích hợp vẫn cần row thật cho từng lần lặp
+# ------------------------------------------------------------------------------
+def materialize_series(parent, window_start=None, window_end=None):
+    """
+    Ghi các lần lặp của task gốc thành exception row. Tính trước toàn bộ ngày,
+    tìm trùng bằng một truy vấn theo khoảng (task_date, hour, what) và chèn phần
+    còn thiếu bằng một lệnh INSERT hàng loạt. Trả về số row đã chèn (chưa commit).
+    """
+    dates = occurrence_dates(parent, window_start, window_end)
+    if not dates:
+        return 0
+
+    skipped = get_exdates(parent)
+    skipped.update(d for (d,) in db.session.query(Task.recurrence_date).filter(
+        Task.recurrence_parent_id == parent.id,
+        Task.recurrence_date.between(dates[0], dates[-1])
+    ))
+    skipped.update(d for (d,) in db.session.query(Task.task_date).filter(
+        Task.task_date.between(dates[0], dates[-1]),
+        Task.hour.is_(None) if parent.hour is None else Task.hour == parent.hour,
+        Task.what == parent.what
+    ))
+
+    rows = [{
+        'task_date': d, 'hour': parent.hour, 'what': parent.what, 'who_id': parent.who_id,
+        'status': 'Pending', 'note': parent.note, 'priority': parent.priority, 'recurrence': 'none',
+        'key_result_id': parent.key_result_id,
+        'recurrence_parent_id': parent.id, 'recurrence_date': d
+    } for d in dates if d not in skipped]
+    if rows:
+        db.session.execute(insert(Task), rows)
+    return len(rows)
+
+
+def _matches(column, value):
+    """column = value, so sánh được cả NULL."""
+    return column.is_(None) if value is None else column == value
+
+
+def trim_series(parent):
+    """
+    Xóa các row đã ghi của chuỗi nằm sau recurrence_end_date hiện tại. Chỉ xóa những lần lặp
+    vẫn y nguyên như task gốc sinh ra (Pending, cùng ngày / giờ / nội dung / ghi chú / người /
+    KR, chưa có báo cáo hay file đính kèm); lần lặp đã được người dùng sửa hoặc xử lý vẫn giữ
+    lại. Trả về số row đã xóa.
+    """
+    query = Task.query.filter(
+        Task.recurrence_parent_id == parent.id,
+        Task.status == 'Pending',
+        Task.task_date == Task.recurrence_date,
+        _matches(Task.what, parent.what),
+        _matches(Task.hour, parent.hour),
+        _matches(Task.note, parent.note),
+        _matches(Task.who_id, parent.who_id),
+        _matches(Task.priority, parent.priority),
+        _matches(Task.key_result_id, parent.key_result_id),
+        or_(Task.report.is_(None), Task.report == ''),
+        ~exists().where(UploadedFile.task_id == Task.id)
+    )
+    if parent.is_recurring:
+        query = query.filter(Task.recurrence_date > parent.recurrence_end_date)
+    # Xóa hàng loạt không qua mapper event nên tự ghi tombstone cho đồng bộ delta
+    task_ids = [task_id for (task_id,) in query.with_entities(Task.id)]
+    if not task_ids:
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(insert(TaskTombstone), [{'task_id': task_id, 'deleted_at': now} for task_id in task_ids])
+    return Task.query.filter(Task.id.in_(task_ids)).delete(synchronize_session=False)
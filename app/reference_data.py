@@ -0,0 +1,155 @@
+# app/reference_data.py
+# Cache dùng chung cho các danh sách tham chiếu (User, Project, Build, Objective, KeyResult)
+# dùng để đổ dropdown. Mỗi loại có một version; commit nào chạm tới bảng tương ứng
+# (qua session flush hoặc UPDATE/DELETE hàng loạt) sẽ tăng version sau after_commit
+# và lần đọc kế tiếp nạp lại danh sách. Cache không phụ thuộc request, sống theo process.
+
+import hashlib
+import threading
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, User
+from app.single_flight import single_flight
+
+
+class _Ref:
+    def to_dict(self):
+        return self._asdict()
+
+
+# Dạng gọn: chỉ các cột dropdown / template cần, đã sắp xếp sẵn
+class UserRef(_Ref, namedtuple('UserRef', 'id username')):
+    __slots__ = ()
+
+
+class ProjectRef(_Ref, namedtuple('ProjectRef', 'id name')):
+    __slots__ = ()
+
+
+class BuildRef(_Ref, namedtuple('BuildRef', 'id name project_id')):
+    __slots__ = ()
+
+
+class ObjectiveRef(_Ref, namedtuple('ObjectiveRef', 'id content project_id build_id')):
+    __slots__ = ()
+
+
+class KeyResultRef(_Ref, namedtuple('KeyResultRef', 'id content objective_id')):
+    __slots__ = ()
+
+
+# kind -> (model, lớp dạng gọn, cột sắp xếp)
+REFERENCE_KINDS = {
+    'users': (User, UserRef, User.username),
+    'projects': (Project, ProjectRef, Project.name),
+    'builds': (Build, BuildRef, Build.name),
+    'objectives': (Objective, ObjectiveRef, Objective.content),
+    'key_results': (KeyResult, KeyResultRef, KeyResult.content),
+}
+_KIND_BY_MODEL = {model: kind for kind, (model, _, _) in REFERENCE_KINDS.items()}
+
+_lock = threading.Lock()
+_versions = dict.fromkeys(REFERENCE_KINDS, 0)
+_cache = {}  # kind -> (version, tuple các Ref)
+_users_digest = (None, None)  # (version cache users, digest)
+
+
+def get_reference_list(kind):
+    """Danh sách tham chiếu dạng gọn, đã sắp xếp. Chỉ truy vấn DB khi version đã đổi."""
+    with _lock:
+        version = _versions[kind]
+        cached = _cache.get(kind)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    model, ref_cls, order_col = REFERENCE_KINDS[kind]
+    columns = [getattr(model, field) for field in ref_cls._fields]
+    items = single_flight(('reference', kind, version), lambda: tuple(
+        ref_cls(*row) for row in db.session.query(*columns).order_by(order_col, model.id)))
+
+    with _lock:
+        # Chỉ ghi nếu không có commit nào xen vào trong lúc đang nạp
+        if _versions[kind] == version:
+            _cache[kind] = (version, items)
+    return items
+
+
+def get_reference_data(*kinds):
+    """{kind: danh sách} cho nhiều loại cùng lúc; không truyền kinds -> tất cả."""
+    return {kind: get_reference_list(kind) for kind in (kinds or REFERENCE_KINDS)}
+
+
+def get_reference_item(kind, item_id):
+    return next((item for item in get_reference_list(kind) if item.id == item_id), None)
+
+
+def reference_versions():
+    with _lock:
+        return dict(_versions)
+
+
+def user_names_digest():
+    """
+    Digest danh sách (id, tên) user cho các ETag có tên assignee trong payload (lịch, gantt);
+    chỉ tính lại khi cache users đổi version.
+    """
+    global _users_digest
+    with _lock:
+        version, digest = _users_digest
+        if version == _versions['users']:
+            return digest
+    version = reference_versions()['users']
+    names = '|'.join(f"{u.id}:{u.username}" for u in get_reference_list('users'))
+    digest = hashlib.sha1(names.encode('utf-8')).hexdigest()[:12]
+    with _lock:
+        if _versions['users'] == version:
+            _users_digest = (version, digest)
+    return digest
+
+
+def invalidate_reference_data(*kinds):
+    with _lock:
+        for kind in (kinds or REFERENCE_KINDS):
+            _versions[kind] += 1
+            _cache.pop(kind, None)
+
+
+# ------------------------------------------------------------------------------
+# Theo dõi thay đổi trong session, chỉ vô hiệu hóa cache sau khi commit thành công
+# ------------------------------------------------------------------------------
+def _mark_dirty(session, kinds):
+    if kinds:
+        session.info.setdefault('reference_kinds_dirty', set()).update(kinds)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        kind = _KIND_BY_MODEL.get(type(obj))
+        if kind:
+            changed.add(kind)
+    _mark_dirty(session, changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        kind = _KIND_BY_MODEL.get(mapper.class_) if mapper is not None else None
+        _mark_dirty(orm_execute_state.session, {kind} if kind else set())
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    kinds = session.info.pop('reference_kinds_dirty', None)
+    if kinds:
+        invalidate_reference_data(*kinds)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_on_rollback(session, previous_transaction):
+    session.info.pop('reference_kinds_dirty', None)
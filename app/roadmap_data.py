@@ -0,0 +1,188 @@
+# app/roadmap_data.py
+# Payload vis-timeline cho /vis-roadmap-data (group = project, item = build). Payload được dựng
+# sẵn một lần và giữ theo version trong process; commit nào ghi Project / Build (qua session flush
+# hoặc UPDATE/DELETE hàng loạt) tăng version sau after_commit, lần đọc kế tiếp mới dựng lại.
+# Yêu cầu có cửa sổ ?from=&to= được cắt từ bản dựng sẵn trong bộ nhớ, không truy vấn DB.
+
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Build, Project
+from app.single_flight import single_flight
+from app.timeline_window import clip_span
+
+RoadmapBuild = namedtuple('RoadmapBuild', 'project_id start_date end_date item')
+Roadmap = namedtuple('Roadmap', 'version last_modified etag body groups project_names builds')
+
+_TRACKED_MODELS = (Project, Build)
+
+
+def phase_class(name):
+    """Lớp màu theo tiền tố tên build (P1, P2, E, D, PVT, còn lại là POC)."""
+    if not name: return ""
+    n = name.lower().strip()
+    if n.startswith("p1"): return "phase-p1"
+    if n.startswith("p2"): return "phase-p2"
+    if n.startswith("e1") or n.startswith("e"): return "phase-e1"
+    if n.startswith("e2"): return "phase-e2"
+    if n.startswith("d1") or n.startswith("d"): return "phase-d1"
+    if "pvt" in n: return "phase-pvt"
+    return "phase-poc"
+
+
+def _build_item(project_name, build_id, project_id, name, start_date, end_date):
+    label = (name or "Build").strip()
+    return {
+        "id": f"build-{build_id}",
+        "group": project_id,
+        "content": label,
+        "start": start_date.isoformat(),
+        "end": (end_date + timedelta(days=1)).isoformat(),
+        "className": f"phase {phase_class(name)}",
+        "title": f"{project_name} • {label} • {start_date} → {end_date}",
+        "project_id": project_id,
+    }
+
+
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+# ------------------------------------------------------------------------------
+# Bản dựng sẵn theo version
+# ------------------------------------------------------------------------------
+_lock = threading.Lock()
+_version = 0
+_changed_at = None  # thời điểm commit gần nhất làm đổi roadmap
+_roadmap = None
+
+
+def _load(version):
+    """Hai truy vấn: project theo thứ tự hiển thị, build có đủ ngày theo ngày bắt đầu."""
+    projects = db.session.query(Project.id, Project.name).order_by(Project.position, Project.name).all()
+    project_names = {pid: name for pid, name in projects}
+    builds = {}
+    for build_id, project_id, name, start_date, end_date in db.session.query(
+            Build.id, Build.project_id, Build.name, Build.start_date, Build.end_date) \
+            .filter(Build.project_id.isnot(None), Build.start_date.isnot(None), Build.end_date.isnot(None)) \
+            .order_by(Build.start_date, Build.id):
+        if project_id in project_names:
+            builds.setdefault(project_id, []).append(RoadmapBuild(
+                project_id, start_date, end_date,
+                _build_item(project_names[project_id], build_id, project_id, name, start_date, end_date)))
+
+    groups = [{"id": pid, "content": name or f"Project {pid}"} for pid, name in projects]
+    items = [build.item for pid, _ in projects for build in builds.get(pid, ())]
+    body = json.dumps({"success": True, "groups": groups, "items": items})
+    last_modified = _changed_at or datetime.now(timezone.utc).replace(microsecond=0)
+    return Roadmap(version, last_modified, _etag(body), body, groups, project_names, builds)
+
+
+def get_roadmap():
+    """Roadmap dựng sẵn; chỉ truy vấn DB khi version đã đổi kể từ lần dựng trước."""
+    global _roadmap
+    with _lock:
+        version, cached = _version, _roadmap
+    if cached and cached.version == version:
+        return cached
+    # Nhiều màn hình polling ngay sau một lần ghi: chỉ một thread dựng lại
+    roadmap = single_flight(('roadmap', version), lambda: _load(version))
+    with _lock:
+        # Chỉ ghi nếu không có commit nào xen vào trong lúc đang dựng
+        if _version == version:
+            _roadmap = roadmap
+    return roadmap
+
+
+def roadmap_payload(window_start=None, window_end=None):
+    """
+    (etag, last_modified, body JSON). Không có cửa sổ -> body dựng sẵn; có cửa sổ -> build được
+    lọc / cắt vào cửa sổ và build nằm ngoài gộp thành một thanh "+N" mỗi phía cho mỗi project.
+    """
+    roadmap = get_roadmap()
+    if not (window_start or window_end):
+        return roadmap.etag, roadmap.last_modified, roadmap.body
+
+    items = []
+    for group in roadmap.groups:
+        pid = group["id"]
+        hidden = {}
+        for build in roadmap.builds.get(pid, ()):
+            if window_start and build.end_date < window_start:
+                hidden.setdefault('before', []).append(build)
+            elif window_end and build.start_date > window_end:
+                hidden.setdefault('after', []).append(build)
+            else:
+                start, end, clipped = clip_span(build.start_date, build.end_date, window_start, window_end)
+                item = dict(build.item, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat())
+                if clipped:
+                    item["className"] += " clipped"
+                items.append(item)
+
+        for side in ('before', 'after'):
+            if side not in hidden:
+                continue
+            count = len(hidden[side])
+            first = min(b.start_date for b in hidden[side])
+            last = max(b.end_date for b in hidden[side])
+            items.append({
+                "id": f"hidden-{side}-{pid}",
+                "group": pid,
+                "content": f"+{count}",
+                "start": first.isoformat(),
+                "end": (last + timedelta(days=1)).isoformat(),
+                "className": "phase hidden-summary",
+                "title": f"{roadmap.project_names[pid]} • {count} builds • {first} → {last}",
+                "project_id": pid,
+                "hidden_count": count,
+            })
+
+    body = json.dumps({"success": True, "groups": roadmap.groups, "items": items})
+    return _etag(roadmap.etag, window_start, window_end), roadmap.last_modified, body
+
+
+def invalidate_roadmap():
+    global _version, _roadmap, _changed_at
+    with _lock:
+        _version += 1
+        _roadmap = None
+        _changed_at = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+# ------------------------------------------------------------------------------
+# Theo dõi thay đổi trong session, chỉ dựng lại sau khi commit thành công
+# ------------------------------------------------------------------------------
+@event.listens_for(Session, 'after_flush')
+def _track_roadmap_changes(session, flush_context):
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        if not isinstance(obj, _TRACKED_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        session.info['roadmap_dirty'] = True
+        return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_roadmap_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in _TRACKED_MODELS:
+            orm_execute_state.session.info['roadmap_dirty'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_roadmap_on_commit(session):
+    if session.info.pop('roadmap_dirty', None):
+        invalidate_roadmap()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_roadmap_changes(session, previous_transaction):
+    session.info.pop('roadmap_dirty', None)
@@ -1,45 +1,55 @@
 import os
 import random
 from datetime import datetime, timedelta, date, timezone
-from sqlalchemy import func, or_
+from sqlalchemy import and_, func, or_
 import io
 from collections import defaultdict
 from calendar import monthrange
 import bleach
+import click
 import json
 from bleach.css_sanitizer import CSSSanitizer
-from flask import (Blueprint, current_app, flash, jsonify, redirect,
+from flask import (Blueprint, abort, current_app, flash, jsonify, redirect,
                    render_template, request, send_from_directory, url_for, send_file)
 from flask_login import login_required, current_user
-from sqlalchemy.orm import joinedload, subqueryload
+from sqlalchemy.orm import joinedload, selectinload, subqueryload
 from werkzeug.utils import secure_filename
 from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.models import (KeyResult, Log,
-                        Objective, Project, Task, UploadedFile, User, Column, Note, PracticeLog, Build)
+from app.models import (DependencyLink, KeyResult, Log,
+                        Objective, Project, Task, TaskTombstone, UploadedFile, User, Column, Note, PracticeLog, Build)
 from app.constants import STATUS_META, TASK_STATUSES
-from app.utils import get_date_range, get_time_range_from_filter, _vn_day_bounds_to_utc, to_vn_time, to_utc_time
+from app.utils import active_in_window, parse_window, get_date_range, get_time_range_from_filter, _vn_day_bounds_to_utc, to_vn_time, to_utc_time
+from app.calendar_data import MONTH_CELL_LIMIT, build_calendar_data, calendar_etag
+from app.critical_path import (NODE_MODELS, gantt_node_id, gantt_schedule, parse_gantt_node, schedule_for, schedule_version,
+                               would_create_cycle, invalidate_schedule)
+from app.audit import backfill_log_entities, record_log
+from app.gantt_cache import gantt_payload
+from app.log_retention import ARCHIVE_BATCH_SIZE, ARCHIVE_PAGE_SIZE, archive_old_logs, query_archived_logs
+from app.schedule_shift import MAX_SHIFT_DAYS, SHIFT_TARGETS, shift_schedule
+from app.portfolio_gantt import portfolio_gantt_rows
+from app.roadmap_data import invalidate_roadmap, roadmap_payload
+from app.gantt_tree import branch_rows, project_top_rows, project_tree_rows
+from app.okr_data import cached_okr_dashboard_stats, invalidate_okr_dashboard, load_okr_objectives
+from app.progress import count_kr_tasks, recount_key_results, refresh_progress
+from app.snapshots import SNAPSHOT_ENTITY_TYPES, progress_series, take_progress_snapshot
+from app.reference_data import get_reference_data, get_reference_item, get_reference_list, reference_versions
+from app.single_flight import single_flight
+from app.serializers import TASK_FIELDS, query_task_dicts, serialize_tasks
+from app.recurrence import (expand_occurrences, materialize_series, occurrences_in_range,
+                            resolve_task, skip_occurrence, trim_series)
 from sqlalchemy import select
 
-bp = Blueprint('main', __name__)
+bp = Blueprint('main', __name__, cli_group=None)
 
 def recalculate_kr_progress(kr_id):
     kr = KeyResult.query.get(kr_id)
     if kr:
-        action_items_list = list(kr.tasks)
-        if action_items_list:
-            total_actions = len(action_items_list)
-            done_actions = sum(1 for action in action_items_list if action.status == 'Done')
-            
-            # SỬA LỖI TÍNH TOÁN TẠI ĐÂY
-            kr.current = float(done_actions)
-            kr.target = float(total_actions) # Đảm bảo target là TỔNG SỐ công việc
-
-        else:
-            # Nếu không có action nào, trả về 0
-            kr.current = 0
-            kr.target = 0
+        # current = số công việc Done, target = TỔNG SỐ công việc (đếm bằng SQL, không nạp task)
+        done_actions, total_actions = count_kr_tasks(kr_id)
+        kr.current = float(done_actions)
+        kr.target = float(total_actions)
         db.session.commit()
     return kr
 
@@ -160,13 +170,10 @@ def index(view_mode='week', date_str=None):
     weeks_in_year = [{'num': (first_day_of_year + timedelta(days=i*7)).isocalendar()[1], 'date_str': (first_day_of_year + timedelta(days=i*7)).strftime('%Y-%m-%d')} for i in range(53) if (first_day_of_year + timedelta(days=i*7)).year == year]
     months_in_year = [{'name': datetime(year, i, 1).strftime('%B'), 'date_str': datetime(year, i, 1).strftime('%Y-%m-%d')} for i in range(1, 13)]
     
-    # Lấy dữ liệu chung
-    all_users = User.query.order_by(User.username).all()
+    # Lấy dữ liệu chung (danh sách dropdown lấy từ cache tham chiếu)
+    ref = get_reference_data()
+    all_users = ref['users']
     logs = Log.query.order_by(Log.timestamp.desc()).limit(20).all()
-    all_projects = Project.query.order_by(Project.name).all()
-    all_builds = Build.query.order_by(Build.name).all()
-    all_objectives = Objective.query.order_by(Objective.content).all()
-    all_key_results = KeyResult.query.order_by(KeyResult.content).all()
 
     # Xây dựng context ban đầu sẽ được gửi tới template
     context = {
@@ -182,66 +189,30 @@ def index(view_mode='week', date_str=None):
         'users': all_users,
         'logs': logs,
         'selected_user_id': selected_user_id,
-        'all_projects': all_projects,
-        'all_builds': all_builds,
-        'all_objectives': all_objectives,
-        'all_key_results': all_key_results
+        'all_projects': ref['projects'],
+        'all_builds': ref['builds'],
+        'all_objectives': ref['objectives'],
+        'all_key_results': ref['key_results']
     }
 
-    # Xây dựng câu truy vấn Task cơ bản
-    base_query = Task.query.options(joinedload(Task.attachments), joinedload(Task.assignee))
-    
     # Áp dụng bộ lọc user nếu người dùng đã chọn
-    if selected_user_id != 'all':
-        base_query = base_query.filter(Task.who_id == selected_user_id)
-
-    # 1. Xác định khoảng thời gian truy vấn dữ liệu cho lịch
-    if view_mode == 'month':
-        start_of_grid = start_date - timedelta(days=start_date.weekday())
-        end_of_grid = start_of_grid + timedelta(days=41) # 6 tuần * 7 ngày
-        task_query_range = base_query.filter(Task.task_date.between(start_of_grid, end_of_grid))
-    else:
-        task_query_range = base_query.filter(Task.task_date.between(start_date, end_date))
-
-    # 2. Lấy tất cả task trong khoảng thời gian đã xác định
-    all_tasks_in_range = task_query_range.order_by(Task.task_date.desc()).all()
-
-    # 3. Tính toán dữ liệu SUMMARY (bao gồm cả đếm status cho biểu đồ)
-    summary_data = []
-    tasks_by_user = defaultdict(list)
-    # Chỉ lấy task trong khoảng thời gian hiển thị chính (ví dụ: 1 tuần) để tính summary
-    tasks_for_summary = [t for t in all_tasks_in_range if start_date <= t.task_date <= end_date]
-    
-    for task in tasks_for_summary:
-        if task.assignee:
-            tasks_by_user[task.assignee].append(task)
-    
-    for user, tasks in tasks_by_user.items():
-        status_counts = defaultdict(int)
-        for task in tasks:
-            status_counts[task.status] += 1
-        
-        summary_data.append({
-            'user': user.to_dict(),
-            'task_count': len(tasks),
-            'tasks': [t.to_dict() for t in sorted(tasks, key=lambda x: x.task_date)],
-            'status_counts': dict(status_counts)
-        })
-   
-    summary_data.sort(key=lambda x: x['user']['username'])  
-    context['summary_data'] = summary_data
+    who_id = selected_user_id if selected_user_id != 'all' else None
 
-    # 4. Tính toán dữ liệu LỊCH (tasks_by_date)
-    tasks_by_date = defaultdict(list)
-    for task in all_tasks_in_range:
-        tasks_by_date[task.task_date.strftime('%Y-%m-%d')].append(task.to_dict())
-    context['tasks_by_date'] = tasks_by_date
+    # Dữ liệu lưới + summary (dùng chung với /api/calendar)
+    grid_data = build_calendar_data(view_mode, start_date, end_date, who_id, all_users)
+    context.update({
+        'tasks_by_date': grid_data['tasks_by_date'],
+        'summary_data': grid_data['summary_data']
+    })
 
-    # 5. Cập nhật context riêng cho từng view mode
+    # Cập nhật context riêng cho từng view mode
     if view_mode == 'month':
+        start_of_grid = grid_data['grid_start']
         context.update({
             'calendar_dates': [start_of_grid + timedelta(days=i) for i in range(42)],
-            'current_month': start_date.month
+            'current_month': start_date.month,
+            'day_task_counts': grid_data['day_task_counts'],
+            'month_cell_limit': MONTH_CELL_LIMIT
         })
     else:
         context.update({'hours': range(8, 20)})
@@ -250,17 +221,50 @@ def index(view_mode='week', date_str=None):
             day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
             context['week_days_display'] = [(day_names[start_date.weekday()], start_date.strftime('%a'))]
             # Tính toán thống kê cho biểu đồ ngày
-            day_tasks = tasks_by_date.get(start_date.strftime('%Y-%m-%d'), [])
-            context['day_stats'] = {
-                status: sum(1 for t in day_tasks if t['status'] == status) 
-                for status in ['Pending', 'In Progress', 'Review', 'Done', 'Drop']
-            }
+            context['day_stats'] = grid_data['day_stats']
         else:  # 'week' view
             context['week_dates'] = [start_date + timedelta(days=i) for i in range(7)]
             context['week_days_display'] = [("Mon", "Mon"), ("Tue", "Tue"), ("Wed", "Wed"), ("Thu", "Thu"), ("Fri", "Fri"), ("Sat", "Sat"), ("Sun", "Sun")]
 
     return render_template('index.html', **context)
 
+
+@bp.route('/api/calendar/<string:view_mode>/<string:date_str>')
+@login_required
+def api_calendar(view_mode, date_str):
+    """
+    Dữ liệu lịch dạng JSON (task + summary của khoảng) để front end fetch-and-patch
+    thay vì render lại cả trang. ETag mạnh lấy từ dấu thời gian sửa đổi lớn nhất trong
+    khoảng; client gửi If-None-Match sẽ nhận 304 nếu không có gì thay đổi.
+    """
+    selected_user_id = request.args.get('user_id', 'all')
+    who_id = selected_user_id if selected_user_id != 'all' else None
+    start_date, end_date, date_display = get_date_range(view_mode, date_str)
+
+    etag = calendar_etag(view_mode, start_date, end_date, who_id)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    grid_data = build_calendar_data(view_mode, start_date, end_date, who_id, get_reference_list('users'))
+    response = jsonify({
+        'success': True,
+        'view_mode': view_mode,
+        'date_display': date_display,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'grid_start': grid_data['grid_start'].isoformat(),
+        'grid_end': grid_data['grid_end'].isoformat(),
+        'tasks_by_date': grid_data['tasks_by_date'],
+        'summary_data': grid_data['summary_data'],
+        'day_task_counts': grid_data.get('day_task_counts'),
+        'day_stats': grid_data.get('day_stats')
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # TÌM HÀM save_task VÀ THAY THẾ TOÀN BỘ BẰNG CODE NÀY
 
 @bp.route('/save-task', methods=['POST'])
@@ -286,8 +290,13 @@ def save_task():
     except (ValueError, TypeError) as e:
         current_app.logger.error(f"Error parsing form data for task save: {e}")
         return jsonify({'success': False, 'message': 'Invalid data format submitted.'}), 400
+    old_key_result_id = None
     if task_id:
-        task = Task.query.get_or_404(task_id)
+        # taskId có thể là khóa của lần lặp ảo -> tạo exception row cho riêng lần lặp đó
+        task = resolve_task(task_id)
+        if not task:
+            return jsonify({'success': False, 'message': 'Task not found.'}), 404
+        old_key_result_id = task.key_result_id
         log_content = f"Updated task ID {task.id}"
     else:
         task = Task()
@@ -303,7 +312,8 @@ def save_task():
     task.key_result_id = key_result_id
     task.recurrence = recurrence
     task.recurrence_end_date = recurrence_end_date
-    db.session.commit()
+    # Chỉ flush để có task.id cho file đính kèm; task, file, các lần lặp và log commit một lần
+    db.session.flush()
     try:
         files = request.files.getlist('attachments[]')
         for file in files:
@@ -328,21 +338,15 @@ def save_task():
     except Exception as e:
         current_app.logger.error(f"Error handling file upload for task {task.id}: {e}")
         pass
-    db.session.add(Log(action=f"{log_content}: '{what}'", user_id=current_user.id))
-    if not task_id and recurrence != 'none' and recurrence_end_date:
-        current_date, original_day = task.task_date, task.task_date.day
-        while True:
-            if recurrence == 'daily': current_date += timedelta(days=1)
-            elif recurrence == 'weekly': current_date += timedelta(days=7)
-            elif recurrence == 'monthly':
-                next_month, next_year = (current_date.month + 1, current_date.year)
-                if next_month > 12: next_month, next_year = 1, next_year + 1
-                last_day = monthrange(next_year, next_month)[1]
-                current_date = date(next_year, next_month, min(original_day, last_day))
-            if current_date > recurrence_end_date: break
-            if not Task.query.filter_by(task_date=current_date, hour=task.hour, what=task.what).first():
-                db.session.add(Task(task_date=current_date, hour=task.hour, what=task.what, who_id=task.who_id, status=task.status, note=task.note, recurrence='none', key_result_id=key_result_id or None))
+    # Task lặp lại chỉ lưu rule trên chính task này; các lần lặp được sinh khi đọc (app.recurrence).
+    # Tích hợp cần row thật cho từng lần lặp thì gửi thêm materialize=1.
+    if data.get('materialize') in ('1', 'true') and task.is_recurring:
+        materialize_series(task)
+    record_log(f"{log_content}: '{what}'", task, user_id=current_user.id)
     db.session.commit()
+    # Trạng thái / KR của task đổi -> cập nhật tiến độ KR (và theo chuỗi lên Objective/Build/Project)
+    for kr_id in {old_key_result_id, task.key_result_id} - {None}:
+        recalculate_kr_progress(kr_id)
     db.session.refresh(task)
     return jsonify({'success': True, 'task': task.to_dict(), 'message': 'Task saved successfully!'})
 # HÀM 2: TẠO API MỚI api_get_task
@@ -357,6 +361,218 @@ def api_get_task(task_id):
     return jsonify({'success': True, 'task': task.to_dict()})
 
 
+def _parse_change_cursor(raw):
+    """
+    Cursor đồng bộ delta dạng '<stamp ISO>|<task id>|<tombstone id>': mọi task có (updated_at, id)
+    <= (stamp, task id) và mọi tombstone có (deleted_at, id) <= (stamp, tombstone id) đã được gửi.
+    Sai định dạng -> ValueError.
+    """
+    stamp, task_id, tombstone_id = raw.split('|')
+    return datetime.fromisoformat(stamp), int(task_id), int(tombstone_id)
+
+
+def _format_change_cursor(stamp, task_id, tombstone_id):
+    return f"{stamp.isoformat()}|{task_id}|{tombstone_id}"
+
+
+def _after_cursor(stamp_col, id_col, stamp, last_id):
+    """(stamp_col, id_col) > (stamp, last_id), viết tách để dùng được index trên stamp_col."""
+    return or_(stamp_col > stamp, and_(stamp_col == stamp, id_col > last_id))
+
+
+def _cursor_id(keys, stamp, default=0):
+    """id lớn nhất trong các (stamp, id) đã gửi tại đúng stamp của cursor mới."""
+    return max((row_id for row_stamp, row_id in keys if row_stamp == stamp), default=default)
+
+
+@bp.route('/api/tasks/changes')
+@login_required
+def api_task_changes():
+    """
+    Đồng bộ delta: các task được tạo / sửa / xóa sau cursor. Gọi lần đầu không có
+    since để lấy cursor hiện tại; các lần sau gửi lại cursor đã nhận, lặp lại khi
+    has_more còn true.
+    """
+    limit = max(1, min(request.args.get('limit', 500, type=int), 2000))
+    since_str = request.args.get('since')
+    if not since_str:
+        latest_task = db.session.query(Task.updated_at, Task.id).filter(Task.updated_at.isnot(None)) \
+            .order_by(Task.updated_at.desc(), Task.id.desc()).first()
+        latest_delete = db.session.query(TaskTombstone.deleted_at, TaskTombstone.id) \
+            .order_by(TaskTombstone.deleted_at.desc(), TaskTombstone.id.desc()).first()
+        stamp = max([row[0] for row in (latest_task, latest_delete) if row] or [datetime.utcnow()])
+        cursor = _format_change_cursor(stamp, _cursor_id([latest_task] if latest_task else [], stamp),
+                                       _cursor_id([latest_delete] if latest_delete else [], stamp))
+        return jsonify({'success': True, 'cursor': cursor, 'created': [], 'updated': [], 'deleted': [], 'has_more': False})
+    try:
+        since, since_task_id, since_tombstone_id = _parse_change_cursor(since_str)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor.'}), 400
+
+    changed = db.session.query(*TASK_FIELDS, Task.created_at, Task.updated_at) \
+        .filter(_after_cursor(Task.updated_at, Task.id, since, since_task_id)) \
+        .order_by(Task.updated_at, Task.id).limit(limit + 1).all()
+    tombstones = TaskTombstone.query \
+        .filter(_after_cursor(TaskTombstone.deleted_at, TaskTombstone.id, since, since_tombstone_id)) \
+        .order_by(TaskTombstone.deleted_at, TaskTombstone.id).limit(limit + 1).all()
+    task_truncated, tombstone_truncated = len(changed) > limit, len(tombstones) > limit
+    changed, tombstones = changed[:limit], tombstones[:limit]
+
+    # Hai luồng được giới hạn riêng: cursor chỉ tiến tới điểm cả hai luồng đều đã đọc đủ, tức
+    # stamp cuối nhỏ nhất của các luồng bị cắt; row sau điểm đó để lần gọi sau.
+    task_keys = [(t.updated_at, t.id) for t in changed]
+    tombstone_keys = [(t.deleted_at, t.id) for t in tombstones]
+    frontiers = [keys[-1][0] for keys, truncated in ((task_keys, task_truncated), (tombstone_keys, tombstone_truncated))
+                 if truncated]
+    if frontiers:
+        stamp = min(frontiers)
+    else:
+        stamp = max([key[0] for key in task_keys + tombstone_keys] or [since])
+    changed = [t for t, key in zip(changed, task_keys) if key[0] <= stamp]
+    tombstones = [t for t, key in zip(tombstones, tombstone_keys) if key[0] <= stamp]
+    if changed or tombstones:
+        # Cursor vẫn ở stamp cũ (chỉ gửi thêm row cùng stamp) thì luồng không có row mới giữ id cũ
+        cursor = _format_change_cursor(
+            stamp,
+            _cursor_id(task_keys, stamp, since_task_id if stamp == since else 0),
+            _cursor_id(tombstone_keys, stamp, since_tombstone_id if stamp == since else 0))
+    else:
+        cursor = since_str
+
+    created, updated = [], []
+    for t, task_dict in zip(changed, serialize_tasks(changed)):
+        (created if t.created_at and t.created_at > since else updated).append(task_dict)
+    return jsonify({
+        'success': True,
+        'cursor': cursor,
+        'created': created,
+        'updated': updated,
+        'deleted': sorted({t.task_id for t in tombstones}),
+        'has_more': task_truncated or tombstone_truncated
+    })
+
+
+@bp.cli.command('expand-recurrence')
+@click.argument('task_id', type=int)
+@click.option('--end-date', help="Đổi recurrence_end_date của chuỗi (YYYY-MM-DD) trước khi mở rộng.")
+@click.option('--trim-only', is_flag=True, help="Chỉ xóa các lần lặp đã ghi nằm sau ngày kết thúc.")
+def expand_recurrence_command(task_id, end_date, trim_only):
+    """Ghi các lần lặp của một task lặp lại thành row thật, hoặc cắt bớt khi đổi ngày kết thúc."""
+    task = Task.query.get(task_id)
+    if not task:
+        print(f"Lỗi: Task ID {task_id} không tồn tại.")
+        return
+    if end_date:
+        try:
+            task.recurrence_end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            print("Lỗi: --end-date phải có dạng YYYY-MM-DD.")
+            return
+    if not task.is_recurring:
+        print(f"Lỗi: Task ID {task_id} không phải task lặp lại.")
+        return
+
+    trimmed = trim_series(task)
+    inserted = 0 if trim_only else materialize_series(task)
+    db.session.commit()
+    # Số task của KR đổi theo ngày kết thúc mới và các lần lặp vừa xóa / ghi -> cập nhật tiến độ KR
+    if task.key_result_id:
+        recalculate_kr_progress(task.key_result_id)
+    print(f"Task ID {task_id}: đã xóa {trimmed} lần lặp, đã ghi thêm {inserted} lần lặp.")
+
+
+@bp.cli.command('recompute-progress')
+def recompute_progress_command():
+    """Tính lại current/target của mọi KR và progress của Objective, Build, Project (sau khi import / sửa dữ liệu)."""
+    recount_key_results()
+    refresh_progress()
+    db.session.commit()
+    print(f"Đã tính lại tiến độ cho {KeyResult.query.count()} KR và toàn bộ Objective, Build, Project.")
+
+
+@bp.cli.command('snapshot-progress')
+@click.option('--date', 'date_str', help="Ngày chụp (YYYY-MM-DD), mặc định hôm nay.")
+def snapshot_progress_command(date_str):
+    """Chụp tiến độ của toàn bộ Project / Build / Objective cho một ngày (dùng cho cron)."""
+    try:
+        day = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today()
+    except ValueError:
+        print("Lỗi: --date phải có dạng YYYY-MM-DD.")
+        return
+    count = take_progress_snapshot(day)
+    db.session.commit()
+    print(f"Đã chụp {count} dòng tiến độ cho ngày {day.isoformat()}.")
+
+
+@bp.cli.command('backfill-log-entities')
+@click.option('--batch-size', default=1000, show_default=True, help="Số log đọc mỗi lô.")
+def backfill_log_entities_command(batch_size):
+    """Điền entity_type / entity_id / project_id cho log cũ bằng cách đọc ID trong nội dung action."""
+    scanned, filled = backfill_log_entities(batch_size)
+    print(f"Đã đọc {scanned} log, điền được đối tượng cho {filled} log.")
+
+
+@bp.cli.command('archive-logs')
+@click.option('--days', type=int, help="Giữ lại log trong N ngày gần nhất, mặc định LOG_RETENTION_DAYS.")
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, show_default=True, help="Số log chuyển mỗi transaction.")
+def archive_logs_command(days, batch_size):
+    """Chuyển log cũ hơn N ngày sang bảng log_archive (dùng cho cron)."""
+    days = days if days is not None else current_app.config.get('LOG_RETENTION_DAYS')
+    if not days or days < 1:
+        print("Lỗi: --days phải là số ngày dương (hoặc đặt LOG_RETENTION_DAYS).")
+        return
+    moved = archive_old_logs(days, batch_size)
+    print(f"Đã chuyển {moved} log cũ hơn {days} ngày sang log_archive.")
+
+
+@bp.route('/api/progress-history/<string:entity_type>/<int:entity_id>')
+@login_required
+def api_progress_history(entity_type, entity_id):
+    """Chuỗi tiến độ theo ngày (burndown/burnup) của một Project / Build / Objective, đọc từ snapshot."""
+    if entity_type not in SNAPSHOT_ENTITY_TYPES:
+        return jsonify({'success': False, 'message': 'Invalid entity type.'}), 400
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD.'}), 400
+    return jsonify({
+        'success': True,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'series': progress_series(entity_type, entity_id, start, end)
+    })
+
+
+@bp.route('/api/logs/archive')
+@login_required
+def api_archived_logs():
+    """Tra nhật ký đã lưu trữ: ?from=&to=&project_id=&entity_type=&entity_id=&user_id=&q=&page=&per_page="""
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD.'}), 400
+    page = request.args.get('page', 1, type=int)
+    rows, has_more = query_archived_logs(
+        start, end,
+        project_id=request.args.get('project_id', type=int),
+        entity_type=request.args.get('entity_type'),
+        entity_id=request.args.get('entity_id', type=int),
+        user_id=request.args.get('user_id', type=int),
+        search=(request.args.get('q') or '').strip() or None,
+        page=page,
+        per_page=request.args.get('per_page', ARCHIVE_PAGE_SIZE, type=int)
+    )
+    logs = []
+    for row in rows:
+        d = row.to_dict()
+        user = get_reference_item('users', row.user_id) if row.user_id else None
+        d['username'] = user.username if user else None
+        logs.append(d)
+    return jsonify({'success': True, 'logs': logs, 'page': page, 'has_more': has_more})
+
+
 @login_required
 def api_dhtmlx_data():
     project_id = request.args.get('project_id', type=int)
@@ -437,22 +653,31 @@ def api_dhtmlx_data():
 @login_required
 def update_task_time():
     data = request.json
-    task = Task.query.get_or_404(data.get('taskId'))
+    task = resolve_task(data.get('taskId'))
+    if not task:
+        return jsonify({'success': False, 'message': 'Task not found.'}), 404
     new_date = datetime.strptime(data.get('newDate'), '%Y-%m-%d').date()
     new_hour = data.get('newHour')
     
     task.task_date, task.hour = new_date, new_hour
-    db.session.add(Log(action=f"Dời lịch CV ID {task.id}: '{task.what}' sang {new_date.strftime('%d/%m/%Y')}", user_id=current_user.id))
+    record_log(f"Dời lịch CV ID {task.id}: '{task.what}' sang {new_date.strftime('%d/%m/%Y')}", task, user_id=current_user.id)
     db.session.commit()
     return jsonify({'success': True, 'task': task.to_dict(), 'message': 'Updated success'})
 
-@bp.route('/delete-task/<int:task_id>', methods=['POST'])
+@bp.route('/delete-task/<task_id>', methods=['POST'])
 @login_required
 def delete_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    db.session.add(Log(action=f"Deleted event ID {task.id}: '{task.what}'", user_id=current_user.id))
+    task = resolve_task(task_id)
+    if not task:
+        return jsonify({'success': False, 'message': 'Task not found.'}), 404
+    record_log(f"Deleted event ID {task.id}: '{task.what}'", task, user_id=current_user.id)
+    # Xóa một lần lặp: ghi ngày gốc vào exdates của task gốc để nó không được sinh lại
+    skip_occurrence(task)
+    key_result_id = task.key_result_id
     db.session.delete(task)
     db.session.commit()
+    if key_result_id:
+        recalculate_kr_progress(key_result_id)
     return jsonify({'success': True, 'message': 'Deleted event'})
 
 @bp.route('/okr')
@@ -471,56 +696,22 @@ def okr_page(view_mode='week', date_str=None):
     elif view_mode == 'month': prev_period_date, next_period_date = (start_date - timedelta(days=1)).replace(day=1).strftime('%Y-%m-%d'), (end_date + timedelta(days=1)).strftime('%Y-%m-%d')
     else: prev_period_date, next_period_date = start_date.replace(year=start_date.year - 1).strftime('%Y-%m-%d'), start_date.replace(year=start_date.year + 1).strftime('%Y-%m-%d')
     
-    # Lấy tất cả Objectives trong khoảng thời gian để tính toán
-    all_objectives_in_range = Objective.query.options(
-        joinedload(Objective.project),
-        joinedload(Objective.key_results).joinedload(KeyResult.tasks)
-    ).filter(Objective.start_date.between(start_date, end_date)).all()
-
-    # --- TÍNH TOÁN DỮ LIỆU CHO DASHBOARD ---
-    total_stats = {'o': 0, 'kr': 0, 'task': 0}
-    stats_by_project = defaultdict(lambda: {'name': '', 'o_count': 0, 'kr_count': 0, 'task_count': 0, 'progress': []})
-    
-    for obj in all_objectives_in_range:
-        total_stats['o'] += 1
-        total_stats['kr'] += len(obj.key_results)
-        
-        project_id = obj.project.id if obj.project else 0 # 0 cho "Unassigned"
-        project_name = obj.project.name if obj.project else "Unassigned"
-        stats_by_project[project_id]['name'] = project_name
-        stats_by_project[project_id]['o_count'] += 1
-        stats_by_project[project_id]['kr_count'] += len(obj.key_results)
-        stats_by_project[project_id]['progress'].append(obj.progress)
-
-        for kr in obj.key_results:
-            total_stats['task'] += len(kr.tasks)
-            stats_by_project[project_id]['task_count'] += len(kr.tasks)
-
-    # Tính tiến độ trung bình cho mỗi project
-    for pid in stats_by_project:
-        progress_list = stats_by_project[pid]['progress']
-        if progress_list:
-            stats_by_project[pid]['avg_progress'] = sum(progress_list) / len(progress_list)
-        else:
-            stats_by_project[pid]['avg_progress'] = 0
+    # --- TÍNH TOÁN DỮ LIỆU CHO DASHBOARD (GROUP BY trong SQL, có cache) ---
+    total_stats, stats_by_project = cached_okr_dashboard_stats(start_date, end_date)
 
-    # --- LỌC DỮ LIỆU CHO TAB CHI TIẾT ---
-    objectives_for_display = all_objectives_in_range
+    # --- DỮ LIỆU CHO TAB CHI TIẾT (chỉ các Objective cần hiển thị) ---
+    objectives_for_display = load_okr_objectives(start_date, end_date, project_filter_id)
     filtered_project_name = None
     if project_filter_id is not None:
         if project_filter_id == 0: # Unassigned
-            objectives_for_display = [o for o in all_objectives_in_range if o.project_id is None]
             filtered_project_name = "Unassigned"
         else:
-            objectives_for_display = [o for o in all_objectives_in_range if o.project_id == project_filter_id]
-            project = Project.query.get(project_filter_id)
+            project = get_reference_item('projects', project_filter_id)
             if project:
                 filtered_project_name = project.name
     
     # Dữ liệu chung khác
-    users = User.query.all()
-    projects = Project.query.all()
-    builds = Build.query.all()
+    ref = get_reference_data()
     logs = Log.query.order_by(Log.timestamp.desc()).limit(20).all()
     year = base_date.year
     first_day_of_year = datetime(year, 1, 1)
@@ -534,16 +725,16 @@ def okr_page(view_mode='week', date_str=None):
         'weeks_in_year': weeks_in_year, 'months_in_year': months_in_year,
         'today_date_str': datetime.today().strftime('%Y-%m-%d'),
         'today_date_obj': date.today(),
-        'users': users, 'projects': projects, 'builds': builds, 'page_name': 'okr',
+        'users': ref['users'], 'projects': ref['projects'], 'builds': ref['builds'], 'page_name': 'okr',
         'logs': logs,
         'total_stats': total_stats,
         'stats_by_project': stats_by_project,
         'project_filter_id': project_filter_id,
         'filtered_project_name': filtered_project_name,
-        'all_projects': Project.query.order_by(Project.name).all(),
-        'all_builds': Build.query.order_by(Build.name).all(),
-        'all_objectives': Objective.query.order_by(Objective.content).all(),
-        'all_key_results': KeyResult.query.order_by(KeyResult.content).all()
+        'all_projects': ref['projects'],
+        'all_builds': ref['builds'],
+        'all_objectives': ref['objectives'],
+        'all_key_results': ref['key_results']
     }
     return render_template('okr.html', **context)
 
@@ -614,9 +805,7 @@ def add_objective():
         note=data.get('note') # <-- THÊM DÒNG NÀY
     )
     db.session.add(new_obj)
-    db.session.commit()
-    
-    db.session.add(Log(action=f"Created new Objective: '{new_obj.content}'", user_id=current_user.id))
+    record_log(f"Created new Objective: '{new_obj.content}'", new_obj, user_id=current_user.id)
     db.session.commit()
     
     flash('New objective created!', 'success')
@@ -657,8 +846,7 @@ def add_key_result():
         current=0
     )
     db.session.add(new_kr)
-    db.session.commit()
-    db.session.add(Log(action=f"Added KR to Objective ID {data['objective_id']}: '{data['content']}'", user_id=current_user.id))
+    record_log(f"Added KR to Objective ID {data['objective_id']}: '{data['content']}'", new_kr, user_id=current_user.id)
     db.session.commit()
     
     return jsonify({ 'success': True, 'kr': { 'id': new_kr.id, 'content': new_kr.content, 'progress': 0, 'current': 0, 'target': 0, 'objective_id': new_kr.objective_id, 'owner_id': new_kr.owner_id, 'note': new_kr.note } })
@@ -677,11 +865,11 @@ def update_task_from_okr(task_id):
         })
 
     task.status = 'Done' if request.json.get('checked') else 'Pending'
-    db.session.commit()
     status_text = "Hoàn thành" if task.status == 'Done' else "Chuyển về Pending"
-    db.session.add(Log(action=f"{status_text} Task ID {task.id}: '{task.what}'", user_id=current_user.id))
-    
-    # Chỉ cần gọi hàm cập nhật KR, nó đã commit thay đổi bên trong
+    record_log(f"{status_text} Task ID {task.id}: '{task.what}'", task, user_id=current_user.id)
+    db.session.commit()
+
+    # Chỉ cần gọi hàm cập nhật KR, nó đã commit thay đổi bên trong (và xóa cache dashboard OKR nếu cần)
     kr = recalculate_kr_progress(task.key_result_id)
     
     # Sửa lỗi 2: Không gọi hàm recalculate_parents_progress nữa
@@ -732,8 +920,7 @@ def update_okr_item(item_type, item_id):
         if end_date_str is not None:
             end_val = (end_date_str or '').strip()
             item.end_date = datetime.strptime(end_val, '%Y-%m-%d').date() if end_val else None
-        db.session.commit()
-        db.session.add(Log(action=f"Updated {item_type} ID {item.id}", user_id=current_user.id))
+        record_log(f"Updated {item_type} ID {item.id}", item, user_id=current_user.id)
         db.session.commit()
         if not request.is_json:
             flash(f'{item_type.capitalize()} updated successfully!', 'success')
@@ -839,12 +1026,13 @@ def delete_item(item_type, item_id):
     item = Model.query.get_or_404(item_id)
     response_data = {'success': True}
     
-    db.session.add(Log(action=f"Xóa {item_type} ID {item.id}: '{item.what if hasattr(item, 'what') else item.content}'", user_id=current_user.id))
+    record_log(f"Xóa {item_type} ID {item.id}: '{item.what if hasattr(item, 'what') else item.content}'", item, user_id=current_user.id)
 
     if item_type == 'task':
         kr_id = item.key_result_id
         objective_id = item.key_result.objective_id if item.key_result else None
         
+        skip_occurrence(item)
         db.session.delete(item)
         db.session.commit()
 
@@ -939,32 +1127,68 @@ def api_projects_list():
         projects_list.append(project_dict)
     return jsonify({'success': True, 'projects': projects_list})
 
-# Mở file: app/routes.py
+# Picker cho dropdown liên cấp Project -> Build -> Objective -> KR trong modal task
+PICKER_PAGE_SIZE = 50
+PICKER_MAX_PAGE_SIZE = 200
+
+
+def _picker_page(model, label_col, parent_filter):
+    """
+    Một trang lựa chọn: lọc theo tiền tố (q=), sắp theo (nhãn, id) và phân trang keyset
+    (cursor = id của mục cuối trang trước, trả về trong next_cursor).
+    selected=<id> đảm bảo mục đang được chọn có mặt ở trang đầu dù nằm ở trang sau.
+    """
+    q = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', PICKER_PAGE_SIZE, type=int), PICKER_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor', type=int)
+    selected = request.args.get('selected', type=int)
+
+    base = db.session.query(model.id, label_col).filter(parent_filter)
+    query = base
+    if q:
+        escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(label_col.ilike(f"{escaped}%", escape='\\'))
+    if cursor:
+        last_label = db.session.query(label_col).filter(model.id == cursor).scalar()
+        if last_label is not None:
+            query = query.filter(or_(label_col > last_label, and_(label_col == last_label, model.id > cursor)))
+
+    rows = query.order_by(label_col, model.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{'id': item_id, 'name': label} for item_id, label in rows]
+    if selected and not cursor and all(item['id'] != selected for item in items):
+        row = base.filter(model.id == selected).first()
+        if row:
+            items.insert(0, {'id': row[0], 'name': row[1]})
+
+    return jsonify({
+        'success': True,
+        'items': items,
+        'next_cursor': rows[-1][0] if has_more else None,
+        'has_more': has_more
+    })
+
+
 @bp.route('/api/builds/<int:project_id>')
 @login_required
 def api_builds_list(project_id):
-    project = Project.query.get_or_404(project_id)
-    # SỬA LẠI: Đổi key 'builds' thành 'items'
-    builds = [{'id': b.id, 'name': b.name} for b in project.builds]
-    return jsonify({'success': True, 'items': builds})
+    Project.query.get_or_404(project_id)
+    return _picker_page(Build, Build.name, Build.project_id == project_id)
+
 
-# Mở file: app/routes.py
 @bp.route('/api/objectives/<int:build_id>')
 @login_required
 def api_objectives_list(build_id):
-    build = Build.query.get_or_404(build_id)
-    # SỬA LẠI: Đổi key 'content' thành 'name' và key 'objectives' thành 'items'
-    objectives = [{'id': o.id, 'name': o.content} for o in build.objectives]
-    return jsonify({'success': True, 'items': objectives})
-    
-# Mở file: app/routes.py
+    Build.query.get_or_404(build_id)
+    return _picker_page(Objective, Objective.content, Objective.build_id == build_id)
+
+
 @bp.route('/api/key-results/<int:objective_id>')
 @login_required
 def api_key_results_list(objective_id):
-    objective = Objective.query.get_or_404(objective_id)
-    # SỬA LẠI: Đổi key 'content' thành 'name' và key 'key_results' thành 'items'
-    key_results = [{'id': kr.id, 'name': kr.content} for kr in objective.key_results]
-    return jsonify({'success': True, 'items': key_results})
+    Objective.query.get_or_404(objective_id)
+    return _picker_page(KeyResult, KeyResult.content, KeyResult.objective_id == objective_id)
 
 
 @bp.route('/uploads-manager')
@@ -1055,81 +1279,104 @@ def uploads_manager():
 @bp.route('/api/dhtmlx-data')
 @login_required
 def api_dhtmlx_data():
+    """
+    Dữ liệu dhtmlxgantt của một project.
+      ?project_id=N          -> cả cây
+      ?project_id=N&lazy=1   -> chỉ Project + Build, kèm '$has_child' / child_count
+      ?parent=<id nút>       -> một cấp con của nút khi mở rộng (dhtmlxgantt gửi parent_id)
+    Payload gồm "links" (finish-to-start) giữa các row trả về.
+    Kèm ?from=&to= thì chỉ trả các mục trong cửa sổ (xem app.timeline_window).
+    Hai chế độ theo project_id được cache và trả ETag theo gantt_version (app.gantt_cache).
+    """
+    window_start, window_end = parse_window(request.args)
+    parent = request.args.get('parent') or request.args.get('parent_id')
+    if parent:
+        rows = branch_rows(parent, window_start, window_end)
+        if rows is None:
+            return jsonify({'success': False, 'message': 'Invalid parent id'}), 400
+        return jsonify({"data": rows, "links": gantt_schedule(rows)})
+
     project_id = request.args.get('project_id', type=int)
     if not project_id:
         return jsonify({"data": []})
 
-    # Tải trước tất cả dữ liệu liên quan để tránh N+1 query
-    project = Project.query.options(
-        subqueryload(Project.builds).subqueryload(Build.objectives)
-        .subqueryload(Objective.key_results).subqueryload(KeyResult.tasks)
-        .joinedload(Task.assignee) # Dùng joinedload cho quan hệ cuối cùng (assignee)
-    ).get_or_404(project_id)
-
-    gantt_data = []
-
-    def add_days_if_date(d, days):
-        return (d + timedelta(days=days)) if d else None
-
-    if project.start_date and project.end_date:
-        gantt_data.append({
-            "id": f"proj-{project.id}", "text": project.name,
-            "start_date": project.start_date.isoformat(),
-            "end_date": add_days_if_date(project.end_date, 1).isoformat(),
-            "type": "project", "open": True,
-            "progress": project.progress / 100.0  # <<< THÊM DÒNG NÀY
-        })
+    # Payload cache theo (project, gantt_version): mở lại / polling nhận 304 hoặc body có sẵn
+    lazy = bool(request.args.get('lazy', type=int))
+    build_rows = project_top_rows if lazy else project_tree_rows
+
+    def build():
+        rows = build_rows(project_id, window_start, window_end)
+        # Liên kết phụ thuộc + es / ls / slack / critical của từng row (app.critical_path)
+        return None if rows is None else {"data": rows, "links": gantt_schedule(rows)}
+
+    variant = (lazy, window_start, window_end, schedule_version())
+    cached = gantt_payload(project_id, variant, build)
+    if cached is None:
+        abort(404)
+    etag, body = cached
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-    for build in project.builds:
-        if not build.start_date or not build.end_date:
-            continue
-        gantt_data.append({
-            "id": f"build-{build.id}", "text": build.name,
-            "start_date": build.start_date.isoformat(),
-            "end_date": add_days_if_date(build.end_date, 1).isoformat(),
-            "type": "build", "parent": f"proj-{project.id}", "open": True,
-            "progress": build.progress / 100.0  # <<< THÊM DÒNG NÀY
-        })
+@bp.route('/api/dependencies')
+@login_required
+def api_dependencies():
+    """Mọi liên kết phụ thuộc kèm lịch CPM của các nút có liên kết (id theo dhtmlxgantt)."""
+    schedule = schedule_for()
+    return jsonify({
+        'success': True,
+        'links': [link.to_dict() for link in DependencyLink.query.order_by(DependencyLink.id)],
+        'schedule': {
+            gantt_node_id(key): {
+                'earliest_start': s.earliest_start.isoformat(), 'earliest_finish': s.earliest_finish.isoformat(),
+                'latest_start': s.latest_start.isoformat(), 'latest_finish': s.latest_finish.isoformat(),
+                'slack': s.slack, 'critical': s.critical, 'conflict': s.conflict
+            } for key, s in schedule.items()
+        }
+    })
 
-        for obj in build.objectives:
-            if not obj.start_date: continue
-            obj_end = obj.end_date or obj.start_date
-            gantt_data.append({
-                "id": f"obj-{obj.id}", "text": obj.content,
-                "start_date": obj.start_date.isoformat(),
-                "end_date": add_days_if_date(obj_end, 1).isoformat(),
-                "type": "objective", "parent": f"build-{build.id}", "open": True,
-                "progress": obj.progress / 100.0
-            })
 
-            for kr in obj.key_results:
-                task_dates = [t.task_date for t in kr.tasks if t.task_date]
-                start_date = kr.start_date or (min(task_dates) if task_dates else None)
-                end_date = kr.end_date or (max(task_dates) if task_dates else None)
+@bp.route('/api/dependencies', methods=['POST'])
+@login_required
+def create_dependency():
+    """Tạo liên kết finish-to-start: {source: 'task-1' | 'kr-2' | 'build-3', target: ..., lag_days}."""
+    data = request.get_json() or {}
+    source, target = parse_gantt_node(data.get('source')), parse_gantt_node(data.get('target'))
+    if not source or not target:
+        return jsonify({'success': False, 'message': 'Source and target must be task-, kr- or build- ids'}), 400
+    for node_type, node_id in (source, target):
+        if not db.session.get(NODE_MODELS[node_type], node_id):
+            return jsonify({'success': False, 'message': f'{node_type} {node_id} not found'}), 404
+    try:
+        lag_days = int(data.get('lag_days') or 0)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'lag_days must be an integer'}), 400
+    if would_create_cycle(source, target):
+        return jsonify({'success': False, 'message': 'This link would create a dependency cycle'}), 400
+
+    link = DependencyLink(source_type=source[0], source_id=source[1],
+                          target_type=target[0], target_id=target[1], lag_days=lag_days)
+    db.session.add(link)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'This link already exists'}), 409
+    return jsonify({'success': True, 'link': link.to_dict()})
 
-                if not start_date: continue
-                end_date = end_date or start_date
 
-                gantt_data.append({
-                    "id": f"kr-{kr.id}", "text": kr.content,
-                    "start_date": start_date.isoformat(),
-                    "end_date": add_days_if_date(end_date, 1).isoformat(),
-                    "type": "key_result", "parent": f"obj-{obj.id}", "open": True,
-                    "progress": kr.progress / 100.0
-                })
+@bp.route('/api/dependencies/<int:link_id>', methods=['DELETE'])
+@login_required
+def delete_dependency(link_id):
+    link = DependencyLink.query.get_or_404(link_id)
+    db.session.delete(link)
+    db.session.commit()
+    return jsonify({'success': True, 'message': 'Link deleted'})
 
-                for task in kr.tasks: # Bây giờ task.assignee đã được tải sẵn
-                    if not task.task_date: continue
-                    gantt_data.append({
-                        "id": f"task-{task.id}", "text": task.what,
-                        "start_date": task.task_date.isoformat(),
-                        "end_date": add_days_if_date(task.task_date, 1).isoformat(),
-                        "type": "task", "parent": f"kr-{kr.id}",
-                        "assignee_name": task.assignee.username if task.assignee else "",
-                        "progress": 1.0 if task.status == 'Done' else 0.0,
-                    })
-                        
-    return jsonify({"data": gantt_data})
 
 @bp.route('/projects')
 @login_required
@@ -1167,25 +1414,11 @@ def project_workspace():
             days_remaining = (selected_project.end_date - date.today()).days if selected_project.end_date else None
 
             # --- LẤY NHẬT KÝ HOẠT ĐỘNG LIÊN QUAN ĐẾN DỰ ÁN ---
+            # Log mang project_id từ lúc ghi (app.audit): một truy vấn theo index (project_id, timestamp)
             project_logs = []
             try:
-                objective_ids = {o.id for o in objectives_list}
-                key_result_ids = {kr.id for o in objectives_list for kr in o.key_results}
-                task_ids = {t.id for t in all_tasks}
-
-                search_terms = []
-                if objective_ids:
-                    search_terms.extend([f"Objective ID {id}" for id in objective_ids])
-                if key_result_ids:
-                    search_terms.extend([f"Added KR to Objective ID {id}" for id in objective_ids])
-                    search_terms.extend([f"key_result ID {id}" for id in key_result_ids])
-                if task_ids:
-                    search_terms.extend([f"task ID {id}" for id in task_ids])
-                    search_terms.extend([f"CV ID {id}" for id in task_ids])
-
-                if search_terms:
-                    conditions = [Log.action.ilike(f"%{term}%") for term in search_terms]
-                    project_logs = Log.query.filter(or_(*conditions)).order_by(Log.timestamp.desc()).limit(10).all()
+                project_logs = Log.query.filter(Log.project_id == selected_project.id) \
+                    .order_by(Log.timestamp.desc()).limit(10).all()
             except Exception as e:
                 current_app.logger.error(f"Error fetching project logs for project {selected_project_id}: {e}")
                 project_logs = []
@@ -1206,8 +1439,7 @@ def project_workspace():
             }
             objectives_for_display = objectives_list
 
-    all_users = User.query.all()
-    all_builds_for_modal = Build.query.all()
+    ref = get_reference_data('users', 'projects', 'builds')
     
     return render_template('project_workspace.html',
                            page_name='projects',
@@ -1218,9 +1450,9 @@ def project_workspace():
                            active_tab=active_tab,
                            status_choices=status_choices, 
                            current_status=status_filter,
-                           users=all_users,
-                           projects=Project.query.order_by(Project.name).all(),
-                           builds=all_builds_for_modal,
+                           users=ref['users'],
+                           projects=ref['projects'],
+                           builds=ref['builds'],
                            today_date_str=date.today().strftime('%Y-%m-%d')
                            )
 
@@ -1309,6 +1541,37 @@ def update_build_details(build_id):
     flash(f'Build "{build.name}" updated successfully!', 'success')
     return redirect(url_for('main.project_workspace', project_id=build.project_id))
 
+@bp.route('/shift/<item_type>/<int:item_id>', methods=['POST'])
+@login_required
+def shift_item_schedule(item_type, item_id):
+    """Dời Project / Build / Objective cùng toàn bộ KR, task bên dưới thêm N ngày trong một transaction."""
+    if item_type not in SHIFT_TARGETS:
+        return jsonify({'success': False, 'message': 'Invalid item type'}), 400
+    data = request.json if request.is_json else request.form
+    try:
+        days = int(data.get('days', 0))
+    except (TypeError, ValueError):
+        days = 0
+    if not days or abs(days) > MAX_SHIFT_DAYS:
+        return jsonify({'success': False, 'message': f'days must be a non-zero integer within ±{MAX_SHIFT_DAYS}'}), 400
+    SHIFT_TARGETS[item_type].query.get_or_404(item_id)
+    try:
+        counts = shift_schedule(item_type, item_id, days, user_id=current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error shifting {item_type} ID {item_id}: {e}")
+        return jsonify({'success': False, 'message': f'An error occurred: {str(e)}'}), 500
+    # Ngày đổi bằng UPDATE theo tập, không qua listener của session
+    invalidate_okr_dashboard()
+    invalidate_schedule()
+    # Dựng lại roadmap với mọi cấp: rẻ, và không phụ thuộc roadmap đang đọc tới cấp nào
+    invalidate_roadmap()
+    if not request.is_json:
+        flash(f'{item_type.capitalize()} shifted by {days:+d} days.', 'success')
+        return redirect(request.referrer or url_for('main.index'))
+    return jsonify({'success': True, 'days': days, 'shifted': counts})
+
 @bp.route('/kanban')
 @login_required
 def kanban_board():
@@ -1329,7 +1592,7 @@ def kanban_board():
         start_date = today - timedelta(days=today.weekday())
         end_date = start_date + timedelta(days=6)
 
-    tasks_query = Task.query.options(joinedload(Task.assignee), joinedload(Task.attachments))
+    tasks_query = Task.query
     
     if start_date and end_date:
         tasks_query = tasks_query.filter(Task.task_date.between(start_date, end_date))
@@ -1340,7 +1603,19 @@ def kanban_board():
     if overdue_filter == '1':
         tasks_query = tasks_query.filter(Task.task_date < today, Task.status != 'Done')
         
-    all_tasks = tasks_query.order_by(Task.task_date.desc()).all()
+    ref = get_reference_data()
+    all_users = ref['users']
+    users_by_id = {u.id: u for u in all_users}
+    user_names = {u.id: u.username for u in all_users}
+
+    # Thêm các lần lặp ảo của task lặp lại trong cùng khoảng (luôn ở trạng thái Pending)
+    occurrences = occurrences_in_range(start_date, end_date, user_filter if user_filter != 'all' else None)
+    if overdue_filter == '1':
+        occurrences = [o for o in occurrences if o.task_date < today]
+
+    # Serialize cả bảng một lần (dict thuần) — template và data-task-json dùng chung
+    all_tasks = query_task_dicts(tasks_query.order_by(Task.task_date.desc()), user_names)
+    all_tasks += serialize_tasks(occurrences, user_names, attachments_by_task={})
 
     status_meta = {
         'Pending': {'color': '#6c757d', 'icon': 'fa-solid fa-hourglass-half'},
@@ -1353,33 +1628,26 @@ def kanban_board():
 
     tasks_by_status = defaultdict(list)
     for task in all_tasks:
-        tasks_by_status[task.status].append(task)
+        tasks_by_status[task['status']].append(task)
 
     summary_data = []
-    tasks_by_user = defaultdict(lambda: {'tasks': [], 'status_counts': defaultdict(int)})
+    tasks_by_user = defaultdict(lambda: {'task_count': 0, 'status_counts': defaultdict(int)})
     for task in all_tasks:
-        if task.assignee:
-            user_key = task.assignee
-            tasks_by_user[user_key]['tasks'].append(task)
-            tasks_by_user[user_key]['status_counts'][task.status] += 1
+        if task['who_id'] in users_by_id:
+            tasks_by_user[task['who_id']]['task_count'] += 1
+            tasks_by_user[task['who_id']]['status_counts'][task['status']] += 1
             
-    for user, data in tasks_by_user.items():
+    for user_id, data in tasks_by_user.items():
         summary_data.append({
-            'user': user.to_dict(),
-            'task_count': len(data['tasks']),
+            'user': users_by_id[user_id].to_dict(),
+            'task_count': data['task_count'],
             'status_counts': dict(data['status_counts'])
         })
     summary_data.sort(key=lambda x: x['user']['username'])
 
     overall_status_counts = defaultdict(int)
     for task in all_tasks:
-        overall_status_counts[task.status] += 1
-
-    all_users = User.query.order_by(User.username).all()
-    all_projects = Project.query.order_by(Project.name).all()
-    all_builds = Build.query.order_by(Build.name).all()
-    all_objectives = Objective.query.order_by(Objective.content).all()
-    all_key_results = KeyResult.query.order_by(KeyResult.content).all()
+        overall_status_counts[task['status']] += 1
 
     context = {
         'page_name': 'kanban',
@@ -1389,6 +1657,7 @@ def kanban_board():
         'status_meta': status_meta,
         'users': all_users,
         'today_date_obj': today,
+        'today_date_str': today.strftime('%Y-%m-%d'),
         'filters': {
             'user': user_filter, 
             'period': period, 
@@ -1396,10 +1665,10 @@ def kanban_board():
         },
         'summary_data': summary_data,
         'overall_status_counts': dict(overall_status_counts),
-        'all_projects': all_projects,
-        'all_builds': all_builds,
-        'all_objectives': all_objectives,
-        'all_key_results': all_key_results
+        'all_projects': ref['projects'],
+        'all_builds': ref['builds'],
+        'all_objectives': ref['objectives'],
+        'all_key_results': ref['key_results']
     }
     
     return render_template('kanban.html', **context)
@@ -1417,7 +1686,7 @@ def update_task_status():
         if not task_id or not new_status:
             return jsonify({'success': False, 'message': 'Miss infor taskId or newStatus'}), 400
 
-        task = Task.query.get(task_id)
+        task = resolve_task(task_id)
         if not task:
             return jsonify({'success': False, 'message': 'Cannot find job'}), 404
         
@@ -1425,9 +1694,11 @@ def update_task_status():
         task.status = new_status
         
         log_action = f"changed status '{task.what}' từ {old_status} sang {new_status}."
-        db.session.add(Log(action=log_action, user_id=current_user.id))
+        record_log(log_action, task, user_id=current_user.id)
         
         db.session.commit()
+        if task.key_result_id and old_status != new_status:
+            recalculate_kr_progress(task.key_result_id)
         
         # CHANGE: Trả về đối tượng task đã được cập nhật
         # Điều này rất quan trọng để frontend có thể cập nhật "live"
@@ -1448,7 +1719,7 @@ def update_task_content(task_id):
         return jsonify({'success': False, 'message': 'Must not empty'}), 400
 
     old_content, task.what = task.what, new_content
-    db.session.add(Log(action=f"Update content job ID {task.id} from '{old_content}' to '{task.what}'.", user_id=current_user.id))
+    record_log(f"Update content job ID {task.id} from '{old_content}' to '{task.what}'.", task, user_id=current_user.id)
     db.session.commit()
     return jsonify({'success': True, 'message': 'Content updated!', 'new_content': task.what})
 
@@ -1952,23 +2223,33 @@ def get_recent_logs():
 @bp.route('/api/all-okr-data')
 @login_required
 def all_okr_data():
-    projects = Project.query.order_by(Project.name).all()
-    builds = Build.query.order_by(Build.name).all()
- 
-    objectives = Objective.query.options(subqueryload(Objective.key_results)).order_by(Objective.content).all()
-    key_results = KeyResult.query.order_by(KeyResult.content).all()
-
-    projects_list = [{'id': p.id, 'name': p.name, 'builds': [{'id': b.id, 'name': b.name} for b in p.builds]} for p in projects]
-    builds_dict = {b.id: {'id': b.id, 'name': b.name, 'project_id': b.project_id} for b in builds}
-    objectives_dict = {o.id: {'id': o.id, 'content': o.content, 'build_id': o.build_id, 'key_results': [{'id': kr.id, 'content': kr.content} for kr in o.key_results]} for o in objectives}
-    key_results_dict = {kr.id: {'id': kr.id, 'content': kr.content, 'objective_id': kr.objective_id} for kr in key_results}
-    
-    return jsonify({
-        'projects': projects_list,
-        'builds': builds_dict,
-        'objectives': objectives_dict,
-        'key_results': key_results_dict
-    })
+    """
+    Cây Project / Build / Objective / KR cho các dropdown OKR. Các request đến cùng lúc dùng chung
+    một lần nạp (app.single_flight), key theo version của cache tham chiếu nên lần ghi đã commit
+    luôn được request sau nhìn thấy.
+    """
+    def load():
+        projects = Project.query.order_by(Project.name).all()
+        builds = Build.query.order_by(Build.name).all()
+
+        objectives = Objective.query.options(subqueryload(Objective.key_results)).order_by(Objective.content).all()
+        key_results = KeyResult.query.order_by(KeyResult.content).all()
+
+        projects_list = [{'id': p.id, 'name': p.name, 'builds': [{'id': b.id, 'name': b.name} for b in p.builds]} for p in projects]
+        builds_dict = {b.id: {'id': b.id, 'name': b.name, 'project_id': b.project_id} for b in builds}
+        objectives_dict = {o.id: {'id': o.id, 'content': o.content, 'build_id': o.build_id, 'key_results': [{'id': kr.id, 'content': kr.content} for kr in o.key_results]} for o in objectives}
+        key_results_dict = {kr.id: {'id': kr.id, 'content': kr.content, 'objective_id': kr.objective_id} for kr in key_results}
+
+        return current_app.json.dumps({
+            'projects': projects_list,
+            'builds': builds_dict,
+            'objectives': objectives_dict,
+            'key_results': key_results_dict
+        })
+
+    versions = reference_versions()
+    key = ('all-okr-data',) + tuple(versions[kind] for kind in ('projects', 'builds', 'objectives', 'key_results'))
+    return current_app.response_class(single_flight(key, load), mimetype='application/json')
 @bp.route('/api/project/<int:project_id>')
 @login_required
 def api_get_project(project_id):
@@ -2003,53 +2284,10 @@ def api_get_build(build_id):
 def gantt_data():
     project_id = request.args.get('project_id', type=int)
     view_mode = request.args.get('view', 'detailed') # 'detailed' or 'overview'
-    
-    query = Project.query.options(
-        joinedload(Project.builds)
-        .joinedload(Build.objectives)
-        .joinedload(Objective.key_results)
-        .joinedload(KeyResult.tasks)
-    )
-
-    if project_id:
-        query = query.filter(Project.id == project_id)
-
-    projects = query.all()
-    gantt_tasks = []
-
-    for project in projects:
-        if project.start_date and project.end_date:
-            gantt_tasks.append({
-                'id': f'proj-{project.id}', 'name': project.name,
-                'start': project.start_date.isoformat(), 'end': project.end_date.isoformat(),
-                'progress': 0, 'custom_class': 'gantt-project'
-            })
-
-        for build in project.builds:
-            if build.start_date and build.end_date:
-                gantt_tasks.append({
-                    'id': f'build-{build.id}', 'name': build.name,
-                    'start': build.start_date.isoformat(), 'end': build.end_date.isoformat(),
-                    'progress': 0, 'dependencies': f'proj-{project.id}',
-                    'custom_class': 'gantt-build'
-                })
-
-        if view_mode == 'detailed':
-            all_tasks_in_project = [task for o in project.objectives for kr in o.key_results for task in kr.tasks]
-            for task in all_tasks_in_project:
-                if task.task_date:
-                    task_progress = 100 if task.status == 'Done' else 0
-                    end_date = task.task_date + timedelta(days=1)
-                    parent_build_id = task.key_result.objective.build_id if task.key_result and task.key_result.objective else None
-                    dependency = f'build-{parent_build_id}' if parent_build_id else f'proj-{project.id}'
-
-                    gantt_tasks.append({
-                        'id': f'task-{task.id}', 'name': task.what,
-                        'start': task.task_date.isoformat(), 'end': end_date.isoformat(),
-                        'progress': task_progress, 'dependencies': dependency
-                    })
-
-    return jsonify(gantt_tasks)
+    # Cửa sổ thời gian tùy chọn (?from=&to=): chỉ lấy các mục đang hoạt động trong cửa sổ
+    window_start, window_end = parse_window(request.args)
+    # Mỗi cấp một truy vấn, gom theo project trong bộ nhớ (app.portfolio_gantt)
+    return jsonify(portfolio_gantt_rows(project_id, view_mode, window_start, window_end))
 
 @bp.route('/timeline')
 @login_required
@@ -2168,20 +2406,19 @@ def update_objective_order():
 @login_required
 def global_timeline():
     """Render trang Global Timeline mới."""
-    # THÊM CODE LẤY DỮ LIỆU TỪ DATABASE
-    users = db.session.scalars(select(User).order_by(User.username)).all()
-    projects = db.session.scalars(select(Project).order_by(Project.name)).all()
+    # Danh sách dropdown lấy từ cache tham chiếu
+    ref = get_reference_data('users', 'projects', 'builds')
     status_choices = ['Planned', 'Active', 'On Hold', 'Done']
-    builds = db.session.scalars(select(Build).order_by(Build.name)).all()
 
     # GỬI DỮ LIỆU SANG TEMPLATE
     return render_template(
         'global_timeline.html', 
         page_name='global_timeline',
-        users=users,
-        projects=projects,
+        users=ref['users'],
+        projects=ref['projects'],
+        all_projects=ref['projects'],
         status_choices=status_choices,
-        builds=builds,
+        builds=ref['builds'],
         # Thêm selected_project_id=None để modal không báo lỗi
         selected_project_id=None 
     )
@@ -2197,57 +2434,18 @@ def global_roadmap():
 @login_required
 def vis_roadmap_data():
     """
-    API cung cấp dữ liệu cho vis-timeline.
-    Tạo sẵn HTML với inline style để đảm bảo giao diện chính xác.
+    API cung cấp dữ liệu cho vis-timeline: project là group, build là item.
+    Payload dựng sẵn (app.roadmap_data), chỉ dựng lại khi Project / Build được ghi; trả kèm
+    ETag / Last-Modified để màn hình treo tường polling nhận 304.
     """
-    def add_days(d, days): return (d + timedelta(days=days)) if d else None
-    def f_md(d): return d.strftime("%#m/%#d") if d else ""
-
-    def phase_class(name: str) -> str:
-        if not name: return ""
-        n = name.lower().strip()
-        if n.startswith("p1"): return "phase-p1"
-        if n.startswith("p2"): return "phase-p2"
-        if n.startswith("e1") or n.startswith("e") : return "phase-e1"
-        if n.startswith("e2"): return "phase-e2"
-        if n.startswith("d1") or n.startswith("d") : return "phase-d1"
-        if "pvt" in n: return "phase-pvt"
-        return "phase-poc"
-
-    projects = Project.query.options(
-        subqueryload(Project.builds)
-    ).order_by(Project.position, Project.name).all()
-
-    groups, items = [], []
-
-    # === SỬA ĐỔI LOGIC TẠI ĐÂY ===
-    for p in projects:
-        # 1. Luôn thêm project vào danh sách group để nó luôn hiển thị
-        groups.append({"id": p.id, "content": p.name or f"Project {p.id}"})
-
-        # 2. Lọc và sắp xếp các build có ngày tháng hợp lệ
-        builds_with_dates = sorted(
-            [b for b in p.builds if b.start_date and b.end_date], 
-            key=lambda x: x.start_date
-        )
-
-        # 3. Chỉ tạo các "item" (thanh timeline) cho các build hợp lệ này
-        for b in builds_with_dates:
-            label = (b.name or "Build").strip()
-            
-            items.append({
-                "id": f"build-{b.id}",
-                "group": p.id,
-                "content": label, # Sửa lại chỉ truyền text, HTML sẽ được tạo bởi template
-                "start": b.start_date.isoformat(),
-                "end": add_days(b.end_date, 1).isoformat(),
-                "className": f"phase {phase_class(b.name)}",
-                "title": f"{p.name} • {label} • {b.start_date} → {b.end_date}",
-                "project_id": p.id,
-            })
-    # ==============================
-
-    return jsonify({"success": True, "groups": groups, "items": items})
+    # Cửa sổ thời gian tùy chọn (?from=&to=): project vẫn luôn là group, chỉ build được lọc
+    window_start, window_end = parse_window(request.args)
+    etag, last_modified, body = roadmap_payload(window_start, window_end)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @bp.route('/api/projects/update-order', methods=['POST'])
 @login_required
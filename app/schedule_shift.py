@@ -0,0 +1,119 @@
+# app/schedule_shift.py
+# Dời lịch cả nhánh (Project / Build / Objective) thêm N ngày. Mỗi cấp là một câu UPDATE theo
+# tập, phạm vi lấy bằng subquery id của cấp cha, tất cả trong transaction của request. UPDATE
+# Core không đi qua các listener của session nên các version / cache liên quan được cập nhật
+# trực tiếp ở đây (version gantt trước commit, cache trong tiến trình sau commit). Task bị dời
+# được đặt updated_at mới để ETag lịch / đồng bộ delta thấy thay đổi; exception của chuỗi lặp
+# lại giữ id, chỉ đổi recurrence_date theo task gốc.
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, func, or_, select, update
+
+from app import db
+from app.gantt_cache import bump_project_versions
+from app.audit import record_log
+from app.models import Build, KeyResult, Objective, Project, Task
+
+SHIFT_TARGETS = {'project': Project, 'build': Build, 'objective': Objective}
+MAX_SHIFT_DAYS = 3650
+
+_project = Project.__table__
+_build = Build.__table__
+_objective = Objective.__table__
+_kr = KeyResult.__table__
+_task = Task.__table__
+
+
+def _shifted(col, days):
+    """Biểu thức cột ngày + N ngày (NULL giữ nguyên)."""
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(col, f'{days:+d} days')
+    return col + timedelta(days=days)
+
+
+def _shift_rows(table, criteria, days, *cols, **extra):
+    values = {col: _shifted(table.c[col], days) for col in cols}
+    return db.session.execute(update(table).where(criteria).values({**values, **extra})).rowcount
+
+
+def _scopes(item_type, item_id):
+    """(project_ids, build_ids, objective_ids) dạng select id; None nếu cấp đó không bị dời."""
+    project_ids = build_ids = None
+    if item_type == 'project':
+        project_ids = select(_project.c.id).where(_project.c.id == item_id)
+        build_ids = select(_build.c.id).where(_build.c.project_id == item_id)
+        objective_ids = select(_objective.c.id).where(
+            or_(_objective.c.project_id == item_id, _objective.c.build_id.in_(build_ids)))
+    elif item_type == 'build':
+        build_ids = select(_build.c.id).where(_build.c.id == item_id)
+        objective_ids = select(_objective.c.id).where(_objective.c.build_id == item_id)
+    else:
+        objective_ids = select(_objective.c.id).where(_objective.c.id == item_id)
+    return project_ids, build_ids, objective_ids
+
+
+def _affected_projects(item_type, item, objective_ids):
+    """Các project có gantt đổi: project của mục gốc + project của các Objective bị dời."""
+    project_ids = {item.id} if item_type == 'project' else {item.project_id} - {None}
+    for build_project, project_id in db.session.execute(
+            select(_build.c.project_id, _objective.c.project_id)
+            .select_from(_objective.outerjoin(_build, _build.c.id == _objective.c.build_id))
+            .where(_objective.c.id.in_(objective_ids))):
+        project_ids.update(pid for pid in (build_project, project_id) if pid)
+    return project_ids
+
+
+def shift_schedule(item_type, item_id, days, user_id=None):
+    """
+    Dời mục và mọi ngày bên dưới thêm `days` ngày (âm = lùi). Trả về số row đã dời theo cấp,
+    hoặc None nếu không tìm thấy mục. Chưa commit; ghi một dòng Log tóm tắt.
+    """
+    model = SHIFT_TARGETS[item_type]
+    item = db.session.get(model, item_id)
+    if item is None:
+        return None
+    # Đưa thay đổi ORM đang chờ xuống DB trước khi UPDATE theo tập
+    db.session.flush()
+
+    project_ids, build_ids, objective_ids = _scopes(item_type, item_id)
+    kr_ids = select(_kr.c.id).where(_kr.c.objective_id.in_(objective_ids))
+    task_scope = _task.c.key_result_id.in_(kr_ids)
+    affected_projects = _affected_projects(item_type, item, objective_ids)
+    name = getattr(item, 'name', None) or getattr(item, 'content', '')
+
+    # Ngày đã xóa của chuỗi lặp lại là chuỗi văn bản, dời trong Python (chỉ các task gốc có exdates)
+    exdate_rows = [
+        {'task_id': task_id, 'exdates': ','.join(sorted(
+            (date.fromisoformat(s) + timedelta(days=days)).isoformat() for s in raw.split(',') if s))}
+        for task_id, raw in db.session.execute(
+            select(_task.c.id, _task.c.recurrence_exdates).where(task_scope, _task.c.recurrence_exdates.isnot(None)))
+    ]
+
+    # updated_at đặt rõ ràng: ETag lịch và đồng bộ delta nhận ra các task bị dời
+    now = datetime.utcnow()
+    parent_ids = select(_task.c.id).where(task_scope)
+    counts = {
+        'tasks': _shift_rows(_task, task_scope, days, 'task_date', 'recurrence_end_date', updated_at=now),
+        # Khóa 'parent_id:ngày' của lần lặp đã ghi đi theo chuỗi của task gốc, kể cả exception
+        # đã được chuyển sang KR khác nằm ngoài nhánh — không thì lần lặp ảo ở ngày cũ hiện lại
+        'occurrences': _shift_rows(_task, _task.c.recurrence_parent_id.in_(parent_ids), days, 'recurrence_date',
+                                   updated_at=now),
+        'key_results': _shift_rows(_kr, _kr.c.id.in_(kr_ids), days, 'start_date', 'end_date'),
+        'objectives': _shift_rows(_objective, _objective.c.id.in_(objective_ids), days, 'start_date', 'end_date'),
+        'builds': _shift_rows(_build, _build.c.id.in_(build_ids), days, 'start_date', 'end_date')
+        if build_ids is not None else 0,
+        'projects': _shift_rows(_project, _project.c.id.in_(project_ids), days, 'start_date', 'end_date')
+        if project_ids is not None else 0,
+    }
+    if exdate_rows:
+        stmt = update(_task).where(_task.c.id == bindparam('task_id')).values(
+            recurrence_exdates=bindparam('exdates'), updated_at=now)
+        db.session.execute(stmt, exdate_rows)
+
+    bump_project_versions(affected_projects)
+    # Các object đã nạp trong session đang giữ ngày cũ
+    db.session.expire_all()
+
+    summary = ', '.join(f'{count} {level}' for level, count in counts.items() if count)
+    record_log(f"Shifted {item_type} ID {item_id} '{name}' by {days:+d} days ({summary})", item, user_id=user_id)
+    return counts
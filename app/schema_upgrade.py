@@ -0,0 +1,121 @@
+# app/schema_upgrade.py
+# Nâng cấp schema tại chỗ khi khởi động. db.create_all() chỉ tạo bảng mới, không ALTER bảng đã
+# có, nên database.db cũ thiếu các cột / index được thêm vào models sau này. Bước này so sánh
+# metadata với DB thật: tạo bảng còn thiếu, ADD COLUMN cho cột còn thiếu, CREATE INDEX cho index
+# còn thiếu, rồi chạy bước điền dữ liệu (backfill) gắn với từng cột vừa được thêm. Chạy lại
+# nhiều lần không đổi gì (idempotent).
+
+from datetime import datetime, time
+from sqlalchemy import bindparam, func, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
+
+from app import db
+from app.audit import backfill_log_entities
+from app.models import Project, Task
+from app.progress import recount_key_results, refresh_progress
+
+# (bảng, cột) -> hàm điền dữ liệu cho các row đã có, chạy đúng một lần ngay sau khi thêm cột
+_BACKFILLS = {}
+
+
+def backfill(table_name, column_name):
+    """Đăng ký hàm điền dữ liệu cho một cột mới. Hàm dùng db.session, được commit sau khi chạy."""
+    def register(fn):
+        _BACKFILLS[(table_name, column_name)] = fn
+        return fn
+    return register
+
+
+def _column_ddl(column, dialect):
+    """DDL của cột cho ALTER TABLE ... ADD COLUMN. NOT NULL chỉ giữ khi có server_default."""
+    ddl = str(CreateColumn(column).compile(dialect=dialect))
+    if not column.nullable and column.server_default is None:
+        ddl = ddl.replace(' NOT NULL', '')
+    return ddl
+
+
+def upgrade_schema(engine=None):
+    """Đưa schema của DB về khớp models. Trả về danh sách (bảng, cột) vừa được thêm."""
+    engine = engine or db.engine
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                table.create(conn)
+                continue
+            existing_columns = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} "
+                                  f"ADD COLUMN {_column_ddl(column, engine.dialect)}"))
+                added.append((table.name, column.name))
+
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    # Mỗi hàm backfill chỉ chạy một lần dù được đăng ký cho nhiều cột cùng thêm một lúc
+    done = []
+    for key in added:
+        fn = _BACKFILLS.get(key)
+        if fn and fn not in done:
+            fn()
+            done.append(fn)
+    if done:
+        db.session.commit()
+    return added
+
+
+# ------------------------------------------------------------------------------
+# Điền dữ liệu cho các cột mới
+# ------------------------------------------------------------------------------
+@backfill('task', 'created_at')
+@backfill('task', 'updated_at')
+def _backfill_task_stamps():
+    """
+    Dấu thời gian của task cũ lấy theo task_date (task không có ngày -> lúc nâng cấp), không vượt
+    quá hiện tại để con trỏ đồng bộ delta không nhảy tới tương lai. ETag lịch / delta cần giá trị
+    khác NULL.
+    """
+    task = Task.__table__
+    now = datetime.utcnow()
+    rows = db.session.execute(select(task.c.id, task.c.task_date)
+                              .where((task.c.created_at.is_(None)) | (task.c.updated_at.is_(None)))).all()
+    params = []
+    for task_id, task_date in rows:
+        stamp = min(datetime.combine(task_date, time()), now) if task_date else now
+        params.append({'task_id': task_id, 'stamp': stamp})
+    if params:
+        db.session.execute(
+            update(task).where(task.c.id == bindparam('task_id'))
+            .values(created_at=func.coalesce(task.c.created_at, bindparam('stamp')),
+                    updated_at=func.coalesce(task.c.updated_at, bindparam('stamp'))),
+            params)
+
+
+@backfill('objective', 'progress')
+@backfill('build', 'progress')
+@backfill('project', 'progress')
+def _backfill_progress():
+    """Cột progress mới bắt đầu từ 0: tính lại toàn bộ KR rồi dồn lên Objective / Build / Project."""
+    recount_key_results()
+    refresh_progress()
+
+
+@backfill('project', 'gantt_version')
+def _backfill_gantt_version():
+    """Version gantt bắt đầu từ 0 (server_default chỉ áp cho row mới ở một số CSDL)."""
+    project = Project.__table__
+    db.session.execute(update(project).where(project.c.gantt_version.is_(None)).values(gantt_version=0))
+
+
+@backfill('log', 'entity_type')
+@backfill('log', 'entity_id')
+@backfill('log', 'project_id')
+def _backfill_log_entities():
+    """Log cũ: đọc đối tượng từ nội dung action để tab hoạt động project thấy được (app.audit)."""
+    backfill_log_entities()
@@ -0,0 +1,89 @@
+# app/serializers.py
+# Serialize task theo lô: một map user -> tên, một truy vấn file đính kèm cho cả lô,
+# URL file ghép từ prefix tính sẵn. Kết quả là dict thuần, encode JSON một lần.
+
+from collections import defaultdict
+from flask import url_for
+
+from app import db
+from app.models import Task, UploadedFile, User
+
+# Các cột cần để serialize task — truy vấn theo tuple thay vì nạp ORM object
+TASK_FIELDS = (
+    Task.id, Task.task_date, Task.hour, Task.what, Task.who_id, Task.status, Task.note,
+    Task.report, Task.recurrence, Task.recurrence_end_date, Task.key_result_id, Task.priority,
+    Task.recurrence_parent_id
+)
+
+
+def _url_prefix(endpoint, **values):
+    """Gọi url_for một lần với giá trị giả rồi cắt phần đuôi để được prefix dùng lại."""
+    url = url_for(endpoint, **values)
+    return url[:-len(str(next(iter(values.values()))))]
+
+
+def user_name_map():
+    return dict(db.session.query(User.id, User.username).all())
+
+
+def load_attachments(task_ids):
+    """{task_id: [attachment_dict, ...]} cho cả lô task bằng một truy vấn."""
+    attachments_by_task = defaultdict(list)
+    task_ids = [task_id for task_id in task_ids if isinstance(task_id, int)]
+    if not task_ids:
+        return attachments_by_task
+
+    file_prefix = _url_prefix('main.uploaded_file', filename='_')
+    delete_prefix = _url_prefix('main.delete_uploaded_file', file_id=0)
+    rows = db.session.query(UploadedFile.task_id, UploadedFile.id, UploadedFile.original_filename,
+                            UploadedFile.saved_filename) \
+        .filter(UploadedFile.task_id.in_(task_ids)).order_by(UploadedFile.id)
+    for task_id, file_id, original_filename, saved_filename in rows:
+        attachments_by_task[task_id].append({
+            'id': file_id,
+            'original_filename': original_filename,
+            'url': file_prefix + saved_filename,
+            'delete_url': f"{delete_prefix}{file_id}"
+        })
+    return attachments_by_task
+
+
+def serialize_tasks(tasks, user_names=None, attachments_by_task=None):
+    """
+    Serialize một lô task. `tasks` có thể là Task, TaskOccurrence hoặc Row lấy theo
+    TASK_FIELDS — chỉ cần đọc được các thuộc tính cùng tên. Cho cùng kết quả với
+    Task.to_dict() nhưng không chạm tới quan hệ assignee / attachments của từng row.
+    """
+    if user_names is None:
+        user_names = user_name_map()
+    if attachments_by_task is None:
+        attachments_by_task = load_attachments([t.id for t in tasks])
+
+    result = []
+    for t in tasks:
+        data = {
+            'id': t.id,
+            'date': t.task_date.strftime('%Y-%m-%d') if t.task_date else None,
+            'hour': t.hour,
+            'what': t.what,
+            'who': user_names.get(t.who_id, '') if t.who_id else '',
+            'who_id': t.who_id,
+            'status': t.status,
+            'note': t.note,
+            'report': t.report,
+            'recurrence': t.recurrence,
+            'recurrence_end_date': t.recurrence_end_date.strftime('%Y-%m-%d') if t.recurrence_end_date else None,
+            'attachments': attachments_by_task.get(t.id, []),
+            'key_result_id': t.key_result_id,
+            'priority': t.priority,
+            'recurrence_parent_id': t.recurrence_parent_id
+        }
+        if getattr(t, 'is_occurrence', False):
+            data['is_occurrence'] = True
+        result.append(data)
+    return result
+
+
+def query_task_dicts(query, user_names=None):
+    """Chạy một Task query chỉ lấy TASK_FIELDS (không hydrate ORM) rồi serialize theo lô."""
+    return serialize_tasks(query.with_entities(*TASK_FIELDS).all(), user_names)
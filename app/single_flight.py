@@ -0,0 +1,58 @@
+# app/single_flight.py
+# Gộp các lần tính trùng nhau đang chạy song song (single-flight). Khi nhiều thread Waitress cùng
+# cần một kết quả theo cùng key (vd. đầu buổi standup mọi người mở cùng một trang), thread đến đầu
+# tiên tính, các thread còn lại chờ và dùng chung kết quả (hoặc exception) của lần tính đó.
+# Không phải cache: key được bỏ ngay khi lần tính xong, request sau đó sẽ tính lại hoặc đọc cache
+# phía trên. Kết quả được chia sẻ giữa các thread nên phải là dữ liệu thuần (chuỗi JSON, tuple
+# ...), không phải object ORM gắn với session của thread đã tính.
+# Thread chờ tối đa SINGLE_FLIGHT_WAIT giây: thread tính đầu bị treo (DB khóa, truy vấn chậm) thì
+# các thread chờ tự tính lấy thay vì treo theo.
+
+import threading
+
+SINGLE_FLIGHT_WAIT = 10.0
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_lock = threading.Lock()
+_calls = {}
+
+
+def single_flight(key, fn, timeout=None):
+    """
+    Kết quả của fn() cho key. Nếu đang có thread khác tính cùng key thì chờ và trả kết quả của
+    thread đó thay vì gọi fn() lần nữa; chờ quá `timeout` giây (mặc định SINGLE_FLIGHT_WAIT) thì
+    tự gọi fn().
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        if not call.done.wait(SINGLE_FLIGHT_WAIT if timeout is None else timeout):
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call.done.set()
+
@@ -0,0 +1,100 @@
+# app/snapshots.py
+# Ảnh chụp tiến độ hằng ngày cho biểu đồ burndown/burnup. Mỗi ngày một row cho mỗi
+# Project / Build / Objective: current, target = tổng current/target của các KR bên dưới,
+# progress = cột progress đã lưu (app.progress). Ghi bằng INSERT ... SELECT theo từng cấp.
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, ProgressSnapshot
+
+SNAPSHOT_ENTITY_TYPES = ('project', 'build', 'objective')
+
+_snapshot = ProgressSnapshot.__table__
+_kr = KeyResult.__table__
+_objective = Objective.__table__
+_build = Build.__table__
+_project = Project.__table__
+
+
+def _snapshot_select(entity_type, entity_table, group_col, source, day):
+    """SELECT (entity_type, id, ngày, SUM(current), SUM(target), progress) cho một cấp."""
+    sums = select(
+        group_col.label('entity_id'),
+        func.sum(_kr.c.current).label('current'),
+        func.sum(_kr.c.target).label('target')
+    ).select_from(source).group_by(group_col).subquery()
+    return select(
+        literal(entity_type), entity_table.c.id, literal(day),
+        func.coalesce(sums.c.current, 0), func.coalesce(sums.c.target, 0), entity_table.c.progress
+    ).select_from(entity_table.outerjoin(sums, sums.c.entity_id == entity_table.c.id))
+
+
+def take_progress_snapshot(day=None):
+    """
+    Chụp tiến độ của toàn bộ cây cho một ngày (mặc định hôm nay). Chạy lại trong cùng
+    ngày sẽ ghi đè. Trả về số row đã ghi (chưa commit).
+    """
+    day = day or date.today()
+    kr_objective = _kr.join(_objective, _objective.c.id == _kr.c.objective_id)
+    levels = (
+        ('objective', _objective, _kr.c.objective_id, _kr),
+        ('build', _build, _objective.c.build_id, kr_objective),
+        ('project', _project, _objective.c.project_id, kr_objective),
+    )
+    db.session.execute(delete(_snapshot).where(_snapshot.c.snapshot_date == day))
+    columns = ['entity_type', 'entity_id', 'snapshot_date', 'current', 'target', 'progress']
+    for entity_type, entity_table, group_col, source in levels:
+        db.session.execute(
+            insert(_snapshot).from_select(columns, _snapshot_select(entity_type, entity_table, group_col, source, day))
+        )
+    return db.session.query(func.count(ProgressSnapshot.id)).filter(ProgressSnapshot.snapshot_date == day).scalar()
+
+
+def progress_series(entity_type, entity_id, start_date=None, end_date=None):
+    """Chuỗi thời gian [{date, current, target, progress}] của một đối tượng, đọc thẳng từ snapshot."""
+    query = ProgressSnapshot.query.filter_by(entity_type=entity_type, entity_id=entity_id)
+    if start_date:
+        query = query.filter(ProgressSnapshot.snapshot_date >= start_date)
+    if end_date:
+        query = query.filter(ProgressSnapshot.snapshot_date <= end_date)
+    return [s.to_dict() for s in query.order_by(ProgressSnapshot.snapshot_date)]
+
+
+# ------------------------------------------------------------------------------
+# Lịch chạy: một thread nền chụp khi khởi động (nếu hôm nay chưa có) và sau mỗi nửa đêm
+# ------------------------------------------------------------------------------
+def _seconds_until_next_run(now=None):
+    now = now or datetime.now()
+    next_run = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) + timedelta(minutes=5)
+    return (next_run - now).total_seconds()
+
+
+def _snapshot_if_missing(app):
+    with app.app_context():
+        try:
+            today = date.today()
+            if not db.session.query(ProgressSnapshot.id).filter_by(snapshot_date=today).first():
+                count = take_progress_snapshot(today)
+                db.session.commit()
+                app.logger.info('Progress snapshot %s: %s rows', today, count)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Progress snapshot failed: {e}")
+        finally:
+            db.session.remove()
+
+
+def start_snapshot_scheduler(app):
+    """Khởi động thread chụp tiến độ hằng ngày (gọi từ điểm chạy server: run.py / launcher.py)."""
+    def loop():
+        while True:
+            _snapshot_if_missing(app)
+            time.sleep(_seconds_until_next_run())
+
+    thread = threading.Thread(target=loop, name='progress-snapshot', daemon=True)
+    thread.start()
+    return thread
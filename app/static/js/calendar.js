@@ -27,11 +27,8 @@
     // A unified selector for task cards across all views
     const TASK_CARD_SELECTOR = '.timed-task-item, .kanban-card';
 
-    // Global data for cascading dropdowns
-    let allProjectsData = [];
-    let allBuildsData = {};
-    let allObjectivesData = {};
-    let allKeyResultsData = {};
+    // Cascading dropdowns: chỉ tải trang đầu của từng cấp, phần còn lại tải khi chọn "Load more..."
+    const PICKER_MORE = '__more__';
 
     // --- 2. CORE MODAL & DATA FUNCTIONS (GIỮ NGUYÊN TOÀN BỘ TÍNH NĂNG GỐC CỦA BẠN) ---
     
@@ -99,25 +96,12 @@
         f('taskRecurrenceEndDate').value = task.recurrence_end_date || '';
         f('taskWho').value = task.id ? (task.who_id || '') : (window.CURRENT_USER_ID || '');
         
+        f('taskProject').value = '';
+        loadBuilds('', '');
+        loadObjectives('', '');
+        loadKeyResults('', '');
         if (task.key_result_id) {
-             const kr = allKeyResultsData[task.key_result_id];
-             if (kr) {
-                 const obj = allObjectivesData[kr.objective_id];
-                 if (obj) {
-                     const build = allBuildsData[obj.build_id];
-                     if (build) {
-                          f('taskProject').value = build.project_id || '';
-                          loadBuilds(f('taskProject').value, obj.build_id);
-                          loadObjectives(obj.build_id, obj.id);
-                          loadKeyResults(obj.id, kr.id);
-                     }
-                 }
-             }
-        } else {
-             f('taskProject').value = '';
-             loadBuilds('', '');
-             loadObjectives('', '');
-             loadKeyResults('', '');
+             populateOkrChain(task.key_result_id);
         }
 
         f('taskModalLabel').textContent = task.id ? 'Edit Task' : 'Create New Task';
@@ -135,78 +119,74 @@
         if (inputRecurrence) inputRecurrence.dispatchEvent(new Event('change'));
     }
     
-    async function loadProjects() {
-        // ... (Giữ nguyên toàn bộ các hàm loadProjects, loadBuilds, loadObjectives, loadKeyResults...)
-        const res = await fetch('/api/projects');
-        const data = await res.json();
-        allProjectsData = data.projects;
-        const select = f('taskProject');
-        select.innerHTML = '<option value="">--- Select ---</option>';
-        allProjectsData.forEach(p => {
-            const opt = document.createElement('option');
-            opt.value = p.id;
-            opt.textContent = p.name;
-            select.appendChild(opt);
-        });
-    }
-
-    function loadBuilds(projectId, selectedBuildId = '') {
-        const select = f('taskBuild');
-        select.innerHTML = '<option value="">--- Select ---</option>';
-        const project = allProjectsData.find(p => p.id == projectId);
-        if (project) {
-            project.builds.forEach(b => {
-                const opt = document.createElement('option');
-                opt.value = b.id;
-                opt.textContent = b.name;
-                select.appendChild(opt);
-                if (b.id == selectedBuildId) {
-                    opt.selected = true;
+    async function loadPickerOptions(select, url, selectedId = '', cursor = null) {
+        if (!select) return;
+        if (!cursor) {
+            select.innerHTML = '<option value="">--- Select ---</option>';
+            select.dataset.url = url || '';
+        }
+        if (!url) return;
+        const params = new URLSearchParams();
+        if (cursor) params.set('cursor', cursor);
+        else if (selectedId) params.set('selected', selectedId);
+        try {
+            const res = await fetch(`${url}?${params}`);
+            const data = await res.json();
+            if (select.dataset.url !== url) return; // cấp cha đã đổi trong lúc đang tải
+            select.querySelector(`option[value="${PICKER_MORE}"]`)?.remove();
+            if (!data.success) return;
+            data.items.forEach(item => {
+                if (!select.querySelector(`option[value="${item.id}"]`)) {
+                    select.appendChild(new Option(item.name, item.id));
                 }
             });
+            if (data.next_cursor) {
+                const more = new Option('Load more...', PICKER_MORE);
+                more.dataset.cursor = data.next_cursor;
+                select.appendChild(more);
+            }
+            if (selectedId) select.value = selectedId;
+        } catch (err) {
+            console.error('Failed to load dropdown options:', err);
         }
     }
 
+    // Chọn "Load more..." thì tải trang kế tiếp; trả về true để bỏ qua việc nạp cấp con
+    function handleLoadMore(select) {
+        const more = select.querySelector(`option[value="${PICKER_MORE}"]`);
+        if (select.value !== PICKER_MORE || !more) return false;
+        select.value = '';
+        loadPickerOptions(select, select.dataset.url, '', more.dataset.cursor);
+        return true;
+    }
+
+    function loadBuilds(projectId, selectedBuildId = '') {
+        return loadPickerOptions(f('taskBuild'), projectId ? `/api/builds/${projectId}` : null, selectedBuildId);
+    }
+
     function loadObjectives(buildId, selectedObjectiveId = '') {
-        const select = f('taskObjective');
-        select.innerHTML = '<option value="">--- Select ---</option>';
-        const objectives = Object.values(allObjectivesData).filter(o => o.build_id == buildId);
-        if (objectives) {
-            objectives.forEach(o => {
-                const opt = document.createElement('option');
-                opt.value = o.id;
-                opt.textContent = o.content;
-                select.appendChild(opt);
-                if (o.id == selectedObjectiveId) {
-                    opt.selected = true;
-                }
-            });
-        }
+        return loadPickerOptions(f('taskObjective'), buildId ? `/api/objectives/${buildId}` : null, selectedObjectiveId);
     }
 
     function loadKeyResults(objectiveId, selectedKeyResultId = '') {
-        const select = f('taskKeyResult');
-        select.innerHTML = '<option value="">--- Select ---</option>';
-        const objective = allObjectivesData[objectiveId];
-        if (objective) {
-            objective.key_results.forEach(kr => {
-                const opt = document.createElement('option');
-                opt.value = kr.id;
-                opt.textContent = kr.content;
-                select.appendChild(opt);
-                if (kr.id == selectedKeyResultId) {
-                    opt.selected = true;
-                }
-            });
-        }
+        return loadPickerOptions(f('taskKeyResult'), objectiveId ? `/api/key-results/${objectiveId}` : null, selectedKeyResultId);
     }
 
-    async function fetchAllOkrData() {
-        const res = await fetch('/api/all-okr-data');
-        const data = await res.json();
-        allObjectivesData = data.objectives;
-        allBuildsData = data.builds;
-        allKeyResultsData = data.key_results;
+    async function populateOkrChain(keyResultId) {
+        try {
+            const res = await fetch(`/api/kr-context/${keyResultId}`);
+            const data = await res.json();
+            if (!data.success) return;
+            const { project_id, build_id, objective_id, key_result_id } = data.context;
+            f('taskProject').value = project_id || '';
+            await Promise.all([
+                loadBuilds(project_id, build_id),
+                loadObjectives(build_id, objective_id),
+                loadKeyResults(objective_id, key_result_id)
+            ]);
+        } catch (err) {
+            console.error('Failed to load OKR context:', err);
+        }
     }
 
     async function handleDeleteTask(taskId) {
@@ -255,9 +235,6 @@
 
     // --- 3. MAIN INITIALIZATION & EVENT LISTENERS (PHẦN DUY NHẤT ĐƯỢC THAY ĐỔI) ---
     document.addEventListener('DOMContentLoaded', async () => {
-        await fetchAllOkrData();
-        await loadProjects();
-        
         // **BỘ LẮNG NGHE SỰ KIỆN CLICK TẬP TRUNG (GLOBAL CLICK LISTENER)**
         // Bắt tất cả các click trên trang
         document.body.addEventListener('click', function(e) {
@@ -336,15 +313,30 @@
         // Dropdown liên cấp
         const taskProjectSelect = f('taskProject');
         if(taskProjectSelect) {
-            taskProjectSelect.addEventListener('change', (e) => loadBuilds(e.target.value));
+            taskProjectSelect.addEventListener('change', (e) => {
+                loadBuilds(e.target.value);
+                loadObjectives('');
+                loadKeyResults('');
+            });
         }
         const taskBuildSelect = f('taskBuild');
         if(taskBuildSelect) {
-            taskBuildSelect.addEventListener('change', (e) => loadObjectives(e.target.value));
+            taskBuildSelect.addEventListener('change', (e) => {
+                if (handleLoadMore(e.target)) return;
+                loadObjectives(e.target.value);
+                loadKeyResults('');
+            });
         }
         const taskObjectiveSelect = f('taskObjective');
         if(taskObjectiveSelect) {
-            taskObjectiveSelect.addEventListener('change', (e) => loadKeyResults(e.target.value));
+            taskObjectiveSelect.addEventListener('change', (e) => {
+                if (handleLoadMore(e.target)) return;
+                loadKeyResults(e.target.value);
+            });
+        }
+        const taskKeyResultSelect = f('taskKeyResult');
+        if(taskKeyResultSelect) {
+            taskKeyResultSelect.addEventListener('change', (e) => handleLoadMore(e.target));
         }
 
         // Logic ẩn/hiện ngày lặp lại
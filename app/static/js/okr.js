@@ -25,6 +25,9 @@ document.addEventListener('DOMContentLoaded', function () {
     // MỚI: Lấy tham chiếu đến các dropdown Project và Build trong modal Objective
     const projectSelect = objectiveForm?.querySelector('select[name="project_id"]');
     const buildSelect = objectiveForm?.querySelector('select[name="build_id"]');
+    const PICKER_MORE = '__more__';
+    let buildRequestId = 0;
+    const buildSearch = createBuildSearch();
 
     // ========================================================
     // LOGIC CHO CÁC SỰ KIỆN CLICK VÀ SUBMIT
@@ -185,6 +188,7 @@ document.addEventListener('DOMContentLoaded', function () {
     if (projectSelect) {
         projectSelect.addEventListener('change', () => {
             // Khi project thay đổi, gọi hàm cập nhật Build nhưng không cần chọn trước build nào
+            if (buildSearch) buildSearch.value = '';
             updateBuildsDropdown(null);
         });
     }
@@ -193,38 +197,58 @@ document.addEventListener('DOMContentLoaded', function () {
     // CÁC HÀM HELPER
     // ========================================================
     
-    // MỚI: Hàm để cập nhật danh sách Build dựa trên Project đã chọn
-    async function updateBuildsDropdown(selectedBuildId = null) {
+    // MỚI: Hàm để cập nhật danh sách Build dựa trên Project đã chọn.
+    // API trả từng trang (next_cursor / has_more): trang đầu thay danh sách, các trang sau được nối
+    // thêm khi chọn "Load more...". Ô tìm kiếm phía trên lọc theo tiền tố tên (q=).
+    async function updateBuildsDropdown(selectedBuildId = null, cursor = null) {
         if (!projectSelect || !buildSelect) return;
 
         const projectId = projectSelect.value;
-        
-        // Xóa các lựa chọn cũ và vô hiệu hóa dropdown Build
-        buildSelect.innerHTML = '<option value="">-- Choose Build --</option>';
-        
+        const requestId = ++buildRequestId;
+
+        if (!cursor) {
+            // Xóa các lựa chọn cũ và vô hiệu hóa dropdown Build
+            buildSelect.innerHTML = '<option value="">-- Choose Build --</option>';
+        }
+
         if (!projectId) {
             buildSelect.disabled = true;
+            if (buildSearch) buildSearch.disabled = true;
             return; // Nếu không có project nào được chọn, dừng lại
         }
 
         // Kích hoạt dropdown và hiển thị trạng thái đang tải
         buildSelect.disabled = false;
-        buildSelect.querySelector('option').textContent = 'Loading builds...';
+        if (buildSearch) buildSearch.disabled = false;
+        if (!cursor) buildSelect.querySelector('option').textContent = 'Loading builds...';
 
         try {
-            const response = await fetch(`/api/builds/${projectId}`);
+            const params = new URLSearchParams();
+            const q = buildSearch ? buildSearch.value.trim() : '';
+            if (q) params.set('q', q);
+            if (cursor) params.set('cursor', cursor);
+            else if (selectedBuildId) params.set('selected', selectedBuildId);
+            const response = await fetch(`/api/builds/${projectId}?${params}`);
             if (!response.ok) throw new Error('Network response was not ok');
             const data = await response.json();
+            // Project / từ khóa đã đổi trong lúc đang tải -> bỏ kết quả cũ
+            if (requestId !== buildRequestId) return;
 
-            // Xóa trạng thái loading và cập nhật danh sách mới
-            buildSelect.innerHTML = '<option value="">-- Choose Build --</option>';
+            buildSelect.querySelector(`option[value="${PICKER_MORE}"]`)?.remove();
+            if (!cursor) buildSelect.querySelector('option').textContent = '-- Choose Build --';
             if (data.success && data.items) {
                 data.items.forEach(build => {
-                    // Tạo một <option> mới cho mỗi build
-                    const option = new Option(build.name, build.id);
-                    buildSelect.add(option);
+                    // Tạo một <option> mới cho mỗi build (mục "selected" có thể đã có ở trang trước)
+                    if (!buildSelect.querySelector(`option[value="${build.id}"]`)) {
+                        buildSelect.add(new Option(build.name, build.id));
+                    }
                 });
             }
+            if (data.has_more && data.next_cursor) {
+                const more = new Option('Load more...', PICKER_MORE);
+                more.dataset.cursor = data.next_cursor;
+                buildSelect.add(more);
+            }
 
             // Nếu đang edit, tự động chọn lại build đã lưu
             if (selectedBuildId) {
@@ -238,6 +262,38 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    // Ô tìm Build theo tên, đặt ngay trên dropdown Build
+    function createBuildSearch() {
+        if (!buildSelect) return null;
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control form-control-sm mb-1';
+        input.placeholder = 'Search builds...';
+        input.autocomplete = 'off';
+        buildSelect.parentNode.insertBefore(input, buildSelect);
+
+        let timer = null;
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => updateBuildsDropdown(null), 250);
+        });
+        // Enter trong ô tìm không submit form Objective
+        input.addEventListener('keydown', (event) => {
+            if (event.key === 'Enter') event.preventDefault();
+        });
+        return input;
+    }
+
+    if (buildSelect) {
+        // Chọn "Load more..." thì tải trang kế tiếp theo cursor
+        buildSelect.addEventListener('change', () => {
+            const more = buildSelect.querySelector(`option[value="${PICKER_MORE}"]`);
+            if (buildSelect.value !== PICKER_MORE || !more) return;
+            buildSelect.value = '';
+            updateBuildsDropdown(null, more.dataset.cursor);
+        });
+    }
+
 
     function openKrModal(objectiveId) {
         if (!addKrForm || !krModal) return;
@@ -60,8 +60,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Logic cho Gantt Chart (Timeline Tab)
     if (window.active_tab === 'timeline' && window.project_id) {
         if (document.getElementById('gantt_here')) {
+            gantt.config.branch_loading = true;
             gantt.init("gantt_here");
-            gantt.load(`/api/dhtmlx-data?project_id=${window.project_id}`);
+            gantt.load(`/api/dhtmlx-data?project_id=${window.project_id}&lazy=1`);
         }
     }
 });
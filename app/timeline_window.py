@@ -0,0 +1,48 @@
+# app/timeline_window.py
+# Cửa sổ thời gian (?from=&to=) cho các API timeline: gantt_data, api_dhtmlx_data, vis_roadmap_data.
+# Chỉ trả các mục chồng lên cửa sổ (app.utils.active_in_window), thanh dài hơn cửa sổ được cắt gọn
+# vào cửa sổ, còn các mục nằm hẳn ngoài cửa sổ được gộp thành một thanh tóm tắt trước / sau cửa sổ
+# cho mỗi lane (số mục + khoảng ngày) để client biết còn dữ liệu khi cuộn tới.
+
+from collections import defaultdict, namedtuple
+from sqlalchemy import and_, func, or_
+
+from app import db
+
+HiddenSpan = namedtuple('HiddenSpan', 'count start_date end_date')
+
+
+def clip_span(start_date, end_date, window_start=None, window_end=None):
+    """Cắt [start, end] vào cửa sổ: (start, end, clipped)."""
+    clipped = False
+    if window_start and start_date < window_start:
+        start_date, clipped = window_start, True
+    if window_end and end_date > window_end:
+        end_date, clipped = window_end, True
+    return start_date, end_date, clipped
+
+
+def hidden_spans(lane_col, start_col, end_col=None, window_start=None, window_end=None, criteria=(), joins=()):
+    """
+    {lane_id: {'before' | 'after': HiddenSpan}} của các mục nằm hẳn ngoài cửa sổ, mỗi phía một
+    truy vấn GROUP BY lane. end_col = None cho mục một ngày (task). Điều kiện viết dạng so sánh
+    trực tiếp trên cột để dùng được index (start_date, end_date).
+    """
+    spans = defaultdict(dict)
+    end_expr = start_col if end_col is None else func.coalesce(end_col, start_col)
+    sides = []
+    if window_start:
+        before = start_col < window_start if end_col is None else \
+            or_(end_col < window_start, and_(end_col.is_(None), start_col < window_start))
+        sides.append(('before', before))
+    if window_end:
+        sides.append(('after', start_col > window_end))
+
+    for side, condition in sides:
+        query = db.session.query(lane_col, func.count(), func.min(start_col), func.max(end_expr))
+        for target, onclause in joins:
+            query = query.join(target, onclause)
+        query = query.filter(start_col.isnot(None), condition, *criteria).group_by(lane_col)
+        for lane_id, count, first, last in query:
+            spans[lane_id][side] = HiddenSpan(count, first, last)
+    return spans
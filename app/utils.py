@@ -4,6 +4,7 @@ import os
 import sys
 from datetime import datetime, timedelta, date, timezone
 from calendar import monthrange
+from sqlalchemy import and_, or_, true
 
 VN_TZ = timezone(timedelta(hours=7))
 
@@ -78,4 +79,29 @@ def get_time_range_from_filter(time_filter):
     else:
         start_date = today - timedelta(days=today.weekday())
         end_date = start_date + timedelta(days=6)
-    return start_date, end_date
\ No newline at end of file
+    return start_date, end_date
+
+def active_in_window(model, window_start=None, window_end=None):
+    """
+    Điều kiện "đang hoạt động trong cửa sổ" cho model có start_date / end_date
+    (Project, Build, Objective, KeyResult): start <= window_end AND (end >= window_start OR (end IS NULL
+    AND start >= window_start)). Viết tách thay cho coalesce(end, start) để dùng được index theo cửa sổ.
+    Bắt được cả đối tượng bắt đầu trước cửa sổ nhưng vẫn đang chạy. Bỏ trống một đầu = không giới hạn.
+    """
+    criteria = []
+    if window_end:
+        criteria.append(model.start_date <= window_end)
+    if window_start:
+        criteria.append(or_(model.end_date >= window_start,
+                            and_(model.end_date.is_(None), model.start_date >= window_start)))
+    return and_(true(), *criteria)
+
+
+def parse_window(args):
+    """(from, to) dạng date từ query string ?from=YYYY-MM-DD&to=YYYY-MM-DD; thiếu/sai -> None."""
+    def parse(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except ValueError:
+            return None
+    return parse(args.get('from')), parse(args.get('to'))
@@ -29,5 +29,8 @@ class Config:
     # Sửa lại đường dẫn UPLOAD_FOLDER để dùng basedir mới
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
     
+    # Số ngày giữ Log trong bảng chính; cũ hơn được chuyển sang log_archive (0 = không tự chuyển)
+    LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS') or 180)
+
     # Giới hạn dung lượng file upload
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024 * 1024  # 2GB
\ No newline at end of file
@@ -90,6 +90,7 @@ class AppLauncher(tk.Tk):
         self.server_thread = None
         self.server_obj = None
         self._server_running = False
+        self._snapshot_thread = None  # thread chụp tiến độ + chuyển log cũ hằng ngày (chỉ khởi động một lần)
         self._dark_mode = False
         self._always_on_top = False
 
@@ -496,6 +497,12 @@ class AppLauncher(tk.Tk):
             self._log(f"  LAN:    {self.url_lan_var.get()}")
             self._log(f"  Host:   {self.url_host_var.get()}")
 
+            if self._snapshot_thread is None:
+                from app.snapshots import start_snapshot_scheduler
+                from app.log_retention import start_log_retention_scheduler
+                self._snapshot_thread = start_snapshot_scheduler(app)
+                start_log_retention_scheduler(app)
+
             try:
                 if HAVE_CREATE_SERVER:
                     self.server_obj = create_server(app, host=APP_HOST, port=APP_PORT, threads=8)
@@ -535,6 +542,7 @@ class AppLauncher(tk.Tk):
                 # chờ thread kết thúc nhẹ nhàng
                 if self.server_thread is not None:
                     self.server_thread.join(timeout=3)
+                self._flush_audit_log()
                 self.progress.stop()
         else:
             messagebox.showinfo("Không hỗ trợ", "Waitress bản này không hỗ trợ dừng mềm.\n"
@@ -557,9 +565,20 @@ class AppLauncher(tk.Tk):
             if not messagebox.askyesno("Thoát", "Server đang chạy. Dừng server rồi thoát?"):
                 return
             self.stop_server()
+        # os._exit bỏ qua atexit: ghi nốt nhật ký còn trong hàng đợi trước khi thoát
+        self._flush_audit_log()
         self.destroy()
         os._exit(0)
 
+    def _flush_audit_log(self):
+        if not FLASK_APP_IMPORTED:
+            return
+        try:
+            from app.audit import flush_audit_log
+            flush_audit_log()
+        except Exception as e:
+            self._log(f"Ghi nhật ký còn lại thất bại: {e}", level="WARN")
+
     # ---------- User Manager ----------
     def open_user_manager(self):
         """★ Mở (hoặc focus) cửa sổ Quản lý User."""
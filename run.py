@@ -1,3 +1,4 @@
+import os
 from app import create_app
 
 app = create_app()
@@ -6,5 +7,12 @@ app = create_app()
 from app import routes
 
 if __name__ == '__main__':
+    # Chụp tiến độ hằng ngày — chỉ trong process chạy app, không chạy trong process reloader
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app.snapshots import start_snapshot_scheduler
+        start_snapshot_scheduler(app)
+        # Chuyển log cũ sang log_archive hằng ngày
+        from app.log_retention import start_log_retention_scheduler
+        start_log_retention_scheduler(app)
     # Tạm thời dùng app.run() để debug dễ hơn
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
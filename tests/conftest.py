@@ -0,0 +1,87 @@
+# tests/conftest.py
+# Mỗi test chạy trên một file SQLite tạm. Các cache trong process (reference data, gantt,
+# roadmap, dashboard OKR, lịch CPM) sống theo module nên được xóa giữa các test.
+
+import shutil
+from datetime import date, timedelta
+
+import pytest
+
+from app import audit, create_app, db
+from app.models import Build, KeyResult, Objective, Project, Task, User
+from config import Config
+
+
+def _reset_process_caches():
+    from app import critical_path, gantt_cache, okr_data, reference_data, roadmap_data
+    reference_data.invalidate_reference_data()
+    okr_data.invalidate_okr_dashboard()
+    critical_path.invalidate_schedule()
+    roadmap_data.invalidate_roadmap()
+    with gantt_cache._lock:
+        gantt_cache._payloads.clear()
+
+
+def make_app(tmp_path, db_file=None):
+    db_path = tmp_path / 'test.db'
+    if db_file:
+        shutil.copy(db_file, db_path)
+
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+
+    _reset_process_caches()
+    return create_app(TestConfig)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Lô log ghi gần như ngay: flush_audit_log() cuối mỗi test không phải chờ cả giây
+    monkeypatch.setattr(audit, 'AUDIT_FLUSH_INTERVAL', 0.01)
+    app = make_app(tmp_path)
+    with app.app_context():
+        yield app
+        audit.flush_audit_log()
+        db.session.remove()
+
+
+@pytest.fixture
+def seed(app):
+    """Hai user, một Project > Build > Objective > KR với 10 task gắn KR và 5 task tự do."""
+    alice = User(username='alice', email='alice@example.com', password_hash='x')
+    bob = User(username='bob', email='bob@example.com', password_hash='x')
+    db.session.add_all([alice, bob])
+    db.session.flush()
+    project = Project(name='P1', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31))
+    db.session.add(project)
+    db.session.flush()
+    build = Build(name='P1 build', project_id=project.id, start_date=date(2025, 2, 1), end_date=date(2025, 6, 30))
+    db.session.add(build)
+    db.session.flush()
+    objective = Objective(content='Obj', start_date=date(2025, 3, 1), end_date=date(2025, 5, 1),
+                          project_id=project.id, build_id=build.id)
+    db.session.add(objective)
+    db.session.flush()
+    kr = KeyResult(content='KR', objective_id=objective.id, current=0, target=0,
+                   start_date=date(2025, 3, 1), end_date=date(2025, 4, 1))
+    db.session.add(kr)
+    db.session.flush()
+    for i in range(15):
+        db.session.add(Task(what=f't{i}', task_date=date(2025, 3, 3) + timedelta(days=i % 5), hour=9 + i % 3,
+                            who_id=alice.id if i % 2 else bob.id, status=['Pending', 'Done', 'Review'][i % 3],
+                            key_result_id=kr.id if i < 10 else None))
+    db.session.commit()
+    return {'user_id': alice.id, 'project_id': project.id, 'build_id': build.id,
+            'objective_id': objective.id, 'kr_id': kr.id}
+
+
+@pytest.fixture
+def client(app, seed):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(seed['user_id'])
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,110 @@
+# tests/test_audit.py
+import io
+import json
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import audit, db
+from app.audit import flush_audit_log, record_log
+from app.models import Log, Task, UploadedFile
+
+
+def test_logs_are_written_only_after_commit(app, seed):
+    record_log('Rolled back', None, user_id=seed['user_id'])
+    db.session.rollback()
+    record_log(f"Updated project ID {seed['project_id']}", None, user_id=seed['user_id'])
+    db.session.commit()
+    flush_audit_log()
+    actions = [log.action for log in Log.query]
+    assert 'Rolled back' not in actions
+    assert f"Updated project ID {seed['project_id']}" in actions
+
+
+def test_batch_is_written_within_flush_interval_under_steady_load(app, seed, monkeypatch):
+    monkeypatch.setattr(audit, 'AUDIT_FLUSH_INTERVAL', 0.2)
+    flush_audit_log()
+    batches = []
+    monkeypatch.setattr(audit, '_write_batch', lambda entries: batches.append((time.monotonic(), len(entries))))
+    audit._ensure_writer()
+    # Writer có thể đang chờ get() với hạn cũ: một dòng mồi để nó nhận cấu hình mới
+    audit.enqueue_logs([(db.engine, {'action': 'warmup'})])
+    flush_audit_log()
+    batches.clear()
+
+    stop = threading.Event()
+    engine = db.engine
+
+    def produce():
+        while not stop.is_set():
+            audit.enqueue_logs([(engine, {'action': 'tick'})])
+            time.sleep(0.05)
+
+    started = time.monotonic()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    time.sleep(0.7)
+    stop.set()
+    producer.join()
+    flush_audit_log()
+    # Log đến đều mỗi 50ms (< interval) vẫn được ghi thành nhiều lô, lô đầu trong khoảng interval
+    assert len(batches) >= 3
+    assert batches[0][0] - started < 0.5
+
+
+def test_save_task_commits_once_with_log_and_attachments(client, seed):
+    commits = []
+    listener = lambda session: commits.append(session)
+    event.listen(Session, 'after_commit', listener)
+    try:
+        response = client.post('/save-task', data={
+            'taskWhat': 'Weekly sync', 'taskDate': '2025-03-03', 'taskRecurrence': 'weekly',
+            'taskRecurrenceEndDate': '2025-03-31', 'materialize': '1',
+            'attachments[]': (io.BytesIO(b'notes'), 'notes.txt'),
+        }, content_type='multipart/form-data')
+    finally:
+        event.remove(Session, 'after_commit', listener)
+    assert response.get_json()['success']
+    assert len(commits) == 1
+    parent = Task.query.filter_by(what='Weekly sync', recurrence_parent_id=None).one()
+    assert UploadedFile.query.filter_by(task_id=parent.id).count() == 1
+    assert Task.query.filter_by(recurrence_parent_id=parent.id).count() == 4
+    flush_audit_log()
+    log = Log.query.filter(Log.action.like('Created new task%')).one()
+    assert (log.entity_type, log.entity_id) == ('task', parent.id)
+
+
+class _FlakyEngine:
+    """Engine giả: begin() báo 'database is locked' `failures` lần rồi mới dùng engine thật."""
+
+    def __init__(self, engine, failures):
+        self.engine, self.failures, self.attempts = engine, failures, 0
+
+    def begin(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise OperationalError('INSERT INTO log', {}, Exception('database is locked'))
+        return self.engine.begin()
+
+
+def test_locked_database_is_retried(app, seed, monkeypatch):
+    monkeypatch.setattr(audit, 'AUDIT_RETRY_BACKOFF', 0)
+    engine = _FlakyEngine(db.engine, failures=2)
+    audit._write_batch([(engine, {'action': 'after lock', 'timestamp': datetime.utcnow()})])
+    assert engine.attempts == 3
+    assert Log.query.filter_by(action='after lock').count() == 1
+
+
+def test_dropped_rows_are_tagged(app, seed, monkeypatch, caplog):
+    monkeypatch.setattr(audit, 'AUDIT_RETRY_BACKOFF', 0)
+    engine = _FlakyEngine(db.engine, failures=audit.AUDIT_WRITE_ATTEMPTS)
+    audit._write_batch([(engine, {'action': 'lost', 'entity_type': 'task', 'entity_id': 7})])
+    assert engine.attempts == audit.AUDIT_WRITE_ATTEMPTS
+    assert Log.query.filter_by(action='lost').count() == 0
+    dropped = [r.getMessage() for r in caplog.records if r.getMessage().startswith('AUDIT_DROPPED')]
+    assert len(dropped) == 1
+    assert json.loads(dropped[0].split(' ', 1)[1])['entity_id'] == 7
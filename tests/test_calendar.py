@@ -0,0 +1,58 @@
+# tests/test_calendar.py
+from datetime import date
+
+from app import db
+from app.calendar_data import MONTH_CELL_LIMIT
+from app.models import Task, User
+
+MONTH_URL = '/api/calendar/month/2025-03-01'
+
+
+def test_month_summary_marks_truncated_lists(client, seed):
+    for i in range(MONTH_CELL_LIMIT + 5):
+        db.session.add(Task(what=f'busy {i}', task_date=date(2025, 3, 20), who_id=seed['user_id'], status='Pending'))
+    db.session.commit()
+
+    body = client.get(MONTH_URL).get_json()
+    assert len(body['tasks_by_date']['2025-03-20']) == MONTH_CELL_LIMIT
+    assert body['day_task_counts']['2025-03-20'] == MONTH_CELL_LIMIT + 5
+    for row in body['summary_data']:
+        assert row['task_count'] == len(row['tasks']) + row['more']
+    alice = next(row for row in body['summary_data'] if row['user']['id'] == seed['user_id'])
+    assert alice['more'] == 5
+
+    week = client.get('/api/calendar/week/2025-03-03').get_json()
+    assert all(row['more'] == 0 for row in week['summary_data'])
+
+
+def test_month_etag_follows_writes_in_range_only(client, seed):
+    first = client.get(MONTH_URL)
+    etag = first.headers['ETag']
+    assert client.get(MONTH_URL, headers={'If-None-Match': etag}).status_code == 304
+
+    # Sửa task ngoài khoảng lưới -> vẫn 304
+    db.session.add(Task(what='far away', task_date=date(2025, 9, 1), status='Pending'))
+    db.session.commit()
+    assert client.get(MONTH_URL, headers={'If-None-Match': etag}).status_code == 304
+
+    task = Task.query.filter_by(task_date=date(2025, 3, 3)).first()
+    task.what = 'renamed'
+    db.session.commit()
+    changed = client.get(MONTH_URL, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_month_etag_changes_after_user_rename(client, seed):
+    etag = client.get(MONTH_URL).headers['ETag']
+    db.session.get(User, seed['user_id']).username = 'alice2'
+    db.session.commit()
+    changed = client.get(MONTH_URL, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert any(t['who'] == 'alice2' for tasks in changed.get_json()['tasks_by_date'].values() for t in tasks)
+
+
+def test_month_page_renders_more_label(client, seed):
+    for i in range(MONTH_CELL_LIMIT + 1):
+        db.session.add(Task(what=f'busy {i}', task_date=date(2025, 3, 20), who_id=seed['user_id'], status='Pending'))
+    db.session.commit()
+    assert b'+1 more' in client.get('/calendar/month/2025-03-01').data
@@ -0,0 +1,64 @@
+# tests/test_critical_path.py
+from datetime import date
+
+from app import db
+from app.critical_path import schedule_version
+from app.models import DependencyLink, Task
+
+
+def _task(name):
+    return Task.query.filter_by(what=name).one()
+
+
+def _link(client, source, target, **extra):
+    return client.post('/api/dependencies', json={'source': source, 'target': target, **extra})
+
+
+def test_schedule_pushes_successor_and_marks_conflict(client, seed):
+    # t0 (03/03) -> t5 (03/03): t5 sớm nhất bắt đầu 03/04, lệch lịch
+    first, second = _task('t0'), _task('t5')
+    assert _link(client, f'task-{first.id}', f'task-{second.id}').get_json()['success']
+    schedule = client.get('/api/dependencies').get_json()['schedule']
+    assert schedule[f'task-{second.id}']['earliest_start'] == '2025-03-04'
+    assert schedule[f'task-{second.id}']['conflict'] is True
+    assert schedule[f'task-{first.id}']['critical'] is True
+
+
+def test_cycle_and_duplicate_links_are_rejected(client, seed):
+    a, b, c = _task('t0'), _task('t1'), _task('t2')
+    assert _link(client, f'task-{a.id}', f'task-{b.id}').status_code == 200
+    assert _link(client, f'task-{b.id}', f'task-{c.id}').status_code == 200
+    cycle = _link(client, f'task-{c.id}', f'task-{a.id}')
+    assert cycle.status_code == 400 and 'cycle' in cycle.get_json()['message']
+    assert _link(client, f'task-{a.id}', f'task-{a.id}').status_code == 400
+    assert _link(client, f'task-{a.id}', f'task-{b.id}').status_code == 409
+    assert _link(client, 'task-x', f'task-{a.id}').status_code == 400
+    assert _link(client, 'task-99999', f'task-{a.id}').status_code == 404
+    assert DependencyLink.query.count() == 2
+
+
+def test_moving_linked_task_bumps_schedule_version(client, seed):
+    first, second = _task('t0'), _task('t1')
+    _link(client, f'task-{first.id}', f'task-{second.id}')
+    client.get('/api/dependencies')
+    version = schedule_version()
+
+    # Task không có liên kết đổi ngày: lịch giữ nguyên
+    _task('t3').task_date = date(2025, 3, 20)
+    db.session.commit()
+    assert schedule_version() == version
+
+    first.task_date = date(2025, 3, 10)
+    db.session.commit()
+    assert schedule_version() > version
+    schedule = client.get('/api/dependencies').get_json()['schedule']
+    assert schedule[f'task-{second.id}']['earliest_start'] == '2025-03-11'
+
+
+def test_deleting_a_node_drops_its_links(client, seed):
+    first, second = _task('t0'), _task('t1')
+    _link(client, f'task-{first.id}', f'task-{second.id}')
+    db.session.delete(first)
+    db.session.commit()
+    assert DependencyLink.query.count() == 0
+    assert client.get('/api/dependencies').get_json()['schedule'] == {}
@@ -0,0 +1,98 @@
+# tests/test_gantt.py
+from datetime import date
+
+from app import db
+from app.models import KeyResult, Objective, Project, Task, User
+
+
+def _etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def _second_project():
+    project = Project(name='P2', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31))
+    db.session.add(project)
+    db.session.flush()
+    objective = Objective(content='P2 obj', start_date=date(2025, 3, 1), end_date=date(2025, 4, 1), project_id=project.id)
+    db.session.add(objective)
+    db.session.flush()
+    kr = KeyResult(content='P2 KR', objective_id=objective.id, start_date=date(2025, 3, 1), end_date=date(2025, 4, 1))
+    db.session.add(kr)
+    db.session.flush()
+    task = Task(what='P2 task', task_date=date(2025, 3, 5), status='Pending', key_result_id=kr.id)
+    db.session.add(task)
+    db.session.commit()
+    return project, task
+
+
+def test_gantt_etag_changes_after_write_in_project(client, seed):
+    url = f"/api/dhtmlx-data?project_id={seed['project_id']}"
+    etag = _etag(client, url)
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    task = Task.query.filter_by(key_result_id=seed['kr_id']).first()
+    task.task_date = date(2025, 3, 20)
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    row = next(r for r in response.get_json()['data'] if r['id'] == f'task-{task.id}')
+    assert row['start_date'] == '2025-03-20'
+
+
+def test_gantt_etag_survives_writes_to_other_projects(client, seed):
+    _, other_task = _second_project()
+    url = f"/api/dhtmlx-data?project_id={seed['project_id']}"
+    lazy_url = url + '&lazy=1'
+    etag, lazy_etag = _etag(client, url), _etag(client, lazy_url)
+    assert etag != lazy_etag
+
+    other_task.what = 'P2 task renamed'
+    db.session.commit()
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(lazy_url, headers={'If-None-Match': lazy_etag}).status_code == 304
+
+
+def test_gantt_etag_changes_after_dependency_or_user_rename(client, seed):
+    url = f"/api/dhtmlx-data?project_id={seed['project_id']}"
+    etag = _etag(client, url)
+    task_ids = [t.id for t in Task.query.filter_by(key_result_id=seed['kr_id']).order_by(Task.id).limit(2)]
+    assert client.post('/api/dependencies', json={'source': f'task-{task_ids[0]}',
+                                                  'target': f'task-{task_ids[1]}'}).get_json()['success']
+    after_link = _etag(client, url)
+    assert after_link != etag
+
+    # Tên người phụ trách nằm trong payload
+    db.session.get(User, seed['user_id']).username = 'alice2'
+    db.session.commit()
+    assert _etag(client, url) != after_link
+
+
+def test_unknown_project_is_404(client, seed):
+    assert client.get('/api/dhtmlx-data?project_id=9999').status_code == 404
+
+
+def test_lazy_load_walks_the_tree_level_by_level(client, seed):
+    top = client.get(f"/api/dhtmlx-data?project_id={seed['project_id']}&lazy=1").get_json()['data']
+    assert [r['id'] for r in top] == [f"proj-{seed['project_id']}", f"build-{seed['build_id']}"]
+    build = top[1]
+    assert build['$has_child'] and build['child_count'] == 1 and build['open'] is False
+
+    objectives = client.get(f"/api/dhtmlx-data?parent=build-{seed['build_id']}").get_json()['data']
+    assert [r['id'] for r in objectives] == [f"obj-{seed['objective_id']}"]
+    key_results = client.get(f"/api/dhtmlx-data?parent=obj-{seed['objective_id']}").get_json()['data']
+    assert [r['id'] for r in key_results] == [f"kr-{seed['kr_id']}"]
+    assert key_results[0]['child_count'] == Task.query.filter_by(key_result_id=seed['kr_id']).count()
+    tasks = client.get(f"/api/dhtmlx-data?parent_id=kr-{seed['kr_id']}").get_json()['data']
+    assert len(tasks) == key_results[0]['child_count']
+    assert all(r['parent'] == f"kr-{seed['kr_id']}" for r in tasks)
+
+    # Cả cây một lần cho cùng các row
+    full = client.get(f"/api/dhtmlx-data?project_id={seed['project_id']}").get_json()['data']
+    assert {r['id'] for r in full} == {r['id'] for r in top + objectives + key_results + tasks}
+
+
+def test_branch_rejects_bad_parent(client, seed):
+    assert client.get('/api/dhtmlx-data?parent=task-1').status_code == 400
+    assert client.get('/api/dhtmlx-data?parent=build-x').status_code == 400
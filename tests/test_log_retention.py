@@ -0,0 +1,45 @@
+# tests/test_log_retention.py
+from datetime import datetime, timedelta
+
+from app import db
+from app.log_retention import archive_old_logs, query_archived_logs
+from app.models import Log, LogArchive
+
+
+def _add_logs(seed, ages):
+    now = datetime.utcnow()
+    for i, days in enumerate(ages):
+        db.session.add(Log(action=f'Updated project ID {seed["project_id"]} #{i}', user_id=seed['user_id'],
+                           timestamp=now - timedelta(days=days), entity_type='project',
+                           entity_id=seed['project_id'], project_id=seed['project_id']))
+    db.session.commit()
+
+
+def test_archive_moves_only_rows_past_retention(app, seed):
+    _add_logs(seed, [1, 10, 100, 200, 300])
+    before = Log.query.count()
+    assert archive_old_logs(90, batch_size=2) == 3
+    assert Log.query.count() == before - 3
+    assert LogArchive.query.count() == 3
+    assert Log.query.filter(Log.timestamp < datetime.utcnow() - timedelta(days=90)).count() == 0
+    archived = LogArchive.query.first()
+    assert (archived.entity_type, archived.project_id) == ('project', seed['project_id'])
+    # Chạy lại không còn gì để chuyển
+    assert archive_old_logs(90) == 0
+
+
+def test_archived_logs_are_paged_newest_first(app, seed):
+    _add_logs(seed, [100, 200, 300])
+    archive_old_logs(90)
+    rows, has_more = query_archived_logs(project_id=seed['project_id'], per_page=2)
+    assert has_more and [r.timestamp for r in rows] == sorted((r.timestamp for r in rows), reverse=True)
+    rows, has_more = query_archived_logs(project_id=seed['project_id'], page=2, per_page=2)
+    assert len(rows) == 1 and not has_more
+
+
+def test_archive_api(client, seed):
+    _add_logs(seed, [100])
+    archive_old_logs(90)
+    body = client.get('/api/logs/archive', query_string={'project_id': seed['project_id']}).get_json()
+    assert body['success'] and len(body['logs']) == 1 and body['logs'][0]['username'] == 'alice'
+    assert client.get('/api/logs/archive?from=bad').status_code == 400
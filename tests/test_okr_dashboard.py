@@ -0,0 +1,79 @@
+# tests/test_okr_dashboard.py
+from datetime import date
+
+from app import db
+from app.okr_data import cached_okr_dashboard_stats, okr_dashboard_stats
+from app.models import Objective, Project, Task
+
+MARCH = (date(2025, 3, 1), date(2025, 3, 31))
+NOVEMBER = (date(2025, 11, 1), date(2025, 11, 30))
+
+
+def test_stats_group_by_project(app, seed):
+    total, by_project = okr_dashboard_stats(date(2025, 3, 1), date(2025, 3, 31))
+    assert total == {'o': 1, 'kr': 1, 'task': 10}
+    assert by_project[seed['project_id']]['name'] == 'P1'
+    # Objective bắt đầu trước khoảng nhưng vẫn đang chạy vẫn được đếm
+    assert okr_dashboard_stats(date(2025, 4, 10), date(2025, 4, 20))[0]['o'] == 1
+    assert okr_dashboard_stats(date(2025, 11, 1), date(2025, 11, 30))[0]['o'] == 0
+
+
+def test_task_write_invalidates_only_overlapping_periods(client, seed):
+    march, november = cached_okr_dashboard_stats(*MARCH), cached_okr_dashboard_stats(*NOVEMBER)
+    assert cached_okr_dashboard_stats(*MARCH) is march
+
+    task = Task.query.filter_by(key_result_id=seed['kr_id'], status='Pending').first()
+    assert client.post(f'/update-task-status/{task.id}', json={'checked': True}).get_json()['success']
+
+    assert cached_okr_dashboard_stats(*MARCH) is not march
+    assert cached_okr_dashboard_stats(*NOVEMBER) is november
+
+
+def test_new_objective_shows_up_in_cached_stats(client, seed):
+    before = cached_okr_dashboard_stats(*MARCH)[0]['o']
+    response = client.post('/add-objective', data={
+        'content': 'New O', 'start_date_obj': '2025-03-10', 'end_date_obj': '2025-03-20',
+        'project_id': seed['project_id']})
+    assert response.status_code in (200, 302)
+    assert cached_okr_dashboard_stats(*MARCH)[0]['o'] == before + 1
+
+
+def test_deleting_a_kr_task_refreshes_cached_stats(client, seed):
+    cached_okr_dashboard_stats(*MARCH)
+    task = Task.query.filter_by(key_result_id=seed['kr_id']).first()
+    assert client.post(f'/delete-task/{task.id}').get_json()['success']
+    assert cached_okr_dashboard_stats(*MARCH) == okr_dashboard_stats(*MARCH)
+    assert cached_okr_dashboard_stats(*MARCH)[0]['task'] == 9
+    kr_target = db.session.get(Objective, seed['objective_id']).key_results[0].target
+    assert kr_target == 9
+
+
+def test_materialized_series_refreshes_cached_stats(client, seed):
+    cached_okr_dashboard_stats(*MARCH)
+    response = client.post('/save-task', data={
+        'taskWhat': 'Weekly', 'taskDate': '2025-03-03', 'taskRecurrence': 'weekly',
+        'taskRecurrenceEndDate': '2025-03-17', 'taskKeyResult': str(seed['kr_id']), 'materialize': '1'})
+    assert response.get_json()['success']
+    assert cached_okr_dashboard_stats(*MARCH) == okr_dashboard_stats(*MARCH)
+    assert cached_okr_dashboard_stats(*MARCH)[0]['task'] == 13
+
+
+def test_moved_objective_leaves_old_period(app, seed):
+    march, november = cached_okr_dashboard_stats(*MARCH), cached_okr_dashboard_stats(*NOVEMBER)
+    objective = db.session.get(Objective, seed['objective_id'])
+    objective.start_date, objective.end_date = date(2025, 11, 3), date(2025, 11, 20)
+    db.session.commit()
+    assert cached_okr_dashboard_stats(*MARCH)[0]['o'] == 0
+    assert cached_okr_dashboard_stats(*NOVEMBER)[0]['o'] == 1
+
+
+def test_unrelated_write_and_rollback_keep_cached_stats(app, seed):
+    march = cached_okr_dashboard_stats(*MARCH)
+    db.session.get(Task, Task.query.filter_by(key_result_id=seed['kr_id']).first().id).note = 'ghi chú'
+    db.session.commit()
+    db.session.get(Project, seed['project_id']).name = 'Renamed'
+    db.session.rollback()
+    assert cached_okr_dashboard_stats(*MARCH) is march
+    db.session.get(Project, seed['project_id']).name = 'Renamed'
+    db.session.commit()
+    assert cached_okr_dashboard_stats(*MARCH)[1][seed['project_id']]['name'] == 'Renamed'
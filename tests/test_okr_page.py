@@ -0,0 +1,31 @@
+# tests/test_okr_page.py
+from datetime import date
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Objective
+from app.okr_data import load_okr_objectives
+
+
+def test_objectives_load_without_cartesian_rows(app, seed):
+    db.session.add(Objective(content='Unassigned', start_date=date(2025, 3, 1), end_date=date(2025, 3, 31)))
+    db.session.commit()
+    db.session.expire_all()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        objectives = load_okr_objectives(date(2025, 3, 3), date(2025, 3, 9), seed['project_id'])
+        tasks = [task for objective in objectives for kr in objective.key_results for task in kr.tasks]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    # Objective (+ project), KR, task: mỗi cấp một truy vấn, không lặp theo từng KR
+    assert len(statements) == 3
+    assert [o.content for o in objectives] == ['Obj']
+    assert len(tasks) == 10
+
+    assert [o.content for o in load_okr_objectives(date(2025, 3, 3), date(2025, 3, 9), 0)] == ['Unassigned']
+    assert load_okr_objectives(date(2025, 6, 2), date(2025, 6, 8)) == []
+
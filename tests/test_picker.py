@@ -0,0 +1,34 @@
+# tests/test_picker.py
+from app import db
+from app.models import Build
+
+
+def _add_builds(project_id, names):
+    db.session.add_all([Build(name=name, project_id=project_id) for name in names])
+    db.session.commit()
+
+
+def test_cursor_pages_cover_every_build_once(client, seed):
+    _add_builds(seed['project_id'], [f'Sprint {i:02d}' for i in range(12)])
+    url = f"/api/builds/{seed['project_id']}"
+    names, cursor = [], None
+    while True:
+        params = {'limit': 5, **({'cursor': cursor} if cursor else {})}
+        body = client.get(url, query_string=params).get_json()
+        names += [item['name'] for item in body['items']]
+        if not body['has_more']:
+            assert body['next_cursor'] is None
+            break
+        cursor = body['next_cursor']
+    assert names == sorted(names) and len(names) == len(set(names)) == 13
+
+
+def test_prefix_search_and_selected(client, seed):
+    _add_builds(seed['project_id'], ['Alpha', 'alpine', 'Beta', '50%_off'])
+    url = f"/api/builds/{seed['project_id']}"
+    assert [i['name'] for i in client.get(url, query_string={'q': 'alp'}).get_json()['items']] == ['Alpha', 'alpine']
+    # Ký tự đại diện của LIKE được hiểu theo nghĩa đen
+    assert [i['name'] for i in client.get(url, query_string={'q': '50%'}).get_json()['items']] == ['50%_off']
+    beta = Build.query.filter_by(name='Beta').one()
+    first = client.get(url, query_string={'q': 'alp', 'selected': beta.id}).get_json()['items']
+    assert first[0]['id'] == beta.id
@@ -0,0 +1,64 @@
+# tests/test_portfolio_gantt.py
+from datetime import date
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+
+
+def _add_project(index):
+    project = Project(name=f'Extra {index}', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31))
+    db.session.add(project)
+    db.session.flush()
+    build = Build(name=f'Extra build {index}', project_id=project.id,
+                  start_date=date(2025, 2, 1), end_date=date(2025, 6, 30))
+    db.session.add(build)
+    db.session.flush()
+    objective = Objective(content=f'Extra obj {index}', start_date=date(2025, 3, 1), project_id=project.id,
+                          build_id=build.id)
+    db.session.add(objective)
+    db.session.flush()
+    kr = KeyResult(content=f'Extra KR {index}', objective_id=objective.id)
+    db.session.add(kr)
+    db.session.flush()
+    db.session.add(Task(what=f'extra {index}', task_date=date(2025, 3, 5), status='Done', key_result_id=kr.id))
+
+
+def _count_queries(client, url):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        rows = client.get(url).get_json()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return rows, len(statements)
+
+
+def test_query_count_does_not_grow_with_projects(client, seed):
+    client.get('/api/gantt-data')  # nạp user đăng nhập vào session trước khi đếm
+    _, baseline = _count_queries(client, '/api/gantt-data')
+    for index in range(3):
+        _add_project(index)
+    db.session.commit()
+    rows, queries = _count_queries(client, '/api/gantt-data')
+    assert queries == baseline
+    assert [row['id'] for row in rows if row['id'].startswith('proj-')] == \
+        [f'proj-{p.id}' for p in Project.query.order_by(Project.id)]
+    extra = next(row for row in rows if row['name'] == 'extra 0')
+    assert extra['progress'] == 100 and extra['dependencies'].startswith('build-')
+
+
+def test_detailed_view_includes_occurrences_and_overview_skips_tasks(client, seed):
+    db.session.add(Task(what='Weekly', task_date=date(2025, 3, 3), status='Pending', recurrence='weekly',
+                        recurrence_end_date=date(2025, 3, 17), key_result_id=seed['kr_id']))
+    db.session.commit()
+    rows = client.get('/api/gantt-data', query_string={'project_id': seed['project_id']}).get_json()
+    weekly = [row['start'] for row in rows if row['name'] == 'Weekly']
+    assert weekly == ['2025-03-03', '2025-03-10', '2025-03-17']
+    assert sum(row['id'].startswith('task-') for row in rows) == 13
+
+    overview = client.get('/api/gantt-data', query_string={'project_id': seed['project_id'],
+                                                           'view': 'overview'}).get_json()
+    assert [row['id'] for row in overview] == [f"proj-{seed['project_id']}", f"build-{seed['build_id']}"]
@@ -0,0 +1,51 @@
+# tests/test_progress.py
+from datetime import date
+
+from sqlalchemy import update
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+from app.progress import count_kr_tasks
+from app.routes import recompute_progress_command
+
+
+def _progress(seed):
+    db.session.expire_all()
+    return (db.session.get(Objective, seed['objective_id']).progress,
+            db.session.get(Build, seed['build_id']).progress,
+            db.session.get(Project, seed['project_id']).progress)
+
+
+def test_count_kr_tasks_in_sql(app, seed):
+    # Seed: 10 task gắn KR, 3 task Done
+    assert count_kr_tasks(seed['kr_id']) == (3, 10)
+
+
+def test_task_status_rolls_progress_up(client, seed):
+    task = Task.query.filter_by(key_result_id=seed['kr_id'], status='Pending').first()
+    body = client.post(f'/update-task-status/{task.id}', json={'checked': True}).get_json()
+    assert (body['kr_current'], body['kr_target']) == (4, 10)
+    assert _progress(seed) == (40, 40, 40)
+
+
+def test_rollup_averages_siblings(app, seed):
+    objective = Objective(content='Second', start_date=date(2025, 3, 1), project_id=seed['project_id'],
+                          build_id=seed['build_id'])
+    db.session.add(objective)
+    db.session.flush()
+    db.session.add(KeyResult(content='Done KR', objective_id=objective.id, current=2, target=2))
+    db.session.get(KeyResult, seed['kr_id']).current, db.session.get(KeyResult, seed['kr_id']).target = 0, 10
+    db.session.commit()
+    assert _progress(seed) == (0, 50, 50)
+
+
+def test_recompute_command_fixes_drifted_rows(app, seed):
+    db.session.execute(update(KeyResult.__table__).values(current=9, target=9))
+    db.session.execute(update(Objective.__table__).values(progress=99))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(recompute_progress_command)
+    assert result.exit_code == 0, result.output
+    kr = db.session.get(KeyResult, seed['kr_id'])
+    db.session.refresh(kr)
+    assert (kr.current, kr.target) == (3, 10)
+    assert _progress(seed) == (30, 30, 30)
@@ -0,0 +1,61 @@
+# tests/test_project_activity.py
+from flask import template_rendered
+
+from app import db
+from app.audit import backfill_log_entities, flush_audit_log, parse_action_entity, record_log
+from app.models import Build, KeyResult, Log, Objective, Project, Task
+
+
+def test_record_log_resolves_project_at_every_level(app, seed):
+    other = Project(name='P2')
+    db.session.add(other)
+    db.session.commit()
+    task = Task.query.filter_by(key_result_id=seed['kr_id']).first()
+    entities = [db.session.get(Project, seed['project_id']), db.session.get(Build, seed['build_id']),
+                db.session.get(Objective, seed['objective_id']), db.session.get(KeyResult, seed['kr_id']), task]
+    for entity in entities:
+        record_log(f'touch {type(entity).__name__}', entity, user_id=seed['user_id'])
+    record_log('touch other', other, user_id=seed['user_id'])
+    # Task không gắn KR không thuộc project nào
+    record_log('touch free task', Task.query.filter(Task.key_result_id.is_(None)).first())
+    db.session.commit()
+    flush_audit_log()
+    owners = {log.action: (log.entity_type, log.project_id) for log in Log.query}
+    assert owners['touch Project'] == ('project', seed['project_id'])
+    assert owners['touch Build'] == ('build', seed['project_id'])
+    assert owners['touch Objective'] == ('objective', seed['project_id'])
+    assert owners['touch KeyResult'] == ('key_result', seed['project_id'])
+    assert owners['touch Task'] == ('task', seed['project_id'])
+    assert owners['touch other'] == ('project', other.id)
+    assert owners['touch free task'] == ('task', None)
+
+
+def test_backfill_parses_legacy_actions(app, seed):
+    assert parse_action_entity("Dời lịch CV ID 5: 'x'") == ('task', 5)
+    assert parse_action_entity('Logged in') == (None, None)
+    kr_task = Task.query.filter_by(key_result_id=seed['kr_id']).first()
+    db.session.add_all([Log(action=f"Updated task ID {kr_task.id}"), Log(action='Logged in'),
+                        Log(action=f"Xóa key_result ID {seed['kr_id']}")])
+    db.session.commit()
+    assert backfill_log_entities(batch_size=2) == (3, 2)
+    assert Log.query.filter_by(project_id=seed['project_id']).count() == 2
+
+
+def test_workspace_activity_lists_only_project_logs(client, seed):
+    other = Project(name='P2')
+    db.session.add(other)
+    db.session.commit()
+    record_log('mine', db.session.get(Objective, seed['objective_id']))
+    record_log('theirs', other)
+    db.session.commit()
+    flush_audit_log()
+
+    rendered = []
+    listener = lambda sender, template, context, **extra: rendered.append(context)
+    template_rendered.connect(listener)
+    try:
+        page = client.get('/projects', query_string={'project_id': seed['project_id']})
+    finally:
+        template_rendered.disconnect(listener)
+    assert page.status_code == 200
+    assert [log.action for log in rendered[0]['selected_project_data']['logs']] == ['mine']
@@ -0,0 +1,113 @@
+# tests/test_recurrence.py
+from datetime import date
+
+from sqlalchemy import event
+
+from app import db
+from app.models import KeyResult, Task, TaskTombstone
+from app.progress import count_kr_tasks
+from app.recurrence import (expand_occurrences, get_exdates, materialize_series, occurrence_dates, occurrence_key,
+                            trim_series)
+from app.routes import expand_recurrence_command
+
+
+def _series(seed, end=date(2025, 3, 31)):
+    parent = Task(what='Standup', task_date=date(2025, 3, 3), hour=9, who_id=seed['user_id'], status='Pending',
+                  note='daily', recurrence='weekly', recurrence_end_date=end, key_result_id=seed['kr_id'])
+    db.session.add(parent)
+    db.session.flush()
+    materialize_series(parent)
+    db.session.commit()
+    return parent
+
+
+def _exception(parent, day):
+    return Task.query.filter_by(recurrence_parent_id=parent.id, recurrence_date=day).one()
+
+
+def test_trim_keeps_user_edited_and_handled_occurrences(app, seed):
+    parent = _series(seed)
+    assert Task.query.filter_by(recurrence_parent_id=parent.id).count() == 4
+    _exception(parent, date(2025, 3, 17)).what = 'Standup (moved to demo)'
+    _exception(parent, date(2025, 3, 24)).status = 'Done'
+    db.session.commit()
+
+    parent.recurrence_end_date = date(2025, 3, 12)
+    assert trim_series(parent) == 1
+    db.session.commit()
+    remaining = {t.recurrence_date for t in Task.query.filter_by(recurrence_parent_id=parent.id)}
+    assert remaining == {date(2025, 3, 10), date(2025, 3, 17), date(2025, 3, 24)}
+    assert TaskTombstone.query.count() == 1
+
+
+def test_trim_cli_recalculates_kr_progress(app, seed):
+    parent = _series(seed)
+    before = count_kr_tasks(seed['kr_id'])[1]
+    runner = app.test_cli_runner()
+    result = runner.invoke(expand_recurrence_command, [str(parent.id), '--trim-only', '--end-date', '2025-03-12'])
+    assert 'đã xóa 3' in result.output, result.output
+    db.session.expire_all()
+    kr = db.session.get(KeyResult, seed['kr_id'])
+    assert kr.target == count_kr_tasks(seed['kr_id'])[1] < before
+
+
+def _parent(seed, recurrence='weekly', start=date(2025, 3, 3), end=date(2025, 3, 31)):
+    parent = Task(what='Sync', task_date=start, hour=10, who_id=seed['user_id'], status='Pending',
+                  recurrence=recurrence, recurrence_end_date=end)
+    db.session.add(parent)
+    db.session.commit()
+    return parent
+
+
+def test_occurrence_dates_follow_rule_and_window(app, seed):
+    weekly = _parent(seed)
+    assert occurrence_dates(weekly) == [date(2025, 3, 10), date(2025, 3, 17), date(2025, 3, 24), date(2025, 3, 31)]
+    assert occurrence_dates(weekly, date(2025, 3, 11), date(2025, 3, 24)) == [date(2025, 3, 17), date(2025, 3, 24)]
+    # Monthly giữ ngày 31, tháng ngắn hơn thì lấy ngày cuối tháng
+    monthly = _parent(seed, 'monthly', date(2025, 1, 31), date(2025, 4, 30))
+    assert occurrence_dates(monthly) == [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)]
+
+
+def test_completing_an_occurrence_creates_exception(client, seed):
+    parent = _parent(seed)
+    key = occurrence_key(parent.id, date(2025, 3, 17))
+    body = client.post('/update-task-status', json={'taskId': key, 'newStatus': 'Done'}).get_json()
+    assert body['success'], body
+    exception = _exception(parent, date(2025, 3, 17))
+    assert (exception.status, exception.what, exception.hour) == ('Done', 'Sync', 10)
+    # Lần lặp đã có exception không còn được sinh ảo; ngày không thuộc chuỗi -> 404
+    virtual = {o.task_date for o in expand_occurrences([parent])}
+    assert virtual == {date(2025, 3, 10), date(2025, 3, 24), date(2025, 3, 31)}
+    missing = client.post('/update-task-status', json={'taskId': f'{parent.id}:2025-03-18', 'newStatus': 'Done'})
+    assert missing.status_code == 404
+
+
+def test_deleting_an_occurrence_records_exdate(client, seed):
+    parent = _parent(seed)
+    assert client.post(f'/delete-task/{parent.id}:2025-03-24').get_json()['success']
+    db.session.expire_all()
+    assert get_exdates(db.session.get(Task, parent.id)) == {date(2025, 3, 24)}
+    assert Task.query.filter_by(recurrence_parent_id=parent.id).count() == 0
+    assert date(2025, 3, 24) not in {o.task_date for o in expand_occurrences([parent])}
+
+
+def test_materialize_skips_existing_rows_and_exdates(app, seed):
+    parent = _parent(seed)
+    # Row cũ tạo tay cùng (ngày, giờ, tiêu đề) và một ngày đã xóa khỏi chuỗi
+    db.session.add(Task(what='Sync', task_date=date(2025, 3, 10), hour=10, status='Pending'))
+    parent.recurrence_exdates = '2025-03-24'
+    db.session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert materialize_series(parent) == 2
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    db.session.commit()
+    assert sum(s.startswith('INSERT') for s in statements) == 1
+    assert {t.recurrence_date for t in Task.query.filter_by(recurrence_parent_id=parent.id)} == \
+        {date(2025, 3, 17), date(2025, 3, 31)}
+    # Chạy lại không chèn trùng
+    assert materialize_series(parent) == 0
@@ -0,0 +1,36 @@
+# tests/test_reference_data.py
+
+from app import db
+from app.models import Build, Project, Task
+from app.reference_data import get_reference_item, get_reference_list, reference_versions
+
+
+def test_write_bumps_only_the_touched_kind(app, seed):
+    get_reference_list('projects')
+    before = reference_versions()
+    db.session.add(Project(name='P2'))
+    db.session.commit()
+    after = reference_versions()
+    assert after['projects'] == before['projects'] + 1
+    assert {k: v for k, v in after.items() if k != 'projects'} == {k: v for k, v in before.items() if k != 'projects'}
+    assert 'P2' in [p.name for p in get_reference_list('projects')]
+
+
+def test_unrelated_write_and_rollback_keep_the_cache(app, seed):
+    first = get_reference_list('builds')
+    before = reference_versions()
+    task = Task.query.first()
+    task.what = 'renamed'
+    db.session.commit()
+    db.session.add(Build(name='never saved', project_id=seed['project_id']))
+    db.session.flush()
+    db.session.rollback()
+    assert reference_versions() == before
+    assert get_reference_list('builds') is first
+
+
+def test_bulk_update_invalidates(app, seed):
+    get_reference_list('builds')
+    db.session.query(Build).filter_by(id=seed['build_id']).update({'name': 'Renamed build'})
+    db.session.commit()
+    assert get_reference_item('builds', seed['build_id']).name == 'Renamed build'
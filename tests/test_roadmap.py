@@ -0,0 +1,45 @@
+# tests/test_roadmap.py
+from datetime import date
+
+from app import db, roadmap_data
+from app.models import Build, Task
+
+URL = '/vis-roadmap-data'
+
+
+def test_roadmap_conditional_requests(client, seed):
+    first = client.get(URL)
+    assert first.status_code == 200 and first.last_modified is not None
+    assert client.get(URL, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    windowed = client.get(URL, query_string={'from': '2025-04-01'})
+    assert windowed.headers['ETag'] != first.headers['ETag']
+    assert client.get(URL, query_string={'from': '2025-04-01'},
+                      headers={'If-None-Match': windowed.headers['ETag']}).status_code == 304
+
+
+def test_roadmap_rebuilds_after_build_write_only(client, seed):
+    etag = client.get(URL).headers['ETag']
+    version = roadmap_data._version
+
+    task = Task.query.first()
+    task.what = 'not on the roadmap'
+    db.session.commit()
+    assert roadmap_data._version == version
+    assert client.get(URL, headers={'If-None-Match': etag}).status_code == 304
+
+    db.session.add(Build(name='P2 build', project_id=seed['project_id'],
+                         start_date=date(2025, 7, 1), end_date=date(2025, 8, 1)))
+    db.session.commit()
+    assert roadmap_data._version == version + 1
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert 'P2 build' in [item['content'] for item in response.get_json()['items']]
+
+
+def test_roadmap_follows_a_shift(client, seed):
+    etag = client.get(URL).headers['ETag']
+    assert client.post(f"/shift/build/{seed['build_id']}", json={'days': 3}).get_json()['success']
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    build = next(item for item in response.get_json()['items'] if item['id'] == f"build-{seed['build_id']}")
+    assert build['start'] == '2025-02-04'
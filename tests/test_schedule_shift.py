@@ -0,0 +1,96 @@
+# tests/test_schedule_shift.py
+from datetime import date, timedelta
+
+from app import db
+from app.models import Build, KeyResult, Objective, Project, Task
+from app.recurrence import materialize_series, occurrences_in_range
+
+
+def _recurring_with_exceptions(seed):
+    parent = Task(what='Weekly review', task_date=date(2025, 3, 3), hour=10, who_id=seed['user_id'],
+                  status='Pending', recurrence='weekly', recurrence_end_date=date(2025, 3, 31),
+                  key_result_id=seed['kr_id'], recurrence_exdates='2025-03-24')
+    db.session.add(parent)
+    db.session.flush()
+    materialize_series(parent, date(2025, 3, 10), date(2025, 3, 17))
+    db.session.commit()
+    return parent
+
+
+def test_shift_project_counts_every_level(client, seed):
+    parent = _recurring_with_exceptions(seed)
+    task_count = Task.query.filter_by(key_result_id=seed['kr_id']).count()
+    body = client.post(f"/shift/project/{seed['project_id']}", json={'days': 7}).get_json()
+    assert body['success']
+    assert body['shifted'] == {'tasks': task_count, 'occurrences': 2, 'key_results': 1,
+                               'objectives': 1, 'builds': 1, 'projects': 1}
+    db.session.expire_all()
+    assert db.session.get(Project, seed['project_id']).start_date == date(2025, 1, 8)
+    assert db.session.get(Build, seed['build_id']).end_date == date(2025, 7, 7)
+    assert db.session.get(KeyResult, seed['kr_id']).start_date == date(2025, 3, 8)
+    parent = db.session.get(Task, parent.id)
+    assert (parent.task_date, parent.recurrence_end_date) == (date(2025, 3, 10), date(2025, 4, 7))
+    assert parent.recurrence_exdates == '2025-03-31'
+    # Exception vẫn khớp lần lặp của chuỗi đã dời: không có lần lặp ảo nào trùng hay hiện lại
+    exceptions = Task.query.filter_by(recurrence_parent_id=parent.id).all()
+    assert sorted(t.recurrence_date for t in exceptions) == [date(2025, 3, 17), date(2025, 3, 24)]
+    assert all(t.task_date == t.recurrence_date for t in exceptions)
+    virtual = {o.task_date for o in occurrences_in_range(date(2025, 3, 1), date(2025, 4, 30))
+               if o.recurrence_parent_id == parent.id}
+    assert virtual == {date(2025, 4, 7)}
+
+
+def test_shift_objective_only_touches_its_branch(client, seed):
+    other = Objective(content='Other', start_date=date(2025, 3, 1), end_date=date(2025, 5, 1),
+                      project_id=seed['project_id'], build_id=seed['build_id'])
+    db.session.add(other)
+    db.session.commit()
+    body = client.post(f"/shift/objective/{seed['objective_id']}", json={'days': -3}).get_json()
+    assert body['shifted']['objectives'] == 1
+    assert body['shifted']['builds'] == body['shifted']['projects'] == 0
+    db.session.expire_all()
+    assert db.session.get(Objective, other.id).start_date == date(2025, 3, 1)
+    assert db.session.get(Objective, seed['objective_id']).start_date == date(2025, 2, 26)
+
+
+def test_shift_rejects_bad_input(client, seed):
+    assert client.post(f"/shift/project/{seed['project_id']}", json={'days': 0}).status_code == 400
+    assert client.post(f"/shift/task/1", json={'days': 1}).status_code == 400
+    assert client.post("/shift/project/9999", json={'days': 1}).status_code == 404
+
+
+def test_shift_changes_delta_feed_and_calendar_etag(client, seed):
+    parent = _recurring_with_exceptions(seed)
+    exception_ids = {t.id for t in Task.query.filter_by(recurrence_parent_id=parent.id)}
+    cursor = client.get('/api/tasks/changes').get_json()['cursor']
+    url = '/api/calendar/month/2025-03-01'
+    etag = client.get(url).headers['ETag']
+    unrelated = Task(what='Elsewhere', task_date=date(2025, 11, 3), status='Pending')
+    db.session.add(unrelated)
+    db.session.commit()
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.post(f"/shift/project/{seed['project_id']}", json={'days': 7}).get_json()['success']
+
+    changes = client.get('/api/tasks/changes', query_string={'since': cursor}).get_json()
+    changed = {t['id']: t for t in changes['created'] + changes['updated']}
+    assert {parent.id, *exception_ids} <= set(changed)
+    assert changed[parent.id]['date'] == '2025-03-10'
+    changed_etag = client.get(url, headers={'If-None-Match': etag})
+    assert changed_etag.status_code == 200 and changed_etag.headers['ETag'] != etag
+
+
+def test_exception_moved_to_another_branch_keeps_its_occurrence(client, seed):
+    parent = _recurring_with_exceptions(seed)
+    moved = Task.query.filter_by(recurrence_parent_id=parent.id, recurrence_date=date(2025, 3, 10)).one()
+    moved.key_result_id = None
+    db.session.commit()
+    body = client.post(f"/shift/project/{seed['project_id']}", json={'days': 7}).get_json()
+    assert body['shifted']['occurrences'] == 2
+    db.session.expire_all()
+    moved = db.session.get(Task, moved.id)
+    # Row ngoài nhánh giữ ngày của nó nhưng vẫn thay cho lần lặp tương ứng của chuỗi đã dời
+    assert (moved.task_date, moved.recurrence_date) == (date(2025, 3, 10), date(2025, 3, 17))
+    virtual = {o.task_date for o in occurrences_in_range(date(2025, 3, 1), date(2025, 4, 30))
+               if o.recurrence_parent_id == parent.id}
+    assert date(2025, 3, 17) not in virtual and date(2025, 3, 10) not in virtual
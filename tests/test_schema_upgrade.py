@@ -0,0 +1,131 @@
+# tests/test_schema_upgrade.py
+import os
+import shutil
+import sqlite3
+
+from sqlalchemy import inspect
+
+from app import db
+from app.log_retention import archive_old_logs
+from app.models import Build, Log, LogArchive, KeyResult, Objective, Project, Task, User
+from app.schema_upgrade import upgrade_schema
+from tests.conftest import make_app
+
+LEGACY_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database.db')
+
+
+def _login(app):
+    client = app.test_client()
+    with app.app_context():
+        user_id = db.session.query(User.id).order_by(User.id).first()[0]
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def test_legacy_database_gets_recurrence_columns(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        columns = {col['name'] for col in inspect(db.engine).get_columns('task')}
+        assert {'recurrence_parent_id', 'recurrence_date', 'recurrence_exdates'} <= columns
+        indexes = {ix['name'] for ix in inspect(db.engine).get_indexes('task')}
+        assert 'ix_task_recurrence_parent_id' in indexes
+        # Các task cũ đọc được qua ORM
+        assert Task.query.count() >= 1
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        assert upgrade_schema() == []
+
+
+def test_pages_render_on_legacy_database(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    client = _login(app)
+    for url in ('/', '/kanban', '/global-timeline'):
+        assert client.get(url).status_code == 200, url
+
+
+def test_legacy_tasks_get_change_stamps(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        assert Task.query.filter((Task.created_at.is_(None)) | (Task.updated_at.is_(None))).count() == 0
+        for task in Task.query.all():
+            if task.task_date:
+                assert task.created_at.date() <= task.task_date
+    client = _login(app)
+    first = client.get('/api/tasks/changes').get_json()
+    assert first['success'] and first['cursor']
+    since = client.get('/api/tasks/changes', query_string={'since': first['cursor']}).get_json()
+    assert since['created'] == [] and since['updated'] == []
+
+
+def _legacy_copy(tmp_path, *statements):
+    """Bản sao database.db cũ, chạy thêm vài câu SQL trước khi app nâng cấp nó."""
+    path = tmp_path / 'legacy.db'
+    shutil.copy(LEGACY_DB, path)
+    conn = sqlite3.connect(path)
+    with conn:
+        for sql in statements:
+            conn.execute(sql)
+    conn.close()
+    return path
+
+
+def test_legacy_progress_is_rolled_up(tmp_path):
+    app = make_app(tmp_path, _legacy_copy(tmp_path, "UPDATE task SET status = 'Done'"))
+    with app.app_context():
+        kr = db.session.get(KeyResult, 1)
+        assert (kr.current, kr.target) == (1, 1)
+        objective = db.session.get(Objective, kr.objective_id)
+        assert objective.progress == 100
+        assert db.session.get(Build, objective.build_id).progress == 100
+        assert db.session.get(Project, objective.project_id).progress > 0
+
+
+def test_legacy_gantt_etag_follows_writes(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        assert Project.query.filter(Project.gantt_version.is_(None)).count() == 0
+        task_id = Task.query.filter(Task.key_result_id.isnot(None)).first().id
+    client = _login(app)
+    url = '/api/dhtmlx-data?project_id=1'
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    client.post(f'/update-task-status/{task_id}', json={'checked': True})
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_dependency_links_on_legacy_database(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        indexes = {ix['name'] for ix in inspect(db.engine).get_indexes('dependency_link')}
+        assert {'ix_dependency_link_source', 'ix_dependency_link_target'} <= indexes
+        build_id = db.session.get(Objective, 1).build_id
+    client = _login(app)
+    created = client.post('/api/dependencies', json={'source': f'build-{build_id}', 'target': 'kr-1'})
+    assert created.get_json()['success'], created.get_json()
+    assert len(client.get('/api/dependencies').get_json()['links']) == 1
+
+
+def test_legacy_logs_get_entities(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        indexes = {ix['name'] for ix in inspect(db.engine).get_indexes('log')}
+        assert {'ix_log_entity', 'ix_log_project_timestamp'} <= indexes
+        log = Log.query.filter(Log.action.like('Added KR to Objective ID 1%')).one()
+        assert (log.entity_type, log.entity_id) == ('objective', 1)
+        assert log.project_id == db.session.get(Objective, 1).project_id
+        # Log không chứa ID giữ nguyên NULL
+        assert Log.query.filter(Log.entity_type.is_(None)).count() == 2
+
+
+def test_legacy_logs_can_be_archived(tmp_path):
+    app = make_app(tmp_path, LEGACY_DB)
+    with app.app_context():
+        assert archive_old_logs(30) == 3
+        assert Log.query.count() == 0
+        assert LogArchive.query.filter_by(entity_type='objective', entity_id=1).count() == 1
@@ -0,0 +1,20 @@
+# tests/test_serializers.py
+from app import db
+from app.models import Task, UploadedFile
+from app.serializers import query_task_dicts, serialize_tasks
+
+
+def test_batch_serializer_matches_to_dict(app, seed):
+    tasks = Task.query.order_by(Task.id).all()
+    tasks[0].note, tasks[0].priority = 'ghi chú', 'High'
+    db.session.add_all([
+        UploadedFile(original_filename='a.pdf', saved_filename='a_1.pdf', task_id=tasks[0].id),
+        UploadedFile(original_filename='b.png', saved_filename='b_2.png', task_id=tasks[0].id),
+        UploadedFile(original_filename='c.txt', saved_filename='c_3.txt', task_id=tasks[3].id),
+    ])
+    db.session.commit()
+    with app.test_request_context():
+        expected = [task.to_dict() for task in tasks]
+        assert serialize_tasks(tasks) == expected
+        assert query_task_dicts(Task.query.order_by(Task.id)) == expected
+        assert [a['original_filename'] for a in expected[0]['attachments']] == ['a.pdf', 'b.png']
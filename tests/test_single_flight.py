@@ -0,0 +1,61 @@
+# tests/test_single_flight.py
+import threading
+import time
+
+import pytest
+
+from app.single_flight import single_flight
+
+
+def _run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_callers_share_one_computation():
+    calls, results = [], []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return 'payload'
+
+    def caller():
+        results.append(single_flight('same-key', compute))
+
+    starter = threading.Thread(target=caller)
+    starter.start()
+    time.sleep(0.05)
+    followers = threading.Thread(target=lambda: _run_concurrently(4, caller))
+    followers.start()
+    time.sleep(0.05)
+    release.set()
+    starter.join()
+    followers.join()
+    assert len(calls) == 1 and results == ['payload'] * 5
+
+
+def test_error_is_shared_and_key_is_released():
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        single_flight('failing', fail)
+    # Key đã được bỏ: lần gọi sau tính lại
+    assert single_flight('failing', lambda: 'ok') == 'ok'
+
+
+def test_follower_computes_itself_after_timeout():
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: single_flight('stuck', lambda: release.wait(5) and 'leader'))
+    leader.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert single_flight('stuck', lambda: 'follower', timeout=0.1) == 'follower'
+    assert time.monotonic() - started < 1
+    release.set()
+    leader.join()
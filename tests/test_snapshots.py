@@ -0,0 +1,62 @@
+# tests/test_snapshots.py
+from datetime import date
+
+from app import db
+from app.models import ProgressSnapshot, Task
+from app.progress import recount_key_results, refresh_progress
+from app.snapshots import take_progress_snapshot
+
+
+def _recount():
+    recount_key_results()
+    refresh_progress()
+    db.session.commit()
+
+
+def _complete_pending_task(seed):
+    task = Task.query.filter_by(key_result_id=seed['kr_id'], status='Pending').first()
+    task.status = 'Done'
+    db.session.commit()
+    _recount()
+
+
+def test_snapshot_writes_one_row_per_entity(app, seed):
+    _recount()
+    assert take_progress_snapshot(date(2025, 3, 10)) == 3
+    db.session.commit()
+    row = ProgressSnapshot.query.filter_by(entity_type='objective', entity_id=seed['objective_id']).one()
+    assert (row.current, row.target, row.progress) == (3, 10, 30)
+
+
+def test_snapshot_rerun_same_day_overwrites(app, seed):
+    _recount()
+    take_progress_snapshot(date(2025, 3, 10))
+    db.session.commit()
+    _complete_pending_task(seed)
+    assert take_progress_snapshot(date(2025, 3, 10)) == 3
+    db.session.commit()
+    row = ProgressSnapshot.query.filter_by(entity_type='project', entity_id=seed['project_id']).one()
+    assert (row.current, row.progress) == (4, 40)
+
+
+def test_progress_history_returns_ordered_series(client, seed):
+    _recount()
+    take_progress_snapshot(date(2025, 3, 10))
+    db.session.commit()
+    _complete_pending_task(seed)
+    take_progress_snapshot(date(2025, 3, 11))
+    db.session.commit()
+
+    url = f"/api/progress-history/build/{seed['build_id']}"
+    body = client.get(url).get_json()
+    assert body['success'] and (body['entity_type'], body['entity_id']) == ('build', seed['build_id'])
+    assert [(p['date'], p['current'], p['progress']) for p in body['series']] == \
+        [('2025-03-10', 3, 30), ('2025-03-11', 4, 40)]
+    windowed = client.get(url, query_string={'from': '2025-03-11', 'to': '2025-03-31'}).get_json()
+    assert [p['date'] for p in windowed['series']] == ['2025-03-11']
+
+
+def test_progress_history_rejects_bad_input(client, seed):
+    assert client.get(f"/api/progress-history/key_result/{seed['kr_id']}").status_code == 400
+    bad_date = client.get(f"/api/progress-history/project/{seed['project_id']}", query_string={'from': '10/03/2025'})
+    assert bad_date.status_code == 400 and bad_date.get_json()['success'] is False
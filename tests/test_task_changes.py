@@ -0,0 +1,61 @@
+# tests/test_task_changes.py
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import db
+from app.models import Task, TaskTombstone
+
+
+def _sync(client, cursor, limit):
+    """Đọc hết delta từ cursor theo trang; trả về (id đã tạo/sửa, id đã xóa, cursor cuối, số trang)."""
+    seen, deleted, pages = [], [], 0
+    while True:
+        body = client.get('/api/tasks/changes', query_string={'since': cursor, 'limit': limit}).get_json()
+        assert body['success']
+        seen += [t['id'] for t in body['created'] + body['updated']]
+        deleted += body['deleted']
+        cursor = body['cursor']
+        pages += 1
+        if not body['has_more']:
+            return seen, deleted, cursor, pages
+
+
+def test_rows_sharing_a_stamp_are_paged_without_loss(client, seed):
+    cursor = client.get('/api/tasks/changes').get_json()['cursor']
+    stamp = datetime(2030, 1, 1)
+    ids = [t.id for t in Task.query.order_by(Task.id)]
+    db.session.execute(update(Task.__table__).values(updated_at=stamp))
+    db.session.commit()
+
+    seen, deleted, cursor, pages = _sync(client, cursor, limit=4)
+    assert sorted(seen) == ids and len(seen) == len(set(seen))
+    assert deleted == [] and pages == 4
+    # Không còn gì sau cursor cuối
+    assert _sync(client, cursor, limit=4)[:2] == ([], [])
+
+
+def test_changes_and_deletes_interleave_across_pages(client, seed):
+    cursor = client.get('/api/tasks/changes').get_json()['cursor']
+    tasks = Task.query.order_by(Task.id).all()
+    for task in tasks[:6]:
+        task.note = 'edited'
+        db.session.commit()
+    deleted_ids = [t.id for t in tasks[6:12]]
+    for task in tasks[6:12]:
+        db.session.delete(task)
+        db.session.commit()
+    assert TaskTombstone.query.count() == 6
+
+    seen, deleted, _, pages = _sync(client, cursor, limit=2)
+    assert sorted(seen) == [t.id for t in tasks[:6]]
+    assert sorted(deleted) == deleted_ids
+    assert pages >= 3
+
+
+def test_malformed_cursor_is_rejected(client, seed):
+    body = client.get('/api/tasks/changes', query_string={'since': '2000-01-01T00:00:00|0|0'}).get_json()
+    assert len(body['created'] + body['updated']) == Task.query.count() and not body['has_more']
+    assert client.get('/api/tasks/changes', query_string={'since': '2000-01-01T00:00:00'}).status_code == 400
+    assert client.get('/api/tasks/changes?since=nope').status_code == 400
+    assert client.get('/api/tasks/changes?since=2000-01-01T00:00:00|x|1').status_code == 400
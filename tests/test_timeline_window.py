@@ -0,0 +1,39 @@
+# tests/test_timeline_window.py
+from datetime import date
+
+from app.timeline_window import clip_span
+
+APRIL = {'from': '2025-04-01', 'to': '2025-04-30'}
+
+
+def test_clip_span():
+    assert clip_span(date(2025, 3, 1), date(2025, 5, 1), date(2025, 4, 1), date(2025, 4, 30)) == \
+        (date(2025, 4, 1), date(2025, 4, 30), True)
+    assert clip_span(date(2025, 4, 2), date(2025, 4, 3), date(2025, 4, 1), None) == \
+        (date(2025, 4, 2), date(2025, 4, 3), False)
+
+
+def test_gantt_window_clips_bars_and_summarises_hidden_tasks(client, seed):
+    rows = client.get('/api/dhtmlx-data', query_string={'project_id': seed['project_id'], **APRIL}).get_json()['data']
+    by_id = {r['id']: r for r in rows}
+    project = by_id[f"proj-{seed['project_id']}"]
+    assert project['clipped'] and (project['start_date'], project['end_date']) == ('2025-04-01', '2025-05-01')
+    assert by_id[f"obj-{seed['objective_id']}"]['clipped']
+    # Task của KR nằm hết trong tháng 3: chỉ còn một thanh tóm tắt phía trước cửa sổ
+    assert not any(r['id'].startswith('task-') for r in rows)
+    hidden = by_id[f"hidden-before-kr-{seed['kr_id']}"]
+    assert hidden['hidden_count'] == 10 and hidden['type'] == 'hidden_summary'
+
+    full = client.get(f"/api/dhtmlx-data?project_id={seed['project_id']}").get_json()['data']
+    assert not any(r.get('clipped') or r['id'].startswith('hidden-') for r in full)
+
+
+def test_roadmap_window_keeps_groups_and_hides_builds(client, seed):
+    body = client.get('/vis-roadmap-data', query_string={'from': '2025-07-01', 'to': '2025-12-31'}).get_json()
+    assert [g['id'] for g in body['groups']] == [seed['project_id']]
+    assert not any(item['id'] == f"build-{seed['build_id']}" for item in body['items'])
+    assert [item['hidden_count'] for item in body['items'] if 'hidden_count' in item] == [1]
+
+    clipped = client.get('/vis-roadmap-data', query_string=APRIL).get_json()['items']
+    build = next(item for item in clipped if item['id'] == f"build-{seed['build_id']}")
+    assert (build['start'], build['end']) == ('2025-04-01', '2025-05-01')
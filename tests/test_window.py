@@ -0,0 +1,31 @@
+# tests/test_window.py
+from datetime import date
+
+from app import db
+from app.models import Objective
+from app.utils import active_in_window, parse_window
+
+
+def _active(window_start, window_end):
+    return {o.content for o in Objective.query.filter(active_in_window(Objective, window_start, window_end))}
+
+
+def test_overlap_with_open_ended_rows(app, seed):
+    project_id = seed['project_id']
+    db.session.add_all([
+        Objective(content='before', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31), project_id=project_id),
+        Objective(content='spanning', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), project_id=project_id),
+        Objective(content='no end, before', start_date=date(2025, 1, 10), end_date=None, project_id=project_id),
+        Objective(content='no end, inside', start_date=date(2025, 6, 10), end_date=None, project_id=project_id),
+        Objective(content='after', start_date=date(2025, 9, 1), end_date=date(2025, 9, 30), project_id=project_id),
+    ])
+    db.session.commit()
+    assert _active(date(2025, 6, 1), date(2025, 6, 30)) == {'spanning', 'no end, inside'}
+    # Bỏ trống một đầu = không giới hạn đầu đó
+    assert _active(None, date(2025, 1, 15)) == {'before', 'spanning', 'no end, before'}
+    assert _active(date(2025, 8, 1), None) == {'spanning', 'after'}
+    assert len(_active(None, None)) == Objective.query.count()
+
+
+def test_parse_window_ignores_bad_dates():
+    assert parse_window({'from': '2025-01-02', 'to': 'x'}) == (date(2025, 1, 2), None)